@@ -69,7 +69,7 @@ append_csv() {
     EXPOSED_SERVICE="SSH:22"
     BREADCRUMB_SOURCE="Honeytoken"
 
-    echo "$UUID,$TIMESTAMP_START,$TIMESTAMP_END,$decoy_asset_id,$decoy_asset_type,$alert_type,$severity,$SRC_IP,$SRC_PORT,$dst_ip,$DST_PORT,$PROTOCOL,$GEOIP,$USER_AGENT,$SSH_BANNER,$MAC_ADDRESS,$TOR_VPN_FLAG,\"$executed_commands\",\"$command_sequence\",$TOOL_IDENTIFICATION,$files_accessed,$HASHES,$ACCESSED_PATHS,$CREATED_MODIFIED,$DWELL_TIME,$TIME_BETWEEN_COMMANDS,$TYPING_SPEED,$NUM_DECOYS,$RECONNECTION_PATTERNS,$MITRE_MAPPING,$DECOY_OS_VERSION,$EXPOSED_SERVICE,$BREADCRUMB_SOURCE" >> "$CSV_PATH"
+    echo "$UUID,$TIMESTAMP_START,$TIMESTAMP_END,$decoy_asset_id,$decoy_asset_type,$alert_type,$severity,$SRC_IP,$SRC_PORT,$dst_ip,$DST_PORT,$PROTOCOL,$GEOIP,$USER_AGENT,$SSH_BANNER,$MAC_ADDRESS,$TOR_VPN_FLAG,\"$executed_commands\",\"$command_sequence\",$TOOL_IDENTIFICATION,$files_accessed,$HASHES,$ACCESSED_PATHS,$CREATED_MODIFIED,$DWELL_TIME,$TIME_BETWEEN_COMMANDS,$TYPING_SPEED,$NUM_DECOYS,$RECONNECTION_PATTERNS,\"$MITRE_MAPPING\",$DECOY_OS_VERSION,$EXPOSED_SERVICE,$BREADCRUMB_SOURCE" >> "$CSV_PATH"
 
     decoy_console_name="${decoy_asset_id#decoy_}"
     description="${description//decoy_/}"
@@ -1,40 +1,158 @@
-import uuid
-import random
-import json
+import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any
-from openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional, Tuple
+from openai_client import OpenAIClient, send_prompt_async, llm_available
+from local_rules import LocalRules
+from verdict_cache import VerdictCache
+from record_store import RecordStore
+from records import ValidationRecord
+from metrics import timed, LLM_FALLBACKS
+from prompt_builder import VALIDATION, VALIDATION_BATCH
+from verdict_cache import VOLATILE_FIELDS
+
+# Decoy fields that say nothing about realism
+IGNORED_FIELDS = VOLATILE_FIELDS | {"template"}
 
 class AIValidator:
     """Validates decoys using Azure OpenAI-based checks."""
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(self, openai_client: OpenAIClient, verdict_cache: Optional[VerdictCache] = None,
+                 store: Optional[RecordStore] = None, local_rules: Optional[LocalRules] = None,
+                 max_deferred: int = 10000):
         self.openai_client = openai_client
-        self.validation_results = []
+        self.verdict_cache = verdict_cache
+        self.validation_results = store if store is not None else RecordStore(ValidationRecord)
+        self.local_rules = local_rules if local_rules is not None else LocalRules()
+        # Verdict keys of decoys validated by the local rules while the LLM failed, with a decoy and its local verdict,
+        # awaiting re-validation
+        self.deferred: deque = deque(maxlen=max_deferred)
 
-    def validate_decoy(self, decoy: Dict[str, Any]) -> bool:
+    @timed()
+    async def validate_decoy(self, decoy: Dict[str, Any]) -> bool:
         """Validates decoy realism using Azure OpenAI."""
-        prompt = f"""
-        You are an AI validator for deception technology. Evaluate the realism of the following decoy:
-        {json.dumps(decoy, indent=2)}
-        Determine if the decoy is convincing enough to deceive an attacker. 
-        Return a JSON object with a single key 'is_valid' set to true if the decoy is realistic, false otherwise.
-        """
-        response = self.openai_client.send_prompt(prompt, max_tokens=50, temperature=0.3)
-        if "error" in response:
-            print(f"Error in decoy validation: {response['error']}")
-            is_valid = False
-        else:
-            response_data = response.get("response", {})
-            if not isinstance(response_data, dict):
-                print(f"Unexpected response type: {type(response_data)}")
-                is_valid = random.random() > 0.2
-            else:
-                is_valid = response_data.get("is_valid", random.random() > 0.2)
+        is_valid = self.verdict_cache.get("is_valid", decoy) if self.verdict_cache else None
+        if is_valid is None:
+            is_valid = await self._request_validation(decoy)
         result = {
             "decoy_id": decoy["id"],
             "is_valid": is_valid,
-            "timestamp": datetime.datetime.now().isoformat(),
+            "timestamp": datetime.now().isoformat(),
             "details": f"Validation {'successful' if is_valid else 'failed'} for {decoy['type']}"
         }
         self.validation_results.append(result)
-        return is_valid
\ No newline at end of file
+        return is_valid
+
+    @timed()
+    async def validate_decoys(self, decoys: List[Dict[str, Any]]) -> List[bool]:
+        """Validates decoys in one Azure OpenAI call; decoys instantiated from the same template share one verdict."""
+        representatives: Dict[str, Dict[str, Any]] = {}
+        for decoy in decoys:
+            representatives.setdefault(self.verdict_key(decoy), decoy)
+        verdicts: Dict[str, Optional[bool]] = {
+            key: self.verdict_cache.get("is_valid", decoy) if self.verdict_cache else None
+            for key, decoy in representatives.items()
+        }
+        pending = {key: representatives[key] for key, verdict in verdicts.items() if verdict is None}
+        if pending:
+            verdicts.update(await self._request_validations(pending))
+        results = []
+        for decoy in decoys:
+            is_valid = verdicts[self.verdict_key(decoy)]
+            results.append(is_valid)
+            self.validation_results.append({
+                "decoy_id": decoy["id"],
+                "is_valid": is_valid,
+                "timestamp": datetime.now().isoformat(),
+                "details": f"Validation {'successful' if is_valid else 'failed'} for {decoy['type']}"
+            })
+        return results
+
+    async def rescore_deferred(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Re-validates decoys the local rules accepted during an LLM outage and returns those the LLM rejects."""
+        # A returned decoy stands for its whole template: every decoy made from it shared the rejected verdict
+        if not self.deferred or not llm_available(self.openai_client):
+            return []
+        pending: Dict[str, Tuple[Dict[str, Any], bool]] = {}
+        for _ in range(min(len(self.deferred), limit)):
+            key, decoy, local_verdict = self.deferred.popleft()
+            pending.setdefault(key, (decoy, local_verdict))
+        verdicts = await self._request_validations({key: decoy for key, (decoy, _) in pending.items()})
+        rejected = []
+        for key, (decoy, local_verdict) in pending.items():
+            # Decoys that failed again were deferred again with the same local verdict
+            if local_verdict and not verdicts[key]:
+                rejected.append(decoy)
+                self.validation_results.append({
+                    "decoy_id": decoy["id"],
+                    "is_valid": False,
+                    "timestamp": datetime.now().isoformat(),
+                    "details": f"Revalidation failed for {decoy['type']}"
+                })
+        return rejected
+
+    def _local_verdict(self, decoy: Dict[str, Any], defer: bool = False) -> bool:
+        """Validates a decoy with the local rules, deferring it for LLM re-validation when the LLM call failed."""
+        is_valid = self.local_rules.is_valid_decoy(decoy)
+        if defer:
+            self.deferred.append((self.verdict_key(decoy), decoy, is_valid))
+        return is_valid
+
+    @staticmethod
+    def verdict_key(decoy: Dict[str, Any]) -> str:
+        """Returns the key decoys share a verdict under: their template, or the decoy ID for one made without."""
+        return decoy.get("template") or decoy["id"]
+
+    async def _request_validations(self, decoys: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Uses a single Azure OpenAI call to get one realism verdict per decoy, keyed like the input."""
+        decoy_ids = {f"d{i}": key for i, key in enumerate(decoys)}
+        prompt = VALIDATION_BATCH.render_table({decoy_id: decoys[key] for decoy_id, key in decoy_ids.items()},
+                                               drop=IGNORED_FIELDS)
+        started = time.perf_counter()
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=20 + 8 * len(decoys), temperature=0.3,
+                                           caller="ai_validator_batch")
+        latency = (time.perf_counter() - started) / len(decoys)
+        if "error" in response:
+            if not response.get("circuit_open"):
+                print(f"Error in batch decoy validation: {response['error']}")
+            LLM_FALLBACKS.inc("ai_validator_batch", "api_error", amount=len(decoys))
+            return {key: self._local_verdict(decoy, defer=True) for key, decoy in decoys.items()}
+        response_data = response.get("response", {})
+        verdicts = response_data.get("verdicts", {}) if isinstance(response_data, dict) else {}
+        if not isinstance(verdicts, dict):
+            print(f"Unexpected verdicts type: {type(verdicts)}")
+            verdicts = {}
+        results = {}
+        for decoy_id, key in decoy_ids.items():
+            if decoy_id not in verdicts:
+                LLM_FALLBACKS.inc("ai_validator_batch", "missing_verdict")
+                results[key] = self.local_rules.is_valid_decoy(decoys[key])
+                continue
+            results[key] = bool(verdicts[decoy_id])
+            if self.verdict_cache:
+                self.verdict_cache.set("is_valid", decoys[key], results[key], latency)
+        return results
+
+    async def _request_validation(self, decoy: Dict[str, Any]) -> bool:
+        """Asks Azure OpenAI whether the decoy is realistic."""
+        prompt = VALIDATION.render_table([decoy], drop=IGNORED_FIELDS)
+        started = time.perf_counter()
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=50, temperature=0.3,
+                                           caller="ai_validator")
+        latency = time.perf_counter() - started
+        if "error" in response:
+            if not response.get("circuit_open"):
+                print(f"Error in decoy validation: {response['error']}")
+            LLM_FALLBACKS.inc("ai_validator", "api_error")
+            return self._local_verdict(decoy, defer=True)
+        response_data = response.get("response", {})
+        if not isinstance(response_data, dict):
+            print(f"Unexpected response type: {type(response_data)}")
+            LLM_FALLBACKS.inc("ai_validator", "unexpected_response")
+            return self.local_rules.is_valid_decoy(decoy)
+        if "is_valid" not in response_data:
+            LLM_FALLBACKS.inc("ai_validator", "missing_verdict")
+            return self.local_rules.is_valid_decoy(decoy)
+        is_valid = bool(response_data["is_valid"])
+        if self.verdict_cache:
+            self.verdict_cache.set("is_valid", decoy, is_valid, latency)
+        return is_valid
@@ -1,10 +1,19 @@
-import csv
+import asyncio
 import os
+import socket
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Union
 from data_analyzer import DataAnalyzer
+from event_store import EventStore
+from ingestion_queue import IngestionQueue
+from batch_status import BatchStatus, SharedBatchStatus
+from metrics import REGISTRY, PROFILER
+from shard_router import ShardRouter
 from openai_client import OpenAIClient
+from verdict_cache import VerdictCache
 import uvicorn
 
 class EventData(BaseModel):
@@ -12,43 +21,177 @@ class EventData(BaseModel):
     events: List[Dict[str, Any]]
 
 class APIServer:
-    """API server to accept JSON data, write to CSV, and call DataAnalyzer."""
-    def __init__(self, openai_client: OpenAIClient, host: str = "0.0.0.0", port: int = 8000):
-        self.app = FastAPI()
-        self.data_analyzer = DataAnalyzer(openai_client)
+    """API server to accept JSON data, write it to the event store, and call DataAnalyzer."""
+    def __init__(self, openai_client: OpenAIClient, host: str = "0.0.0.0", port: int = 8000,
+                 verdict_cache: Optional[VerdictCache] = None, ingest_mode: str = "queued",
+                 max_queued_events: int = 100000, ingest_workers: int = 4,
+                 event_store: Optional[EventStore] = None, data_analyzer: Optional[DataAnalyzer] = None,
+                 profile: Optional[bool] = None, shard_router: Optional[ShardRouter] = None,
+                 reuse_port: bool = False, batch_status: Optional[Union[BatchStatus, SharedBatchStatus]] = None):
+        if ingest_mode not in ("queued", "inline"):
+            raise ValueError(f"Unknown ingest mode: {ingest_mode}")
+        self.data_analyzer = data_analyzer or DataAnalyzer(openai_client, verdict_cache=verdict_cache)
         self.host = host
         self.port = port
-        self.csv_file = "event_data.csv"
-        
-        # Define API endpoint
+        self.event_store = event_store or EventStore("event_store")
+        self.ingest_mode = ingest_mode
+        # In multi-worker mode, queued events are analyzed by the worker owning their source_ip
+        self.shard_router = shard_router
+        self.reuse_port = reuse_port
+        self.server: Optional[uvicorn.Server] = None
+        self.ingestion_queue = IngestionQueue(self.data_analyzer, sink=self.event_store.write,
+                                              max_queued_events=max_queued_events, num_workers=ingest_workers,
+                                              batch_status=batch_status)
+        # Sampling profiler is opt-in, via the constructor or PROFILE_SAMPLING=1
+        self.profile = profile if profile is not None else os.environ.get("PROFILE_SAMPLING", "") not in ("", "0")
+        REGISTRY.gauge("toolkit_ingestion_queued_events", "Events waiting in the ingestion queue",
+                       callback=lambda: {(): self.ingestion_queue.queued_events})
+
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            receiver = None
+            if self.ingest_mode == "queued":
+                await self.ingestion_queue.start()
+                if self.shard_router is not None:
+                    receiver = asyncio.create_task(self.shard_router.receive(self._enqueue_forwarded))
+            if self.profile:
+                PROFILER.start()
+            yield
+            if receiver is not None:
+                self.shard_router.stop()
+                await asyncio.gather(receiver, return_exceptions=True)
+            await self.ingestion_queue.stop()
+            self.event_store.close()
+            PROFILER.stop()
+
+        self.app = FastAPI(lifespan=lifespan)
+
+        # Define API endpoints
         @self.app.post("/events")
         async def receive_events(data: EventData):
-            """Endpoint to receive JSON events, write to CSV, and analyze."""
+            """Endpoint to receive JSON events, store them, and analyze."""
+            if self.ingest_mode == "queued":
+                return await self._enqueue_events(data.events)
             try:
-                # Write to CSV
-                self._write_to_csv(data.events)
+                # Buffer into the event store
+                self.event_store.write(data.events)
                 # Analyze data
-                threats = self.data_analyzer.analyze_data(data.events)
+                threats = await self.data_analyzer.analyze_data_batched(data.events)
                 return {"status": "success", "threats_found": len(threats), "threats": threats}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Error processing events: {str(e)}")
 
-    def _write_to_csv(self, events: List[Dict[str, Any]]) -> None:
-        """Writes JSON events to a CSV file."""
+        @self.app.get("/events/{batch_id}")
+        async def batch_status(batch_id: str):
+            """Endpoint to report the progress and results of a queued batch."""
+            batch = await self.ingestion_queue.status(batch_id)
+            if batch is None:
+                raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+            return batch
+
+        @self.app.get("/ingestion")
+        async def ingestion_stats():
+            """Endpoint to report ingestion queue depth and batch counts."""
+            stats = await self.ingestion_queue.stats()
+            if self.shard_router is not None:
+                # Whichever worker answers reports its own queue, while batch counts cover every worker
+                stats["worker"] = self.shard_router.index
+                stats["scope"] = {"queue": "worker", "batches": "pool"}
+                stats["sharding"] = self.shard_router.stats()
+            return stats
+
+        @self.app.get("/metrics")
+        async def metrics():
+            """Endpoint to expose timings, LLM call and cache counters in the Prometheus text format."""
+            # Each worker process has its own registry, so its samples are labelled with the worker index
+            labels = {"worker": self.shard_router.index} if self.shard_router is not None else None
+            return PlainTextResponse(REGISTRY.render(labels), media_type="text/plain; version=0.0.4")
+
+        @self.app.get("/debug/profiler")
+        async def profiler_report(limit: int = 25):
+            """Endpoint to report the hottest stacks seen by the sampling profiler."""
+            return PROFILER.top(limit)
+
+        @self.app.post("/debug/profiler/start")
+        async def profiler_start():
+            """Endpoint to start the sampling profiler."""
+            PROFILER.start()
+            return {"running": PROFILER.running}
+
+        @self.app.post("/debug/profiler/stop")
+        async def profiler_stop():
+            """Endpoint to stop the sampling profiler."""
+            # Joining the sampler thread can take a sampling interval; keep it off the event loop
+            await asyncio.to_thread(PROFILER.stop)
+            return {"running": PROFILER.running}
+
+    async def _enqueue_events(self, events: List[Dict[str, Any]]) -> JSONResponse:
+        """Queues events for background analysis, answering 202 or 429 when the queue is full."""
         if not events:
-            return
-        
-        # Define CSV headers based on the first event's keys
-        headers = list(events[0].keys())
-        file_exists = os.path.isfile(self.csv_file)
-        
-        with open(self.csv_file, mode='a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            if not file_exists:
-                writer.writeheader()
-            for event in events:
-                writer.writerow(event)
+            raise HTTPException(status_code=422, detail="No events provided")
+        if len(events) > self.ingestion_queue.max_queued_events:
+            raise HTTPException(status_code=413, detail="Batch exceeds the ingestion queue capacity")
+        if self.shard_router is None:
+            batch_id = await self.ingestion_queue.submit(events)
+            if batch_id is None:
+                raise self._queue_full()
+            return JSONResponse(status_code=202, content={"status": "accepted", "batch_id": batch_id, "events": len(events)})
+        # Room for the whole batch is claimed up front in case it all has to stay here, so a 429 never follows a
+        # partial forward and other requests cannot take that room while the batch is being opened
+        queue = self.ingestion_queue
+        if not queue.reserve(len(events)):
+            raise self._queue_full()
+        local, remote = self.shard_router.split(events)
+        # The batch is opened before any part is forwarded, so no worker can finish a part of an unknown batch.
+        # Its part count starts at the most there can be and drops for inboxes that were full.
+        parts = len(remote) + (1 if local else 0)
+        try:
+            batch_id = await queue.open_batch(len(events), parts)
+        except BaseException:
+            queue.release(len(events))
+            raise
+        leftover, forwarded_parts = self.shard_router.forward(remote, batch_id)
+        local.extend(leftover)
+        queue.release(len(events) - len(local))
+        if local:
+            await queue.submit(local, batch_id, reserved=True)
+        actual_parts = forwarded_parts + (1 if local else 0)
+        if actual_parts != parts:
+            await asyncio.to_thread(queue.batch_status.add_parts, batch_id, actual_parts - parts)
+        return JSONResponse(status_code=202, content={"status": "accepted", "batch_id": batch_id, "events": len(local),
+                                                      "forwarded": len(events) - len(local)})
+
+    async def _enqueue_forwarded(self, events: List[Dict[str, Any]], batch_id: str) -> None:
+        """Queues a batch part forwarded by another worker, waiting for room rather than dropping it."""
+        while await self.ingestion_queue.submit(events, batch_id) is None:
+            await asyncio.sleep(0.1)
+
+    @staticmethod
+    def _queue_full() -> HTTPException:
+        return HTTPException(status_code=429, detail="Ingestion queue is full, retry later", headers={"Retry-After": "1"})
+
+    def add_status_endpoint(self, path: str, provider: Callable[[], Dict[str, Any]]) -> None:
+        """Exposes a JSON status provider, such as pipeline stats, as a GET endpoint."""
+        self.app.add_api_route(path, lambda: provider(), methods=["GET"])
 
     def start(self):
         """Starts the FastAPI server."""
-        uvicorn.run(self.app, host=self.host, port=self.port)
\ No newline at end of file
+        uvicorn.run(self.app, host=self.host, port=self.port)
+
+    async def serve(self) -> None:
+        """Serves the FastAPI app on the running event loop until shutdown() is called."""
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=self.host, port=self.port))
+        if not self.reuse_port:
+            await self.server.serve()
+            return
+        # Several worker processes bind the same port and the kernel spreads connections between them
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        await self.server.serve(sockets=[sock])
+
+    def shutdown(self) -> None:
+        """Asks a server started with serve() to finish in-flight requests and exit."""
+        if self.server is not None:
+            self.server.should_exit = True
\ No newline at end of file
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import random
+from typing import Dict, Any, Optional
+import httpx
+from openai_client import OpenAIClient
+from rate_limiter import RateLimiter
+from circuit_breaker import CircuitBreaker, OPEN
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class AsyncOpenAIClient:
+    """Asyncio Azure OpenAI client with pooled connections, rate limiting and retry on 429/5xx."""
+    def __init__(self, azure_endpoint: str = "https://your-azure-openai-endpoint",
+                 encrypted_api_key: str = None, encryption_key: str = None,
+                 requests_per_minute: Optional[int] = 600, tokens_per_minute: Optional[int] = 90000,
+                 max_connections: int = 20, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 30.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
+        self.azure_endpoint = azure_endpoint
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self.api_key = OpenAIClient._decrypt_api_key(encrypted_api_key, encryption_key)
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._session: Optional[httpx.AsyncClient] = None
+
+    def _get_session(self) -> httpx.AsyncClient:
+        """Returns the shared connection pool, creating it on first use."""
+        if self._session is None or self._session.is_closed:
+            self._session = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        """Closes the pooled connections."""
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncOpenAIClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def send_prompt(self, prompt: str, max_tokens: int = 50, temperature: float = 0.3) -> Dict[str, Any]:
+        """Sends a prompt to Azure OpenAI and returns the response."""
+        payload = {
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        # Rough prompt size of four characters per token, plus the completion budget
+        await self.rate_limiter.acquire(len(prompt) // 4 + max_tokens)
+        last_error = "no attempts made"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await self._get_session().post(self.azure_endpoint, json=payload)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return self._read_completion(response)
+                last_error = f"HTTP {response.status_code}"
+                retry_after = self._retry_after(response)
+            except httpx.HTTPStatusError as e:
+                print(f"Azure OpenAI API call failed: {str(e)}")
+                return {"error": str(e)}
+            except httpx.TransportError as e:
+                last_error = str(e)
+            # Once other calls have tripped the circuit, retrying would only delay this caller's fallback
+            if self.circuit_breaker.state == OPEN:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        print(f"Azure OpenAI API call failed after {attempt + 1} attempts: {last_error}")
+        return {"error": last_error}
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Returns a full-jitter exponential backoff delay, honouring Retry-After when given."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """Reads the Retry-After header in seconds, if the server sent one."""
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+    @classmethod
+    def _read_completion(cls, response: httpx.Response) -> Dict[str, Any]:
+        """Decodes a successful reply; a malformed body is not retried, since it would come back the same."""
+        try:
+            body = response.json()
+        except ValueError as e:
+            print(f"Azure OpenAI API returned an invalid JSON body: {str(e)}")
+            return {"error": f"Invalid JSON body: {str(e)}"}
+        if not isinstance(body, dict):
+            print(f"Azure OpenAI API returned an unexpected body type: {type(body)}")
+            return {"error": f"Unexpected body type: {type(body).__name__}"}
+        return {"response": cls._parse_completion(body)}
+
+    @staticmethod
+    def _parse_completion(body: Dict[str, Any]) -> Any:
+        """Extracts the completion text and decodes it as JSON where possible."""
+        choices = body.get("choices") or [{}]
+        choice = choices[0]
+        text = choice.get("message", {}).get("content") if "message" in choice else choice.get("text")
+        if text is None:
+            return body
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+FINISHED = ("completed", "failed")
+
+def new_batch(batch_id: str, events: int, parts: int) -> Dict[str, Any]:
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+        "events": events,
+        "parts": parts,
+        "parts_done": 0,
+        "submitted_at": datetime.now().isoformat(),
+        "completed_at": None,
+        "threats_found": 0,
+        "threats": []
+    }
+
+def start(batch: Dict[str, Any]) -> None:
+    if batch["status"] == "queued":
+        batch["status"] = "processing"
+
+def add_parts(batch: Dict[str, Any], count: int) -> None:
+    """Changes how many parts a batch was split into, finishing it if they are all done."""
+    batch["parts"] += count
+    if batch["parts_done"] >= batch["parts"] and batch["status"] not in FINISHED:
+        batch.update(status="failed" if batch.get("error") else "completed", completed_at=datetime.now().isoformat())
+
+def finish_part(batch: Dict[str, Any], threats: List[Dict[str, Any]], error: Optional[str]) -> None:
+    """Adds one analyzed part's threats or error to a batch, finishing it once every part is done."""
+    batch["parts_done"] += 1
+    batch["threats"].extend(threats)
+    batch["threats_found"] += len(threats)
+    if error is not None:
+        batch["error"] = error
+    add_parts(batch, 0)
+
+class BatchStatus:
+    """In-process progress and results of ingested batches, keeping the newest max_batches."""
+    def __init__(self, max_batches: int = 10000):
+        self.max_batches = max_batches
+        self.batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, batch_id: str, events: int, parts: int = 1) -> None:
+        """Starts tracking a batch analyzed in parts, possibly by several workers."""
+        with self._lock:
+            self.batches[batch_id] = new_batch(batch_id, events, parts)
+            self._trim()
+
+    def start(self, batch_id: str) -> None:
+        with self._lock:
+            if batch_id in self.batches:
+                start(self.batches[batch_id])
+
+    def add_parts(self, batch_id: str, count: int) -> None:
+        with self._lock:
+            if batch_id in self.batches:
+                add_parts(self.batches[batch_id], count)
+
+    def finish_part(self, batch_id: str, threats: List[Dict[str, Any]], error: Optional[str] = None) -> None:
+        with self._lock:
+            if batch_id in self.batches:
+                finish_part(self.batches[batch_id], threats, error)
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the progress and results of a batch, or None if it is unknown or expired."""
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            return dict(batch) if batch is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of tracked batches by status."""
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for batch in self.batches.values():
+                counts[batch["status"]] = counts.get(batch["status"], 0) + 1
+        return counts
+
+    def _trim(self) -> None:
+        """Forgets the oldest finished batches beyond max_batches."""
+        excess = len(self.batches) - self.max_batches
+        for batch_id in list(self.batches):
+            if excess <= 0:
+                break
+            if self.batches[batch_id]["status"] in FINISHED:
+                del self.batches[batch_id]
+                excess -= 1
+
+class SharedBatchStatus:
+    """SQLite-backed batch progress with the BatchStatus interface, shared by the API worker processes."""
+    # Writes can wait up to the 30 s busy timeout on other workers, so async callers run them in a thread
+    def __init__(self, path: str, max_batches: int = 10000, trim_every: int = 1000):
+        # Any worker can answer for a batch, whichever worker accepted it and whichever analyzed its parts
+        self.path = path
+        self.max_batches = max_batches
+        self.trim_every = trim_every
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS batches (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "batch_id TEXT UNIQUE NOT NULL, status TEXT NOT NULL, data TEXT NOT NULL)")
+
+    def open(self, batch_id: str, events: int, parts: int = 1) -> None:
+        batch = new_batch(batch_id, events, parts)
+        with self._lock:
+            self._conn.execute("INSERT INTO batches (batch_id, status, data) VALUES (?, ?, ?)",
+                               (batch_id, batch["status"], json.dumps(batch, default=str)))
+            self._opened += 1
+            trim = self._opened >= self.trim_every
+            if trim:
+                self._opened = 0
+        if trim:
+            self._trim()
+
+    def start(self, batch_id: str) -> None:
+        self._update(batch_id, start)
+
+    def add_parts(self, batch_id: str, count: int) -> None:
+        self._update(batch_id, lambda batch: add_parts(batch, count))
+
+    def finish_part(self, batch_id: str, threats: List[Dict[str, Any]], error: Optional[str] = None) -> None:
+        self._update(batch_id, lambda batch: finish_part(batch, threats, error))
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM batches GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _update(self, batch_id: str, change: Callable[[Dict[str, Any]], None]) -> None:
+        """Applies a change to a batch in one write transaction, so parts finished by other workers are not lost."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+                if row is not None:
+                    batch = json.loads(row[0])
+                    change(batch)
+                    self._conn.execute("UPDATE batches SET status = ?, data = ? WHERE batch_id = ?",
+                                       (batch["status"], json.dumps(batch, default=str), batch_id))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Whatever failed, including the change itself, the write lock must not stay held
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _trim(self) -> None:
+        """Deletes the oldest finished batches beyond max_batches."""
+        with self._lock:
+            self._conn.execute("DELETE FROM batches WHERE status IN ('completed', 'failed') AND seq <= "
+                               "(SELECT MAX(seq) FROM batches) - ?", (self.max_batches,))
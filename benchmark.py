@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import httpx
+from async_openai_client import AsyncOpenAIClient
+from data_analyzer import DataAnalyzer
+from data_gatherer import DataGatherer
+from event_generator import EventGenerator
+from llm_stub_server import LLMStubServer
+from openai_client import OpenAIClient
+
+STUB_API_KEY = "stub-api-key"
+STUB_PASSPHRASE = "stub-passphrase"
+
+def percentile(values: List[float], pct: float) -> float:
+    """Returns the pct-th percentile using nearest-rank on the sorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    return {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+            "max": max(latencies, default=0.0), "samples": len(latencies)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def stub_client(stub: LLMStubServer) -> AsyncOpenAIClient:
+    """Builds an async client against the stub with client-side rate limits disabled."""
+    encrypted = OpenAIClient.encrypt_api_key(STUB_API_KEY, STUB_PASSPHRASE)
+    return AsyncOpenAIClient(stub.url, encrypted, STUB_PASSPHRASE, requests_per_minute=None,
+                             tokens_per_minute=None, max_connections=64, backoff_base=0.05, backoff_max=1.0)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def bench_analyzer(args: argparse.Namespace, stub: LLMStubServer) -> Dict[str, Any]:
+    """Streams generated events through DataAnalyzer.analyze_data_batched in chunks."""
+    generator = EventGenerator(args.seed)
+    latencies, threats = [], 0
+    async with stub_client(stub) as client:
+        analyzer = DataAnalyzer(client, batch_size=args.llm_batch, max_concurrency=args.concurrency)
+        started = time.perf_counter()
+        remaining = args.events
+        while remaining > 0:
+            chunk = generator.batch(min(args.batch, remaining))
+            chunk_started = time.perf_counter()
+            threats += len(await analyzer.analyze_data_batched(chunk))
+            latencies.append(time.perf_counter() - chunk_started)
+            remaining -= len(chunk)
+        elapsed = time.perf_counter() - started
+    return {"seconds": elapsed, "latency": latency_summary(latencies), "threats": threats,
+            "prefilter": analyzer.prefilter.stats()}
+
+async def bench_api(args: argparse.Namespace, stub: LLMStubServer) -> Dict[str, Any]:
+    """Posts generated batches to POST /events and waits until the ingestion queue drains."""
+    from api_server import APIServer
+    from event_store import EventStore
+    generator = EventGenerator(args.seed)
+    latencies, rejected = [], 0
+    # The event store lives in a temporary directory, so runs leave nothing behind
+    with tempfile.TemporaryDirectory(prefix="bench_event_store_") as store_dir:
+        async with stub_client(stub) as client:
+            server = APIServer(client, host="127.0.0.1", port=free_port(), event_store=EventStore(store_dir))
+            server.data_analyzer.batch_size = args.llm_batch
+            server.data_analyzer.max_concurrency = args.concurrency
+            server_task = asyncio.create_task(server.serve())
+            base_url = f"http://127.0.0.1:{server.port}"
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+                while True:
+                    try:
+                        await http.get("/ingestion")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.05)
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def post(events: List[Dict[str, Any]]) -> None:
+                    nonlocal rejected
+                    async with semaphore:
+                        while True:
+                            request_started = time.perf_counter()
+                            response = await http.post("/events", json={"events": events})
+                            latencies.append(time.perf_counter() - request_started)
+                            if response.status_code != 429:
+                                return
+                            rejected += 1
+                            await asyncio.sleep(0.05)
+
+                started = time.perf_counter()
+                batches = [generator.batch(min(args.batch, args.events - i)) for i in range(0, args.events, args.batch)]
+                await asyncio.gather(*(post(batch) for batch in batches))
+                accepted = time.perf_counter() - started
+                while (await http.get("/ingestion")).json()["queued_events"] > 0:
+                    await asyncio.sleep(0.05)
+                elapsed = time.perf_counter() - started
+            server.shutdown()
+            await server_task
+    return {"seconds": elapsed, "accept_seconds": accepted, "latency": latency_summary(latencies),
+            "rejected_429": rejected, "prefilter": server.data_analyzer.prefilter.stats()}
+
+async def bench_toolkit(args: argparse.Namespace, stub: LLMStubServer) -> Dict[str, Any]:
+    """Runs DeceptionToolkit.run_once repeatedly on generated data, one batch per cycle."""
+    from main import DeceptionToolkit
+    encrypted = OpenAIClient.encrypt_api_key(STUB_API_KEY, STUB_PASSPHRASE)
+    # Logs, cursors and shared state go to a temporary directory instead of the working directory
+    with tempfile.TemporaryDirectory(prefix="bench_toolkit_") as state_dir:
+        toolkit = DeceptionToolkit(azure_endpoint=stub.url, encrypted_api_key=encrypted,
+                                   encryption_key=STUB_PASSPHRASE, use_async_client=True,
+                                   telemetry_csv=os.path.join(state_dir, "pattern_analysis.csv"),
+                                   shared_store_path=os.path.join(state_dir, "toolkit_state.db"),
+                                   log_path=os.path.join(state_dir, "toolkit_log.jsonl"),
+                                   gather_cursor_path=os.path.join(state_dir, "gather_cursors.json"))
+        toolkit.openai_client = stub_client(stub)
+        toolkit.data_gatherer = DataGatherer(event_generator=EventGenerator(args.seed), batch_size=args.batch,
+                                             cursor_path=toolkit.gather_cursor_path)
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(max(1, args.events // args.batch)):
+            cycle_started = time.perf_counter()
+            await toolkit.run_once()
+            latencies.append(time.perf_counter() - cycle_started)
+        elapsed = time.perf_counter() - started
+        await toolkit.openai_client.aclose()
+        toolkit.logger.close()
+    return {"seconds": elapsed, "latency": latency_summary(latencies),
+            "threats": len(toolkit.data_analyzer.threats), "deployed": len(toolkit.decoy_implementer.deployed_decoys)}
+
+SCENARIOS = {"analyzer": bench_analyzer, "api": bench_api, "toolkit": bench_toolkit}
+
+async def run_scenario(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    with LLMStubServer(latency=args.llm_latency, error_rate=args.llm_error_rate,
+                       rate_limit_rate=args.llm_429_rate, seed=args.seed) as stub:
+        result = await SCENARIOS[name](args, stub)
+        stub_stats = stub.stats()
+    events = max(1, args.events // args.batch) * args.batch if name == "toolkit" else args.events
+    return {
+        "scenario": name,
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("scenario", "output")},
+        "events": events,
+        "events_per_second": events / result["seconds"] if result["seconds"] else 0.0,
+        "llm_calls": stub_stats["requests"],
+        "llm_calls_per_event": stub_stats["requests"] / events if events else 0.0,
+        "llm_stub": stub_stats,
+        "peak_rss_mb": peak_rss_mb(),
+        **result
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the toolkit against a local LLM stub.")
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--events", type=int, default=10000, help="Total events to generate")
+    parser.add_argument("--batch", type=int, default=500, help="Events per request, chunk or toolkit cycle")
+    parser.add_argument("--llm-batch", type=int, default=50, help="Events per LLM prompt")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Stub seconds per LLM call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-429-rate", type=float, default=0.0)
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="JSON-lines file results are appended to")
+    args = parser.parse_args()
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    for name in names:
+        result = asyncio.run(run_scenario(name, args))
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        print(f"{name}: {result['events_per_second']:.0f} events/s, p95 {result['latency']['p95'] * 1000:.1f} ms, "
+              f"{result['llm_calls_per_event']:.3f} LLM calls/event, peak RSS {result['peak_rss_mb']:.0f} MB")
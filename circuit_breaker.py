@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+from metrics import REGISTRY
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = REGISTRY.gauge("toolkit_llm_circuit_state", "LLM circuit state: 0 closed, 1 half-open, 2 open",
+                               ("breaker",))
+CIRCUIT_TRANSITIONS = REGISTRY.counter("toolkit_llm_circuit_transitions_total", "LLM circuit state changes",
+                                       ("breaker", "state"))
+
+class CircuitBreaker:
+    """Stops calling a failing or slow LLM service for reset_timeout, then lets probe calls test its recovery."""
+    def __init__(self, name: str = "llm", failure_threshold: int = 5, latency_threshold: Optional[float] = 10.0,
+                 reset_timeout: float = 30.0, half_open_probes: int = 1):
+        # Calls slower than latency_threshold count as failures: a service that answers too late is down too
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(name, value=STATE_VALUES[CLOSED])
+
+    @property
+    def available(self) -> bool:
+        """Tells whether a call would be let through now, without claiming a probe."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == CLOSED or self._probes < self.half_open_probes
+
+    def allow(self) -> bool:
+        """Claims permission for one call; False means the caller should answer locally instead."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, ok: bool, latency: float) -> None:
+        """Records the outcome of an allowed call, closing or tripping the circuit as needed."""
+        with self._lock:
+            if ok and (self.latency_threshold is None or latency <= self.latency_threshold):
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._transition(CLOSED)
+                return
+            self.failures += 1
+            # A failed probe reopens the circuit at once
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the state, consecutive failures and calls rejected while open."""
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._probes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        CIRCUIT_STATE.set(self.name, value=STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.inc(self.name, state)
+        print(f"LLM circuit {self.name} is now {state}")
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from event_store import EventStore, SCHEMA
+from telemetry_listener import fit_row
+
+# Bytes per parse task: large enough to amortize the hand-off to a worker, small enough to bound memory in flight
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+# Columns of the attack telemetry CSV renamed to the event schema the analyzers expect
+FIELD_ALIASES = {
+    "event_id": "id",
+    "timestamp_start": "timestamp",
+    "alert_type": "event",
+    "src_ip": "source_ip",
+    "dst_ip": "destination_ip",
+    "dst_port": "port"
+}
+# Wall-clock seconds of captured time that paced replay delivers as one batch
+PACE_TICK = 0.1
+
+def chunk_ranges(path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Returns a CSV file's header and byte ranges of about chunk_bytes that each end on a line boundary."""
+    # Lines are split on raw newlines, so quoted fields must not span lines; the attack script and the
+    # event store never write such fields
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b"\n") + 1 or size
+            fields = next(csv.reader([mm[:header_end].decode("utf-8", "replace")]), [])
+            ranges, start = [], header_end
+            while start < size:
+                newline = mm.find(b"\n", min(start + chunk_bytes, size) - 1)
+                end = size if newline < 0 else newline + 1
+                ranges.append((start, end))
+                start = end
+    return fields, ranges
+
+def parse_range(path: str, start: int, end: int, fields: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """Parses the rows in one byte range of a memory-mapped CSV file; returns the events and the bad row count."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode("utf-8", "replace")
+    events, errors = [], 0
+    # Event store segments pack non-schema fields into their extra column
+    is_segment = tuple(fields) == SCHEMA
+    names = [FIELD_ALIASES.get(field, field) for field in fields]
+    for row in csv.reader(io.StringIO(text)):
+        if not row:
+            continue
+        # Attack script output written before it quoted the MITRE column carries extra fields
+        row = row if is_segment else fit_row(row, fields)
+        if row is None or len(row) != len(names):
+            errors += 1
+        elif is_segment:
+            events.append(EventStore._from_row(row))
+        else:
+            events.append({name: value for name, value in zip(names, row) if value != ""})
+    return events, errors
+
+def event_time(event: Dict[str, Any]) -> Optional[float]:
+    """Returns an event's ISO timestamp as epoch seconds, or None when it has none or it is unparseable."""
+    try:
+        return datetime.fromisoformat(str(event["timestamp"])).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+class CSVReplay:
+    """Replays captured CSV telemetry through the analyzers, parsing memory-mapped chunks in parallel processes."""
+    def __init__(self, data_analyzer=None, pattern_analyzer=None, workers: Optional[int] = None,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES, batch_size: int = 1000, speed: Optional[float] = None,
+                 pattern_interval: float = 60.0, concurrency: int = 4):
+        # Without a data analyzer the files are only parsed, which measures raw parsing throughput
+        self.data_analyzer = data_analyzer
+        self.pattern_analyzer = pattern_analyzer
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.batch_size = max(1, batch_size)
+        # Batches analyzed at once; each analyzer call also keeps its own LLM requests in flight
+        self.concurrency = max(1, concurrency)
+        # speed=60 replays an hour of captured events in a minute; None replays as fast as possible
+        self.speed = speed
+        # Seconds of event time between pattern analyses, like the live pattern interval
+        self.pattern_interval = pattern_interval
+        self.counts = {"files": 0, "bytes": 0, "events": 0, "parse_errors": 0, "threats": 0, "patterns": 0}
+        self.seconds = 0.0
+        self._started = 0.0
+        self._first_event_time: Optional[float] = None
+        self._last_pattern_time: Optional[float] = None
+        self._now: Optional[float] = None
+        self._pending_threats: List[Dict[str, Any]] = []
+
+    async def replay(self, paths: List[str]) -> Dict[str, Any]:
+        """Replays the files in order and returns throughput and detection counts."""
+        self._started = time.perf_counter()
+        self._first_event_time = self._last_pattern_time = self._now = None
+        self._pending_threats = []
+        in_flight: deque = deque()
+        try:
+            async for batch in self._batches(paths):
+                for part in self._split_by_due_time(batch) if self.speed else (batch,):
+                    in_flight.append(await self._start_batch(part))
+                    if len(in_flight) >= self.concurrency:
+                        await self._finish_batch(*in_flight.popleft())
+            while in_flight:
+                await self._finish_batch(*in_flight.popleft())
+        finally:
+            for task, _ in in_flight:
+                if task is not None:
+                    task.cancel()
+        if self._pending_threats:
+            await self._analyze_patterns()
+        self.seconds = time.perf_counter() - self._started
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns replay counts plus events and megabytes per second."""
+        seconds = self.seconds or 1e-9
+        return {**self.counts, "seconds": self.seconds, "events_per_second": self.counts["events"] / seconds,
+                "mb_per_second": self.counts["bytes"] / seconds / 1024 / 1024, "workers": self.workers,
+                "speed": self.speed, "concurrency": self.concurrency}
+
+    async def _batches(self, paths: List[str]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yields events in file order in batches of batch_size, parsing a few chunks ahead in worker processes."""
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        buffer: List[Dict[str, Any]] = []
+        try:
+            for path in paths:
+                fields, ranges = chunk_ranges(path, self.chunk_bytes)
+                self.counts["files"] += 1
+                self.counts["bytes"] += os.path.getsize(path)
+                in_flight, ranges = deque(), deque(ranges)
+                while ranges or in_flight:
+                    # Keep two chunks per worker queued so workers never wait on the analyzers
+                    while ranges and len(in_flight) < 2 * self.workers:
+                        start, end = ranges.popleft()
+                        if executor is None:
+                            in_flight.append(parse_range(path, start, end, fields))
+                        else:
+                            in_flight.append(asyncio.wrap_future(executor.submit(parse_range, path, start, end,
+                                                                                 fields)))
+                    result = in_flight.popleft()
+                    events, errors = result if executor is None else await result
+                    self.counts["parse_errors"] += errors
+                    buffer.extend(events)
+                    full = len(buffer) - len(buffer) % self.batch_size
+                    for i in range(0, full, self.batch_size):
+                        yield buffer[i:i + self.batch_size]
+                    buffer = buffer[full:]
+            if buffer:
+                yield buffer
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _split_by_due_time(self, batch: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Splits a batch into runs of events due in the same pacing tick, so paced replay is not batch-grained."""
+        parts, current, current_tick = [], [], None
+        for event in batch:
+            timestamp = event_time(event)
+            if timestamp is not None:
+                if self._first_event_time is None:
+                    self._first_event_time = timestamp
+                tick = int((timestamp - self._first_event_time) / self.speed / PACE_TICK)
+                if current and tick != current_tick:
+                    parts.append(current)
+                    current = []
+                current_tick = tick
+            current.append(event)
+        if current:
+            parts.append(current)
+        return parts
+
+    async def _start_batch(self, batch: List[Dict[str, Any]]) -> Tuple[Optional[asyncio.Task], Optional[float]]:
+        """Waits until a batch is due, then starts analyzing it; returns the analysis task and its event time."""
+        now = self._now
+        batch_time = next((t for t in map(event_time, batch) if t is not None), None)
+        if batch_time is not None:
+            now = self._now = next(t for t in map(event_time, reversed(batch)) if t is not None)
+            if self._first_event_time is None:
+                self._first_event_time = batch_time
+            if self.speed:
+                # Event time since the first event, compressed by speed, is when the batch is due
+                delay = (batch_time - self._first_event_time) / self.speed - (time.perf_counter() - self._started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        self.counts["events"] += len(batch)
+        if self.data_analyzer is None:
+            return None, now
+        # Tasks first run in creation order and the prefilter runs before the analyzer's first await, so the
+        # prefilter still sees events in file order while the LLM calls of several batches overlap
+        return asyncio.create_task(self.data_analyzer.analyze_data_batched(batch, now)), now
+
+    async def _finish_batch(self, task: Optional[asyncio.Task], now: Optional[float]) -> None:
+        """Collects a started batch's threats, running pattern analysis every pattern_interval of event time."""
+        if task is None:
+            return
+        threats = await task
+        self.counts["threats"] += len(threats)
+        self._pending_threats.extend(threats)
+        if self._last_pattern_time is None:
+            self._last_pattern_time = now
+        if now is not None and now - self._last_pattern_time >= self.pattern_interval:
+            await self._analyze_patterns(now)
+            self._last_pattern_time = now
+
+    async def _analyze_patterns(self, now: Optional[float] = None) -> None:
+        threats, self._pending_threats = self._pending_threats, []
+        if self.pattern_analyzer is not None:
+            now = now if now is not None else self._now
+            self.counts["patterns"] += len(await self.pattern_analyzer.analyze_patterns(threats, [], now))
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    data_analyzer = pattern_analyzer = client = stub = None
+    if not args.parse_only:
+        from data_analyzer import DataAnalyzer
+        from pattern_analyzer import PatternAnalyzer
+        if args.llm_stub:
+            from benchmark import stub_client
+            from llm_stub_server import LLMStubServer
+            stub = LLMStubServer().start()
+            client = stub_client(stub)
+        else:
+            from async_openai_client import AsyncOpenAIClient
+            client = AsyncOpenAIClient(os.environ.get("AZURE_ENDPOINT", "https://your-azure-openai-endpoint"),
+                                       os.environ.get("ENCRYPTED_API_KEY", "your-encrypted-api-key"),
+                                       os.environ.get("ENCRYPTION_KEY", "your-encryption-key"))
+        data_analyzer = DataAnalyzer(client)
+        pattern_analyzer = PatternAnalyzer(client)
+    replay = CSVReplay(data_analyzer, pattern_analyzer, workers=args.workers, chunk_bytes=args.chunk_mb * 1024 * 1024,
+                       batch_size=args.batch, speed=args.speed, concurrency=args.concurrency)
+    try:
+        return await replay.replay(args.paths)
+    finally:
+        if client is not None:
+            await client.aclose()
+        if stub is not None:
+            stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays captured CSV telemetry through the analyzers.")
+    parser.add_argument("paths", nargs="+", help="pattern_analysis.csv files or event store CSV segments, in order")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_BYTES // 1024 // 1024)
+    parser.add_argument("--batch", type=int, default=1000, help="Events per analyzer call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Analyzer calls in flight at once")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Replay speed as a multiple of captured time (default: as fast as possible)")
+    parser.add_argument("--parse-only", action="store_true", help="Only parse, to measure parsing throughput")
+    parser.add_argument("--llm-stub", action="store_true", help="Analyze against the local LLM stub")
+    result = asyncio.run(_run(parser.parse_args()))
+    print(json.dumps(result, indent=2))
+    print(f"Replayed {result['events']} events from {result['files']} files in {result['seconds']:.1f}s: "
+          f"{result['events_per_second']:.0f} events/s, {result['mb_per_second']:.1f} MB/s")
@@ -1,45 +1,208 @@
 import uuid
-import random
-import json
+import asyncio
+import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
-from openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional, Tuple
+from openai_client import OpenAIClient, send_prompt_async, llm_available
+from local_rules import LocalRules
+from verdict_cache import VerdictCache
+from event_prefilter import EventPrefilter, MALICIOUS, UNCERTAIN
+from record_store import RecordStore
+from metrics import timed, LLM_FALLBACKS
+from prompt_builder import ANOMALY, ANOMALY_BATCH
+from records import ThreatRecord
 
 class DataAnalyzer:
     """Analyzes collected data to identify potential threats using Azure OpenAI."""
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(self, openai_client: OpenAIClient, batch_size: int = 50, max_concurrency: int = 4,
+                 verdict_cache: Optional[VerdictCache] = None, prefilter: Optional[EventPrefilter] = None,
+                 store: Optional[RecordStore] = None, local_rules: Optional[LocalRules] = None,
+                 max_deferred: int = 100000):
         self.openai_client = openai_client
-        self.threats = []
-
-    def analyze_data(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Analyzes data for suspicious patterns using Azure OpenAI to detect anomalies."""
-        for entry in data:
-            if "error" not in entry:
-                if self._is_anomaly(entry):
-                    threat = {
-                        "id": str(uuid.uuid4()),
-                        "timestamp": datetime.datetime.now().isoformat(),
-                        "details": f"Anomaly detected: {entry}",
-                        "severity": random.choice(["low", "medium", "high"])
-                    }
-                    self.threats.append(threat)
-        return self.threats
-
-    def _is_anomaly(self, event: Dict[str, Any]) -> bool:
+        self.verdict_cache = verdict_cache
+        self.prefilter = prefilter if prefilter is not None else EventPrefilter()
+        self.local_rules = local_rules if local_rules is not None else LocalRules()
+        # Events judged by the local rules while the LLM failed, with their local verdicts, awaiting re-scoring
+        self.deferred: deque = deque(maxlen=max_deferred)
+        self.rescore_counts = {"rescored": 0, "missed_threats": 0, "false_positives": 0}
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.threats = store if store is not None else RecordStore(ThreatRecord)
+
+    @timed()
+    async def analyze_data(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Analyzes data for suspicious patterns using Azure OpenAI and returns the threats found in it."""
+        malicious, uncertain = self._prefilter([entry for entry in data if "error" not in entry])
+        found = [self._build_threat(entry, severity="high") for entry in malicious]
+        for entry in uncertain:
+            if await self._is_anomaly(entry):
+                found.append(self._build_threat(entry))
+        self.threats.extend(found)
+        return found
+
+    @timed()
+    async def analyze_data_batched(self, data: List[Dict[str, Any]],
+                                   now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Analyzes data in batches of events per prompt, keeping up to max_concurrency batches in flight."""
+        # now overrides the prefilter's clock, so replayed history is windowed by event time
+        malicious, events = self._prefilter([entry for entry in data if "error" not in entry], now)
+        batches = [events[i:i + self.batch_size] for i in range(0, len(events), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_batch(batch: List[Dict[str, Any]]) -> List[bool]:
+            async with semaphore:
+                return await self._analyze_batch(batch)
+
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        found = [self._build_threat(entry, severity="high") for entry in malicious]
+        for batch, verdicts in zip(batches, results):
+            for entry, is_anomaly in zip(batch, verdicts):
+                if is_anomaly:
+                    found.append(self._build_threat(entry))
+        self.threats.extend(found)
+        return found
+
+    @timed()
+    def _prefilter(self, events: List[Dict[str, Any]],
+                   now: Optional[float] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Splits events into locally confirmed threats and ambiguous ones that need the LLM."""
+        malicious, uncertain = [], []
+        for entry, label in zip(events, self.prefilter.classify_batch(events, now)):
+            if label == MALICIOUS:
+                malicious.append(entry)
+            elif label == UNCERTAIN:
+                uncertain.append(entry)
+        return malicious, uncertain
+
+    def _build_threat(self, entry: Dict[str, Any], severity: Optional[str] = None) -> Dict[str, Any]:
+        """Builds a threat record for an anomalous event."""
+        return {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now().isoformat(),
+            "details": f"Anomaly detected: {entry}",
+            "severity": severity or self.local_rules.severity(entry),
+            "source_ip": entry.get("source_ip"),
+            "event": entry.get("event"),
+            "destination_ip": entry.get("destination_ip")
+        }
+
+    @timed()
+    async def _is_anomaly(self, event: Dict[str, Any]) -> bool:
         """Uses Azure OpenAI to determine if an event is an anomaly."""
-        prompt = f"""
-        You are an AI specializing in anomaly detection for cybersecurity. Analyze the following event:
-        {json.dumps(event, indent=2)}
-        Determine if this event represents an anomaly (e.g., unusual login attempt, unexpected port access, or suspicious protocol usage). 
-        Return a JSON object with a single key 'is_anomaly' set to true if the event is an anomaly, false otherwise.
-        """
-        response = self.openai_client.send_prompt(prompt, max_tokens=50, temperature=0.3)
+        if self.verdict_cache:
+            cached = self.verdict_cache.get("is_anomaly", event)
+            if cached is not None:
+                return cached
+        prompt = ANOMALY.render_table([event])
+        started = time.perf_counter()
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=50, temperature=0.3,
+                                           caller="data_analyzer")
+        latency = time.perf_counter() - started
         # Handle response safely
         if "error" in response:
-            print(f"Error in anomaly detection: {response['error']}")
-            return False
+            if not response.get("circuit_open"):
+                print(f"Error in anomaly detection: {response['error']}")
+            LLM_FALLBACKS.inc("data_analyzer", "api_error")
+            return self._local_verdicts([event], defer=True)[0]
+        response_data = response.get("response", {})
+        if not isinstance(response_data, dict):
+            print(f"Unexpected response type: {type(response_data)}")
+            LLM_FALLBACKS.inc("data_analyzer", "unexpected_response")
+            return self.local_rules.is_anomaly(event)
+        if "is_anomaly" not in response_data:
+            LLM_FALLBACKS.inc("data_analyzer", "missing_verdict")
+            return self.local_rules.is_anomaly(event)
+        is_anomaly = bool(response_data["is_anomaly"])
+        if self.verdict_cache:
+            self.verdict_cache.set("is_anomaly", event, is_anomaly, latency)
+        return is_anomaly
+
+    async def _analyze_batch(self, batch: List[Dict[str, Any]]) -> List[bool]:
+        """Returns one anomaly verdict per event, answering from the verdict cache where possible."""
+        if not self.verdict_cache:
+            return await self._score_batch(batch)
+        verdicts = [self.verdict_cache.get("is_anomaly", entry) for entry in batch]
+        pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        if pending:
+            scored = await self._score_batch([batch[i] for i in pending])
+            for i, is_anomaly in zip(pending, scored):
+                verdicts[i] = is_anomaly
+        return verdicts
+
+    @timed()
+    async def _score_batch(self, batch: List[Dict[str, Any]]) -> List[bool]:
+        """Uses a single Azure OpenAI call to get one anomaly verdict per event in the batch."""
+        event_ids = self._batch_event_ids(batch)
+        # Instructions are sent once for the whole batch, followed by one compact row per event
+        prompt = ANOMALY_BATCH.render_table(dict(zip(event_ids, batch)))
+        # Leave room for one short "eN":bool pair per event in the reply
+        started = time.perf_counter()
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=20 + 8 * len(batch), temperature=0.3,
+                                           caller="data_analyzer_batch")
+        # Spread the call's latency over the events it answered
+        latency = (time.perf_counter() - started) / len(batch)
+        if "error" in response:
+            if not response.get("circuit_open"):
+                print(f"Error in batch anomaly detection: {response['error']}")
+            LLM_FALLBACKS.inc("data_analyzer_batch", "api_error", amount=len(batch))
+            return self._local_verdicts(batch, defer=True)
         response_data = response.get("response", {})
         if not isinstance(response_data, dict):
             print(f"Unexpected response type: {type(response_data)}")
-            return random.random() > 0.3  # Fallback
-        return response_data.get("is_anomaly", random.random() > 0.3)
\ No newline at end of file
+            LLM_FALLBACKS.inc("data_analyzer_batch", "unexpected_response", amount=len(batch))
+            return self._local_verdicts(batch)
+        verdicts = response_data.get("verdicts", {})
+        if not isinstance(verdicts, dict):
+            print(f"Unexpected verdicts type: {type(verdicts)}")
+            verdicts = {}
+        results = []
+        for entry, event_id in zip(batch, event_ids):
+            if event_id not in verdicts:
+                LLM_FALLBACKS.inc("data_analyzer_batch", "missing_verdict")
+                results.append(self.local_rules.is_anomaly(entry))
+                continue
+            is_anomaly = bool(verdicts[event_id])
+            if self.verdict_cache:
+                self.verdict_cache.set("is_anomaly", entry, is_anomaly, latency)
+            results.append(is_anomaly)
+        return results
+
+    async def rescore_deferred(self) -> List[Dict[str, Any]]:
+        """Re-scores events the local rules judged during an LLM outage and returns threats the rules missed."""
+        if not self.deferred or not llm_available(self.openai_client):
+            return []
+        count = min(len(self.deferred), self.batch_size * self.max_concurrency)
+        pending = [self.deferred.popleft() for _ in range(count)]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_batch(batch: List[Tuple[Dict[str, Any], bool]]) -> List[bool]:
+            async with semaphore:
+                return await self._analyze_batch([entry for entry, _ in batch])
+
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        found = []
+        for batch, verdicts in zip(batches, results):
+            for (entry, local_verdict), is_anomaly in zip(batch, verdicts):
+                # Events that failed again were deferred again with the same local verdict
+                if is_anomaly and not local_verdict:
+                    found.append(self._build_threat(entry))
+                elif local_verdict and not is_anomaly:
+                    self.rescore_counts["false_positives"] += 1
+        self.rescore_counts["rescored"] += len(pending)
+        self.rescore_counts["missed_threats"] += len(found)
+        self.threats.extend(found)
+        return found
+
+    def _local_verdicts(self, batch: List[Dict[str, Any]], defer: bool = False) -> List[bool]:
+        """Judges events with the local rules, deferring them for LLM re-scoring when the LLM call failed."""
+        verdicts = [self.local_rules.is_anomaly(entry) for entry in batch]
+        if defer:
+            self.deferred.extend(zip(batch, verdicts))
+        return verdicts
+
+    @staticmethod
+    def _batch_event_ids(batch: List[Dict[str, Any]]) -> List[str]:
+        """Returns a short positional key per event; event UUIDs would cost tokens in both prompt and reply."""
+        return [f"e{i}" for i in range(len(batch))]
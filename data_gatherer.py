@@ -1,34 +1,131 @@
-import uuid
-import random
+import asyncio
 import json
-import requests
-from datetime import datetime
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Optional, AsyncIterator
+from record_store import RecordStore
+from event_generator import EventGenerator
+from event_sources import GeneratorSource
+from metrics import REGISTRY, timed
+
+GATHERED_EVENTS = REGISTRY.counter("toolkit_gathered_events_total", "New events fetched per gathering source",
+                                   ("source",))
+GATHER_ERRORS = REGISTRY.counter("toolkit_gather_errors_total", "Failed fetches per gathering source", ("source",))
 
 class DataGatherer:
-    """Collects network and system data from an external API."""
-    def __init__(self, api_endpoint: str = "https://example.com/api"):
+    """Collects new network and system events from several sources concurrently, keeping a cursor per source."""
+    def __init__(self, api_endpoint: str = "https://example.com/api", store: Optional[RecordStore] = None,
+                 event_generator: Optional[EventGenerator] = None, batch_size: Optional[int] = None,
+                 sources: Optional[List[Any]] = None, chunk_size: int = 100,
+                 max_events_per_source: Optional[int] = 10000, cursor_path: Optional[str] = None,
+                 max_connections: int = 10, timeout: float = 10.0):
         self.api_endpoint = api_endpoint
-        self.data = []
+        self.data = store if store is not None else RecordStore()
+        self.event_generator = event_generator or EventGenerator()
+        self.batch_size = batch_size
+        # Without configured sources, the external API is simulated by the event generator
+        self.sources = list(sources) if sources else [GeneratorSource(self.event_generator, batch_size)]
+        names = [source.name for source in self.sources]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Source names must be unique: {names}")
+        self.chunk_size = chunk_size
+        self.max_events_per_source = max_events_per_source
+        self.cursor_path = cursor_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.counts = {name: {"events": 0, "errors": 0} for name in names}
+        self._session = None
+        if cursor_path and os.path.isfile(cursor_path):
+            self._load_cursors()
 
+    @timed()
     def fetch_data(self) -> List[Dict[str, Any]]:
-        """Fetches JSON data from an external API."""
+        """Fetches new events from all sources, for callers without a running event loop."""
+        return asyncio.run(self.fetch())
+
+    async def fetch(self, save_cursors: bool = True) -> List[Dict[str, Any]]:
+        """Fetches new events from all sources concurrently and returns them, advancing and saving the cursors."""
+        # Callers that only finish with the events later pass save_cursors=False and call save_cursors() then
+        events = await self._fetch_all()
+        if save_cursors:
+            self.save_cursors()
+        return events
+
+    async def stream(self, chunk_size: Optional[int] = None, follow: bool = False, poll_interval: float = 1.0,
+                     save_cursors: bool = True) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yields new events in chunks of chunk_size; with follow, keeps polling the sources until cancelled."""
+        size = chunk_size or self.chunk_size
+        while True:
+            events = await self._fetch_all()
+            for start in range(0, len(events), size):
+                yield events[start:start + size]
+            # Cursors are saved only once the consumer asked for the chunk after the last one, so a crash replays
+            # rather than loses events the consumer took; consumers that queue chunks for later work pass
+            # save_cursors=False and save a cursors() snapshot once that work is done
+            if save_cursors:
+                self.save_cursors()
+            if not follow:
+                return
+            if not events:
+                await asyncio.sleep(poll_interval)
+
+    async def aclose(self) -> None:
+        """Closes the pooled HTTP connections."""
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    def cursors(self) -> Dict[str, Any]:
+        return {source.name: source.cursor for source in self.sources}
+
+    def save_cursors(self, cursors: Optional[Dict[str, Any]] = None) -> None:
+        """Writes each source's cursor, or an earlier cursors() snapshot, to cursor_path, replacing it atomically."""
+        if not self.cursor_path:
+            return
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cursors if cursors is not None else self.cursors(), f)
+        os.replace(tmp_path, self.cursor_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns fetched event and error counts plus the current cursor of each source."""
+        return {source.name: {**self.counts[source.name], "cursor": source.cursor} for source in self.sources}
+
+    async def _fetch_all(self) -> List[Dict[str, Any]]:
+        results = await asyncio.gather(*(self._fetch_source(source) for source in self.sources))
+        events = [event for result in results for event in result]
+        if events:
+            self.data.extend(events)
+        return events
+
+    async def _fetch_source(self, source) -> List[Dict[str, Any]]:
+        """Fetches one source; a failing source is skipped until the next pass without affecting the others."""
+        try:
+            events = await source.fetch(self._get_session, self.max_events_per_source)
+        except Exception as e:
+            print(f"Error fetching events from {source.name}: {str(e)}")
+            self.counts[source.name]["errors"] += 1
+            GATHER_ERRORS.inc(source.name)
+            return []
+        self.counts[source.name]["events"] += len(events)
+        GATHERED_EVENTS.inc(source.name, amount=len(events))
+        return events
+
+    def _get_session(self):
+        """Returns the connection pool shared by all HTTP sources, creating it on first use."""
+        if self._session is None or self._session.is_closed:
+            import httpx
+            self._session = httpx.AsyncClient(timeout=self.timeout,
+                                              limits=httpx.Limits(max_connections=self.max_connections,
+                                                                  max_keepalive_connections=self.max_connections))
+        return self._session
+
+    def _load_cursors(self) -> None:
         try:
-            # Simulate API call with mock JSON response
-            mock_response = [
-                {
-                    "id": str(uuid.uuid4()),
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "source_ip": f"192.168.1.{random.randint(1, 255)}",
-                    "destination_ip": f"192.168.1.{random.randint(1, 255)}",
-                    "port": random.randint(1, 65535),
-                    "protocol": random.choice(["TCP", "UDP", "HTTP"]),
-                    "event": random.choice(["login_attempt", "file_access", "process_start"]),
-                    "user": f"user_{random.randint(1, 100)}",
-                    "status": random.choice(["success", "failed"])
-                } for _ in range(random.randint(1, 5))
-            ]
-            self.data.extend(mock_response)
-            return self.data
-        except requests.RequestException as e:
-            return [{"error": f"API fetch failed: {str(e)}"}]
\ No newline at end of file
+            with open(self.cursor_path) as f:
+                cursors = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable source cursors {self.cursor_path}: {str(e)}")
+            return
+        for source in self.sources:
+            if cursors.get(source.name) is not None:
+                source.cursor = cursors[source.name]
@@ -1,52 +1,146 @@
 import uuid
-import random
-import json
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any
-from openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional, Tuple
+from openai_client import OpenAIClient, send_prompt_async
+from local_rules import LocalRules
+from record_store import RecordStore
+from records import DecoyRecord
+from metrics import timed, LLM_FALLBACKS
+from prompt_builder import DECOY, DECOY_TEMPLATES
 
 class DecoyGenerator:
     """Generates decoy assets to mislead attackers using Azure OpenAI."""
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(self, openai_client: OpenAIClient, store: Optional[RecordStore] = None,
+                 group_by: Tuple[str, ...] = ("source_ip", "event", "severity"), max_templates: int = 1000,
+                 local_rules: Optional[LocalRules] = None):
         self.openai_client = openai_client
-        self.decoys = []
+        self.local_rules = local_rules if local_rules is not None else LocalRules()
+        self.decoys = store if store is not None else RecordStore(DecoyRecord)
+        self.group_by = group_by
+        self.max_templates = max_templates
+        # Validated templates by group key, least recently used first
+        self.templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending_templates: Dict[str, Dict[str, Any]] = {}
 
-    def generate_decoy(self, threat: Dict[str, Any]) -> Dict[str, Any]:
+    @timed()
+    async def generate_decoy(self, threat: Dict[str, Any]) -> Dict[str, Any]:
         """Creates a decoy based on threat analysis using Azure OpenAI."""
-        prompt = f"""
-        You are an AI specializing in deception technology. Based on the following threat data:
-        {json.dumps(threat, indent=2)}
-        Generate a realistic decoy to mislead the attacker. The decoy should be contextually relevant to the threat (e.g., fake file, honeypot service, or decoy user). 
-        Return a JSON object with keys: id, type, target, details, created_at.
-        """
-        response = self.openai_client.send_prompt(prompt, max_tokens=100, temperature=0.5)
+        prompt = DECOY.render_table([threat])
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=100, temperature=0.5,
+                                           caller="decoy_generator")
         if "error" in response:
-            decoy = {
-                "id": str(uuid.uuid4()),
-                "type": "fallback_decoy",
-                "target": threat.get("source_ip", "unknown"),
-                "details": "Fallback decoy due to API failure",
-                "created_at": datetime.datetime.now().isoformat()
-            }
+            LLM_FALLBACKS.inc("decoy_generator", "api_error")
+            decoy = self._local_decoy(threat)
         else:
             response_data = response.get("response", {})
             if not isinstance(response_data, dict):
                 print(f"Unexpected response type: {type(response_data)}")
-                decoy_type = random.choice(["fake_file", "honeypot_service", "decoy_user"])
-                decoy = {
-                    "id": str(uuid.uuid4()),
-                    "type": decoy_type,
-                    "target": threat.get("source_ip", "unknown"),
-                    "details": f"Decoy {decoy_type} for {threat.get('details', 'unknown')}",
-                    "created_at": datetime.datetime.now().isoformat()
-                }
+                LLM_FALLBACKS.inc("decoy_generator", "unexpected_response")
+                decoy = self._local_decoy(threat)
+            elif "decoy" not in response_data:
+                LLM_FALLBACKS.inc("decoy_generator", "missing_decoy")
+                decoy = self._local_decoy(threat)
             else:
-                decoy = response_data.get("decoy", {
-                    "id": str(uuid.uuid4()),
-                    "type": random.choice(["fake_file", "honeypot_service", "decoy_user"]),
-                    "target": threat.get("source_ip", "unknown"),
-                    "details": f"Decoy for {threat.get('details', 'unknown')}",
-                    "created_at": datetime.datetime.now().isoformat()
-                })
+                decoy = {**response_data["decoy"], "destination_ip": threat.get("destination_ip")}
         self.decoys.append(decoy)
-        return decoy
\ No newline at end of file
+        return decoy
+
+    def group_key(self, threat: Dict[str, Any]) -> str:
+        """Returns the key under which similar threats share one decoy template."""
+        return "|".join(str(threat.get(field, "unknown")) for field in self.group_by)
+
+    @timed()
+    async def generate_decoys(self, threats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Creates one decoy per threat, asking Azure OpenAI for at most one template per group of similar threats."""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for threat in threats:
+            groups.setdefault(self.group_key(threat), []).append(threat)
+        templates = {key: self.templates[key] for key in groups if key in self.templates}
+        for key in templates:
+            self.templates.move_to_end(key)
+        missing = {key: members for key, members in groups.items() if key not in templates}
+        if missing:
+            requested = await self._request_templates(missing)
+            templates.update(requested)
+            self._pending_templates.update(requested)
+            # Templates whose decoys never came back for validation are forgotten first
+            while len(self._pending_templates) > self.max_templates:
+                self._pending_templates.pop(next(iter(self._pending_templates)))
+        decoys = []
+        for key, members in groups.items():
+            template = templates[key]
+            decoys.extend(self._instantiate(key, template, threat) for threat in members)
+        self.decoys.extend(decoys)
+        return decoys
+
+    def is_validated(self, decoy: Dict[str, Any]) -> bool:
+        """Tells whether a decoy was instantiated from a template that already passed validation."""
+        return decoy.get("template") in self.templates
+
+    def record_validation(self, decoys: List[Dict[str, Any]], verdicts: List[bool]) -> None:
+        """Caches the templates of decoys that passed validation and drops those that failed."""
+        for decoy, is_valid in zip(decoys, verdicts):
+            key = decoy.get("template")
+            template = self._pending_templates.pop(key, None)
+            # Local templates stand in during an outage only, so the LLM is asked again once it recovers
+            if is_valid and template is not None and not template.get("local"):
+                self.templates[key] = template
+                self.templates.move_to_end(key)
+        while len(self.templates) > self.max_templates:
+            self.templates.popitem(last=False)
+
+    def discard_template(self, key: Optional[str]) -> None:
+        """Forgets a template, for example once the LLM rejects a decoy made from it."""
+        self.templates.pop(key, None)
+        self._pending_templates.pop(key, None)
+
+    async def _request_templates(self, groups: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Uses a single Azure OpenAI call to get one decoy template per group of similar threats."""
+        group_ids = {f"g{i}": key for i, key in enumerate(groups)}
+        summaries = {
+            group_id: {**dict(zip(self.group_by, key.split("|"))), "threats": len(groups[key]),
+                       "sample": groups[key][0].get("details")}
+            for group_id, key in group_ids.items()
+        }
+        prompt = DECOY_TEMPLATES.render_table(summaries)
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=20 + 60 * len(groups), temperature=0.5,
+                                           caller="decoy_generator_bulk")
+        if "error" in response:
+            if not response.get("circuit_open"):
+                print(f"Error in bulk decoy generation: {response['error']}")
+            LLM_FALLBACKS.inc("decoy_generator_bulk", "api_error", amount=len(groups))
+            return {key: self.local_rules.decoy_template(members[0]) for key, members in groups.items()}
+        response_data = response.get("response", {})
+        generated = response_data.get("templates", {}) if isinstance(response_data, dict) else {}
+        if not isinstance(generated, dict):
+            print(f"Unexpected templates type: {type(generated)}")
+            generated = {}
+        templates = {}
+        for group_id, key in group_ids.items():
+            template = generated.get(group_id)
+            if not isinstance(template, dict) or "type" not in template:
+                LLM_FALLBACKS.inc("decoy_generator_bulk", "missing_template")
+                templates[key] = self.local_rules.decoy_template(groups[key][0])
+                continue
+            templates[key] = {"type": template["type"], "details": str(template.get("details", ""))}
+        return templates
+
+    def _local_decoy(self, threat: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds a decoy from the local template engine when the LLM cannot provide one."""
+        return self._instantiate(self.group_key(threat), self.local_rules.decoy_template(threat), threat)
+
+    @staticmethod
+    def _instantiate(key: str, template: Dict[str, Any], threat: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds a decoy for one threat from its group's template."""
+        target = threat.get("source_ip") or "unknown"
+        return {
+            "id": str(uuid.uuid4()),
+            "type": template["type"],
+            "target": target,
+            "details": template["details"].replace("{target}", str(target)),
+            "created_at": datetime.now().isoformat(),
+            "template": key,
+            # The host the threat was aimed at, where the decoy is placed
+            "destination_ip": threat.get("destination_ip")
+        }
\ No newline at end of file
@@ -1,19 +1,44 @@
-import uuid
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from record_store import RecordStore
+from records import DeploymentRecord
+from metrics import timed
 
 class DecoyImplementer:
     """Deploys decoys into the environment."""
-    def __init__(self):
-        self.deployed_decoys = []
+    def __init__(self, store: Optional[RecordStore] = None, assets: Optional[Dict[str, str]] = None):
+        self.deployed_decoys = store if store is not None else RecordStore(DeploymentRecord)
+        # Decoy host inventory, by the asset names the attack telemetry reports them under; without one,
+        # decoys are deployed against their target only
+        self.assets = dict(assets or {})
+        self._assets_by_host = {host: asset_id for asset_id, host in self.assets.items()}
 
+    @timed()
     def deploy_decoy(self, decoy: Dict[str, Any]) -> Dict[str, Any]:
-        """Deploys a decoy into the network."""
+        """Deploys a decoy into the network, on the asset host its threat was aimed at, if there is one."""
+        asset_id, host = self.place(decoy.get("destination_ip"))
         deployment = {
             "decoy_id": decoy["id"],
             "status": "deployed",
-            "timestamp": datetime.datetime.now().isoformat(),
-            "details": f"Deployed {decoy['type']} to target {decoy['target']}"
+            "timestamp": datetime.now().isoformat(),
+            "details": f"Deployed {decoy['type']} to target {decoy['target']}",
+            "target": decoy["target"],
+            "asset_id": asset_id,
+            "host": host,
+            # The template the decoy was made from, so all of its decoys can be withdrawn if the template is rejected
+            "template": decoy.get("template")
         }
         self.deployed_decoys.append(deployment)
-        return deployment
\ No newline at end of file
+        return deployment
+
+    def place(self, destination: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Returns the (asset_id, host) for a threat destination: that host, else one in its /24, else none."""
+        if not destination:
+            return None, None
+        if destination in self._assets_by_host:
+            return self._assets_by_host[destination], destination
+        subnet = destination.rsplit(".", 1)[0] + "."
+        for host, asset_id in self._assets_by_host.items():
+            if host.startswith(subnet):
+                return asset_id, host
+        return None, None
@@ -0,0 +1,65 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterator
+
+# Services most routine traffic goes to, as (port, protocol)
+COMMON_SERVICES = [(22, "TCP"), (53, "UDP"), (80, "HTTP"), (443, "HTTP"), (445, "TCP"), (3389, "TCP")]
+
+class EventGenerator:
+    """Seeded generator of mock network events in the DataGatherer schema, reproducible for a given seed."""
+    def __init__(self, seed: Optional[int] = None, start_time: Optional[datetime] = None,
+                 events_per_second: float = 100.0, attacker_share: float = 0.05, attackers: int = 20,
+                 users: int = 100, unusual_share: float = 0.05, failure_rate: float = 0.02):
+        self.random = random.Random(seed)
+        # A fixed seed also fixes the clock, so repeated runs produce identical events; without a seed or start
+        # time the generator stands in for a live feed and stamps each event with the wall clock
+        self.live = seed is None and start_time is None
+        self.current_time = start_time or (datetime(2025, 1, 1) if seed is not None else datetime.now())
+        self.step = timedelta(seconds=1 / events_per_second)
+        self.attacker_share = attacker_share
+        self.attacker_ips = [f"185.220.{self.random.randint(1, 250)}.{self.random.randint(1, 250)}" for _ in range(attackers)]
+        # Routine traffic is users on their own workstation reaching common services, with the odd mistyped
+        # password; unusual_share of events come from elsewhere or go to an arbitrary port
+        self.home_ips = [f"192.168.1.{self.random.randint(1, 255)}" for _ in range(users)]
+        self.unusual_share = unusual_share
+        self.failure_rate = failure_rate
+
+    def event(self) -> Dict[str, Any]:
+        """Returns the next event; a small share comes from repeat attackers brute-forcing SSH."""
+        rng = self.random
+        if self.live:
+            self.current_time = datetime.now()
+        else:
+            self.current_time += self.step
+        user = rng.randrange(len(self.home_ips))
+        port, protocol = rng.choice(COMMON_SERVICES)
+        event = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "timestamp": self.current_time.isoformat(),
+            "source_ip": self.home_ips[user],
+            "destination_ip": f"192.168.1.{rng.randint(1, 255)}",
+            "port": port,
+            "protocol": protocol,
+            "event": rng.choice(["login_attempt", "file_access", "process_start"]),
+            "user": f"user_{user + 1}",
+            "status": "failed" if rng.random() < self.failure_rate else "success"
+        }
+        if rng.random() < self.unusual_share:
+            if rng.random() < 0.5:
+                event["source_ip"] = f"192.168.1.{rng.randint(1, 255)}"
+            else:
+                event.update(port=rng.randint(1024, 65535), protocol=rng.choice(["TCP", "UDP", "HTTP"]))
+        if rng.random() < self.attacker_share:
+            event.update(source_ip=rng.choice(self.attacker_ips), port=22, protocol="TCP",
+                         event="login_attempt", status="failed")
+        return event
+
+    def events(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yields count events lazily, so millions can be streamed without holding them in memory."""
+        for _ in range(count):
+            yield self.event()
+
+    def batch(self, size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns a batch of events; without a size, 1-5 events like the original API mock."""
+        return [self.event() for _ in range(size or self.random.randint(1, 5))]
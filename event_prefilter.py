@@ -0,0 +1,114 @@
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+BENIGN = "benign"
+MALICIOUS = "malicious"
+UNCERTAIN = "uncertain"
+# Score weights: only a failed-login burst reaching failed_login_threshold reaches the default malicious_above.
+# Rarity is a reason to ask the LLM, not a verdict: each rarity signal alone is above benign_below, and together
+# they are capped at MAX_RARITY_SCORE, below malicious_above, so a new user/IP pair on a rare port stays uncertain.
+FAILED_LOGIN_WEIGHT = 0.8
+RARE_COMBO_WEIGHT = 0.4
+NOVEL_PAIR_WEIGHT = 0.3
+MAX_RARITY_SCORE = 0.6
+
+class EventPrefilter:
+    """Scores events locally over a sliding window so only ambiguous ones need the LLM."""
+    def __init__(self, window_seconds: float = 300.0, bucket_seconds: float = 10.0,
+                 failed_login_threshold: int = 5, rare_combo_count: int = 3, warmup_events: int = 100,
+                 benign_below: float = 0.2, malicious_above: float = 0.8):
+        if malicious_above <= MAX_RARITY_SCORE:
+            raise ValueError(f"malicious_above must exceed the rarity score cap {MAX_RARITY_SCORE}")
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.failed_login_threshold = failed_login_threshold
+        self.rare_combo_count = rare_combo_count
+        self.warmup_events = warmup_events
+        self.benign_below = benign_below
+        self.malicious_above = malicious_above
+        # Each bucket holds (start, failed logins per source, events per port/protocol, event count)
+        self._buckets: deque = deque()
+        self._failed_totals: Dict[str, int] = {}
+        self._combo_totals: Dict[Tuple[Any, Any], int] = {}
+        self._window_events = 0
+        self._pairs_last_seen: Dict[Tuple[Any, Any], float] = {}
+        self.counts = {BENIGN: 0, MALICIOUS: 0, UNCERTAIN: 0}
+
+    def _advance(self, now: float) -> Tuple[Dict[str, int], Dict[Tuple[Any, Any], int]]:
+        """Expires buckets older than the window and returns the counters of the current bucket."""
+        bucket_start = now - now % self.bucket_seconds
+        if not self._buckets or self._buckets[-1][0] != bucket_start:
+            cutoff = now - self.window_seconds
+            while self._buckets and self._buckets[0][0] + self.bucket_seconds <= cutoff:
+                _, failed, combos, count = self._buckets.popleft()
+                self._subtract(self._failed_totals, failed)
+                self._subtract(self._combo_totals, combos)
+                self._window_events -= count[0]
+            self._pairs_last_seen = {pair: seen for pair, seen in self._pairs_last_seen.items() if seen > cutoff}
+            self._buckets.append((bucket_start, {}, {}, [0]))
+        return self._buckets[-1][1], self._buckets[-1][2]
+
+    @staticmethod
+    def _subtract(totals: Dict[Any, int], expired: Dict[Any, int]) -> None:
+        for key, count in expired.items():
+            remaining = totals[key] - count
+            if remaining:
+                totals[key] = remaining
+            else:
+                del totals[key]
+
+    def score_batch(self, events: List[Dict[str, Any]], now: Optional[float] = None) -> List[float]:
+        """Updates the window with a batch of events and returns a 0-1 suspicion score per event."""
+        now = time.time() if now is None else now
+        bucket_failed, bucket_combos = self._advance(now)
+        failed_totals = self._failed_totals
+        combo_totals = self._combo_totals
+        pairs_last_seen = self._pairs_last_seen
+        failed_scale = FAILED_LOGIN_WEIGHT / self.failed_login_threshold
+        rare_combo_count = self.rare_combo_count
+        warmed_up = self._window_events >= self.warmup_events
+        scores = []
+        append = scores.append
+        for event in events:
+            source_ip = event.get("source_ip")
+            score = rarity = 0.0
+            if event.get("status") == "failed" and event.get("event") == "login_attempt":
+                failed = failed_totals.get(source_ip, 0) + 1
+                failed_totals[source_ip] = failed
+                bucket_failed[source_ip] = bucket_failed.get(source_ip, 0) + 1
+                score = min(failed * failed_scale, FAILED_LOGIN_WEIGHT)
+            combo = (event.get("port"), event.get("protocol"))
+            if combo != (None, None):
+                seen = combo_totals.get(combo, 0)
+                combo_totals[combo] = seen + 1
+                bucket_combos[combo] = bucket_combos.get(combo, 0) + 1
+                if warmed_up and seen < rare_combo_count:
+                    rarity += RARE_COMBO_WEIGHT
+            user = event.get("user")
+            if user is not None:
+                pair = (user, source_ip)
+                if warmed_up and pair not in pairs_last_seen:
+                    rarity += NOVEL_PAIR_WEIGHT
+                pairs_last_seen[pair] = now
+            append(min(score + min(rarity, MAX_RARITY_SCORE), 1.0))
+        self._window_events += len(events)
+        self._buckets[-1][3][0] += len(events)
+        return scores
+
+    def classify_batch(self, events: List[Dict[str, Any]], now: Optional[float] = None) -> List[str]:
+        """Labels each event benign, malicious or uncertain from its local score."""
+        # Until the window has seen enough traffic, rarity is unknown and nothing is cleared as benign
+        benign_below = self.benign_below if self._window_events >= self.warmup_events else 0.0
+        malicious_above = self.malicious_above
+        labels = [BENIGN if score < benign_below else MALICIOUS if score >= malicious_above else UNCERTAIN
+                  for score in self.score_batch(events, now)]
+        for label in (BENIGN, MALICIOUS, UNCERTAIN):
+            self.counts[label] += labels.count(label)
+        return labels
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns label counts and the share of events settled without the LLM."""
+        total = sum(self.counts.values())
+        settled = self.counts[BENIGN] + self.counts[MALICIOUS]
+        return {**self.counts, "settled_locally_rate": settled / total if total else 0.0}
@@ -0,0 +1,146 @@
+import asyncio
+import csv
+import json
+import os
+from typing import List, Dict, Any, Optional, Callable, Union
+from event_generator import EventGenerator
+from event_store import EventStore
+
+# Every source has a unique name and a JSON-serializable cursor, and fetch(get_session, limit) returns
+# only the events that arrived after its cursor, advancing it
+
+class GeneratorSource:
+    """Simulated external API: every fetch returns a new batch from an EventGenerator."""
+    def __init__(self, event_generator: Optional[EventGenerator] = None, batch_size: Optional[int] = None,
+                 name: str = "mock"):
+        self.name = name
+        self.event_generator = event_generator or EventGenerator()
+        self.batch_size = batch_size
+        self.cursor = None
+
+    async def fetch(self, get_session: Callable[[], Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.event_generator.batch(self.batch_size)
+
+class HTTPSource:
+    """Polls a JSON endpoint for events after a cursor, over the gatherer's pooled session."""
+    def __init__(self, url: str, name: Optional[str] = None, params: Optional[Dict[str, Any]] = None):
+        self.name = name or url
+        self.url = url
+        self.params = params or {}
+        self.cursor: Optional[Dict[str, Any]] = None
+
+    async def fetch(self, get_session: Callable[[], Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Requests events after the cursor; replies are {"events": [...], "cursor": ...} or a bare list."""
+        params = dict(self.params)
+        if limit:
+            params["limit"] = limit
+        if self.cursor and "cursor" in self.cursor:
+            params["cursor"] = self.cursor["cursor"]
+        elif self.cursor:
+            params["since"] = self.cursor["timestamp"]
+        response = await get_session().get(self.url, params=params)
+        response.raise_for_status()
+        body = response.json()
+        events = (body.get("events") or []) if isinstance(body, dict) else body
+        events = [event for event in events if isinstance(event, dict)]
+        if isinstance(body, dict) and body.get("cursor") is not None:
+            self.cursor = {"cursor": body["cursor"]}
+            return events
+        return self._after_timestamp(events)
+
+    def _after_timestamp(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drops events already returned, for endpoints without cursors that may ignore since."""
+        last = self.cursor.get("timestamp", "") if self.cursor else ""
+        seen = set(self.cursor.get("ids", [])) if self.cursor else set()
+        fresh = [event for event in events
+                 if str(event.get("timestamp") or "") > last
+                 or (str(event.get("timestamp") or "") == last and str(event.get("id")) not in seen)]
+        if fresh:
+            newest = max(str(event.get("timestamp") or "") for event in fresh)
+            # Ids at the newest timestamp are kept so equal timestamps on the next page are not dropped or repeated
+            ids = [str(event.get("id")) for event in fresh if str(event.get("timestamp") or "") == newest]
+            self.cursor = {"timestamp": newest, "ids": ids + list(seen) if newest == last else ids}
+        return fresh
+
+class FileSource:
+    """Tails a CSV file with a header, or a JSON-lines file, returning complete rows appended since the last fetch."""
+    def __init__(self, path: str, name: Optional[str] = None, from_start: bool = True):
+        self.name = name or path
+        self.path = path
+        self.from_start = from_start
+        self.is_csv = path.lower().endswith(".csv")
+        self.parse_errors = 0
+        self.cursor: Optional[Dict[str, Any]] = None
+
+    async def fetch(self, get_session: Callable[[], Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.read, limit)
+
+    def read(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Reads up to limit rows after the cursor's byte offset."""
+        if not os.path.exists(self.path):
+            return []
+        events: List[Dict[str, Any]] = []
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            cursor = self.cursor or {}
+            offset, fields = cursor.get("offset", 0), cursor.get("fields")
+            if cursor and (cursor.get("inode") != stat.st_ino or stat.st_size < offset):
+                # The file was replaced or truncated: start over from its beginning
+                offset, fields = 0, None
+            f.seek(offset)
+            if self.is_csv and fields is None:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return events
+                fields = next(csv.reader([header.decode("utf-8", "replace")]))
+                offset = f.tell()
+            if self.cursor is None and not self.from_start:
+                offset = stat.st_size
+                f.seek(offset)
+            while limit is None or len(events) < limit:
+                line = f.readline()
+                # A partly written row is picked up next time
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                event = self._parse(line.decode("utf-8", "replace"), fields)
+                if event is None:
+                    self.parse_errors += 1
+                else:
+                    events.append(event)
+        self.cursor = {"inode": stat.st_ino, "offset": offset, "fields": fields}
+        return events
+
+    def _parse(self, line: str, fields: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        if fields is not None:
+            row = next(csv.reader([line]))
+            return dict(zip(fields, row)) if len(row) == len(fields) else None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        return event if isinstance(event, dict) else None
+
+class EventStoreSource:
+    """Reads events persisted by an EventStore sink, such as the API server's, after a segment cursor."""
+    def __init__(self, store: Union[EventStore, str], name: Optional[str] = None):
+        # The directory is usually the API server's live store; only its writer may rewrite segment indexes
+        self.store = store if isinstance(store, EventStore) else EventStore(store, read_only=True)
+        self.name = name or f"event_store:{self.store.directory}"
+        self.cursor: Optional[List[int]] = None
+
+    async def fetch(self, get_session: Callable[[], Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        events, self.cursor = await asyncio.to_thread(self.store.since, self.cursor, limit)
+        return events
+
+def source_from_spec(spec: str):
+    """Builds a source from a string: an http(s) URL, an event store directory, a CSV/JSON-lines file, or "mock"."""
+    if spec.startswith(("http://", "https://")):
+        return HTTPSource(spec)
+    if spec == "mock":
+        return GeneratorSource()
+    if os.path.isdir(spec):
+        return EventStoreSource(spec)
+    return FileSource(spec)
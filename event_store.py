@@ -0,0 +1,368 @@
+import csv
+import glob
+import io
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from metrics import timed
+
+# Columns every segment carries; anything else an event sends goes into the "extra" column as JSON
+CORE_FIELDS = ("id", "timestamp", "source_ip", "destination_ip", "port", "protocol", "event", "user", "status")
+SCHEMA = CORE_FIELDS + ("extra",)
+# CSV stores every value as text; these core fields are converted back when read
+FIELD_TYPES = {"port": int}
+COLUMNAR_MAGIC = b"EVC1"
+
+class EventStore:
+    """Buffered, rotating event sink with CSV or compact columnar segments and per-segment indexes."""
+    def __init__(self, directory: str = "event_store", segment_format: str = "csv",
+                 flush_events: int = 1000, flush_interval: float = 5.0, max_segment_events: int = 100000,
+                 read_only: bool = False):
+        if segment_format not in ("csv", "columnar"):
+            raise ValueError(f"Unknown segment format: {segment_format}")
+        self.directory = directory
+        self.segment_format = segment_format
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.max_segment_events = max_segment_events
+        # A read-only store reads a directory another process writes to, so it never touches the files there
+        self.read_only = read_only
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        self.indexes = self._load_indexes()
+        self._sequence = max((index["sequence"] for index in self.indexes), default=0)
+        # CSV segments keep growing until rotation; columnar segments are immutable once written
+        last = self.indexes[-1] if self.indexes else None
+        self._open_index = last if last and last["format"] == "csv" and last["count"] < max_segment_events else None
+        if read_only:
+            # Rewriting the index would race the writer's appended deltas and could drop some
+            self._open_index = None
+        elif self._open_index is not None:
+            # Fold the deltas appended before the last shutdown into one base line
+            self._save_index(self._open_index)
+
+    @timed()
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        """Buffers events, flushing when the buffer reaches flush_events."""
+        if not events:
+            return
+        if self.read_only:
+            raise RuntimeError(f"Event store {self.directory} is read-only.")
+        self._ensure_flusher()
+        with self._lock:
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.flush_events
+        if full:
+            self.flush()
+
+    @timed()
+    def flush(self) -> None:
+        """Writes all buffered events to segments."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            while events:
+                if self.segment_format == "columnar":
+                    chunk, events = events[:self.max_segment_events], events[self.max_segment_events:]
+                    self._write_columnar(chunk)
+                else:
+                    if self._open_index is None:
+                        self._open_index = self._new_index()
+                    room = self.max_segment_events - self._open_index["count"]
+                    chunk, events = events[:room], events[room:]
+                    self._append_csv(chunk)
+                    if self._open_index["count"] >= self.max_segment_events:
+                        self._save_index(self._open_index)
+                        self._open_index = None
+
+    def close(self) -> None:
+        """Stops the background flusher and writes any remaining events."""
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        with self._flush_lock:
+            if self._open_index is not None:
+                self._save_index(self._open_index)
+
+    def read(self, start: Optional[str] = None, end: Optional[str] = None,
+             source_ip: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yields stored events in a timestamp range and/or from one source IP, skipping segments by index."""
+        self.flush()
+        for index in list(self.indexes):
+            if start is not None and (index["max_ts"] or "") < start:
+                continue
+            if end is not None and (index["min_ts"] or "") > end:
+                continue
+            rows = None
+            if source_ip is not None:
+                rows = index["source_ips"].get(source_ip)
+                if not rows:
+                    continue
+            path = os.path.join(self.directory, index["segment"])
+            records = self._read_columnar(path, rows) if index["format"] == "columnar" else self._read_csv(path, rows)
+            for record in records:
+                timestamp = record.get("timestamp") or ""
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                yield record
+
+    def since(self, cursor: Optional[List[int]] = None,
+              limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Returns up to limit events stored after cursor, plus the cursor to pass next time."""
+        # A cursor is [segment sequence, byte offset (CSV) or row number (columnar)] and is found from the
+        # segment files themselves, so it also follows segments written by another process
+        self.flush()
+        sequence, position = cursor or (0, 0)
+        events: List[Dict[str, Any]] = []
+        for segment_sequence, path in self._segment_paths():
+            if segment_sequence < sequence:
+                continue
+            room = None if limit is None else limit - len(events)
+            if room is not None and room <= 0:
+                break
+            if segment_sequence > sequence:
+                sequence, position = segment_sequence, 0
+            if path.endswith(".evc"):
+                records = list(self._read_columnar(path, None))
+                chunk = records[position:] if room is None else records[position:position + room]
+                position += len(chunk)
+            else:
+                chunk, position = self._read_csv_from(path, position, room)
+            events.extend(chunk)
+        return events, [sequence, position]
+
+    def _segment_paths(self) -> List[Tuple[int, str]]:
+        """Returns the segment files on disk with their sequence numbers, oldest first."""
+        paths = []
+        for extension in ("csv", "evc"):
+            for path in glob.glob(os.path.join(self.directory, f"events-*.{extension}")):
+                try:
+                    paths.append((int(os.path.basename(path)[7:-4]), path))
+                except ValueError:
+                    continue
+        return sorted(paths)
+
+    def _ensure_flusher(self) -> None:
+        """Starts the time-based flusher thread on first write."""
+        if self._flusher is None and self.flush_interval and not self._closed.is_set():
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            if self._buffer:
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Error flushing event store: {str(e)}")
+
+    @staticmethod
+    def _to_row(event: Dict[str, Any]) -> List[Any]:
+        """Maps an event onto the stable schema, packing unknown fields into the extra column."""
+        extra = {key: value for key, value in event.items() if key not in CORE_FIELDS}
+        row = [event.get(field) for field in CORE_FIELDS]
+        row.append(json.dumps(extra, separators=(",", ":"), default=str) if extra else None)
+        return row
+
+    @staticmethod
+    def _from_row(row: List[Any]) -> Dict[str, Any]:
+        """Rebuilds an event from a schema row."""
+        record = {field: value for field, value in zip(CORE_FIELDS, row) if value not in (None, "")}
+        for field, convert in FIELD_TYPES.items():
+            if isinstance(record.get(field), str):
+                try:
+                    record[field] = convert(record[field])
+                except ValueError:
+                    pass
+        if row[-1]:
+            record.update(json.loads(row[-1]))
+        return record
+
+    def _new_index(self) -> Dict[str, Any]:
+        self._sequence += 1
+        extension = "evc" if self.segment_format == "columnar" else "csv"
+        index = {
+            "segment": f"events-{self._sequence:06d}.{extension}",
+            "sequence": self._sequence,
+            "format": self.segment_format,
+            "count": 0,
+            "min_ts": None,
+            "max_ts": None,
+            "source_ips": {}
+        }
+        self.indexes.append(index)
+        return index
+
+    @staticmethod
+    def _index_delta(rows: List[List[Any]], locations: List[int]) -> Dict[str, Any]:
+        """Indexes a batch of rows; locations are row numbers (columnar) or byte offsets (CSV)."""
+        timestamps = [str(row[1]) for row in rows if row[1]]
+        source_ips: Dict[str, List[int]] = {}
+        for row, location in zip(rows, locations):
+            source_ips.setdefault(str(row[2]), []).append(location)
+        return {"count": len(rows), "min_ts": min(timestamps, default=None), "max_ts": max(timestamps, default=None),
+                "source_ips": source_ips}
+
+    @staticmethod
+    def _merge_index(index: Dict[str, Any], delta: Dict[str, Any]) -> None:
+        """Adds an index delta to a segment index."""
+        if delta["min_ts"] is not None:
+            index["min_ts"] = delta["min_ts"] if index["min_ts"] is None else min(index["min_ts"], delta["min_ts"])
+            index["max_ts"] = delta["max_ts"] if index["max_ts"] is None else max(index["max_ts"], delta["max_ts"])
+        source_ips = index["source_ips"]
+        for source_ip, locations in delta["source_ips"].items():
+            source_ips.setdefault(source_ip, []).extend(locations)
+        index["count"] += delta["count"]
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        """Writes a segment's whole index, replacing its base line and deltas atomically."""
+        path = os.path.join(self.directory, f"{index['segment']}.idx")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+            f.write("\n")
+        os.replace(tmp_path, path)
+
+    def _append_index_delta(self, index: Dict[str, Any], delta: Dict[str, Any]) -> None:
+        """Appends one flush's delta to an open segment's index file; the whole index is written once it closes."""
+        with open(os.path.join(self.directory, f"{index['segment']}.idx"), "a") as f:
+            f.write(json.dumps(delta, separators=(",", ":")) + "\n")
+
+    def _load_indexes(self) -> List[Dict[str, Any]]:
+        """Loads each segment index from its base line plus the deltas appended since."""
+        indexes = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "events-*.idx"))):
+            try:
+                with open(path) as f:
+                    index = json.loads(f.readline())
+                    for line in f:
+                        try:
+                            self._merge_index(index, json.loads(line))
+                        except ValueError:
+                            # A delta cut short by a crash; the rows it covered are still in the segment
+                            print(f"Skipping truncated delta in segment index {path}")
+                            break
+                indexes.append(index)
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable segment index {path}: {str(e)}")
+        return sorted(indexes, key=lambda index: index["sequence"])
+
+    def _append_csv(self, events: List[Dict[str, Any]]) -> None:
+        index = self._open_index
+        path = os.path.join(self.directory, index["segment"])
+        rows = [self._to_row(event) for event in events]
+        # Rows are encoded up front so their byte offsets are known without a tell() per row
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        encoded = []
+        for row in rows:
+            writer.writerow(row)
+            encoded.append(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+        with open(path, mode="ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            if offset == 0:
+                writer.writerow(SCHEMA)
+                header = buffer.getvalue().encode()
+                f.write(header)
+                offset = len(header)
+                self._save_index(index)
+            offsets = []
+            for line in encoded:
+                offsets.append(offset)
+                offset += len(line)
+            f.write(b"".join(encoded))
+        delta = self._index_delta(rows, offsets)
+        self._merge_index(index, delta)
+        self._append_index_delta(index, delta)
+
+    def _read_csv(self, path: str, offsets: Optional[List[int]]) -> Iterator[Dict[str, Any]]:
+        with open(path, newline="") as f:
+            if offsets is None:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    yield self._from_row(row)
+                return
+            for offset in offsets:
+                f.seek(offset)
+                yield self._from_row(next(csv.reader(f)))
+
+    def _read_csv_from(self, path: str, offset: int,
+                       limit: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """Reads up to limit complete rows of a CSV segment from a byte offset; returns them and the new offset."""
+        records = []
+        consumed = [0]
+        exhausted = [False]
+        with open(path, "rb") as f:
+            f.seek(offset)
+
+            def lines() -> Iterator[str]:
+                # csv.reader pulls only the lines one row needs, so consumed is the byte length read so far
+                for line in f:
+                    # A row still being written by another process is picked up next time
+                    if not line.endswith(b"\n"):
+                        break
+                    consumed[0] += len(line)
+                    yield line.decode("utf-8", "replace")
+                exhausted[0] = True
+
+            reader = csv.reader(lines())
+            if offset == 0:
+                if next(reader, None) is None or exhausted[0]:
+                    return records, 0
+            start = offset
+            while limit is None or len(records) < limit:
+                row = next(reader, None)
+                # A quoted field running past the last complete line ends the row early; it is not a row yet
+                if row is None or exhausted[0]:
+                    break
+                records.append(self._from_row(row))
+                offset = start + consumed[0]
+        return records, offset
+
+    def _write_columnar(self, events: List[Dict[str, Any]]) -> None:
+        """Writes an immutable segment: magic, header length, JSON header, then one zlib block per column."""
+        index = self._new_index()
+        rows = [self._to_row(event) for event in events]
+        blocks = [zlib.compress(json.dumps([row[i] for row in rows], separators=(",", ":"), default=str).encode())
+                  for i in range(len(SCHEMA))]
+        columns, offset = [], 0
+        for name, block in zip(SCHEMA, blocks):
+            columns.append({"name": name, "offset": offset, "length": len(block)})
+            offset += len(block)
+        header = json.dumps({"count": len(rows), "columns": columns}).encode()
+        path = os.path.join(self.directory, index["segment"])
+        with open(path, "wb") as f:
+            f.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+            for block in blocks:
+                f.write(block)
+        self._merge_index(index, self._index_delta(rows, list(range(len(rows)))))
+        self._save_index(index)
+
+    def _read_columnar(self, path: str, row_numbers: Optional[List[int]]) -> Iterator[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            if f.read(4) != COLUMNAR_MAGIC:
+                raise ValueError(f"Not a columnar event segment: {path}")
+            header = json.loads(f.read(struct.unpack("<I", f.read(4))[0]))
+            data_start = f.tell()
+            columns = []
+            for column in header["columns"]:
+                f.seek(data_start + column["offset"])
+                columns.append(json.loads(zlib.decompress(f.read(column["length"]))))
+        for i in (row_numbers if row_numbers is not None else range(header["count"])):
+            yield self._from_row([column[i] for column in columns])
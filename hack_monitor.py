@@ -1,39 +1,186 @@
 import uuid
-import random
-import json
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import List, Dict, Any
-from openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional, Iterable, Set, Tuple
+from openai_client import OpenAIClient, send_prompt_async
+from local_rules import LocalRules
+from verdict_cache import VerdictCache
+from record_store import RecordStore, DEFAULT_MAX_RECORDS
+from records import AlertRecord
+from metrics import REGISTRY, timed, LLM_FALLBACKS
+from prompt_builder import ACCESS_CHECK
+from verdict_cache import VOLATILE_FIELDS
+
+# Interaction fields naming the touched decoy; the asset or host it runs on, as written by the attack telemetry;
+# and the attacker IP, which is the target decoys are deployed against
+DECOY_ID_FIELDS = ("decoy_id",)
+ASSET_FIELDS = ("decoy_asset_id", "dst_ip", "destination_ip")
+TARGET_FIELDS = ("src_ip", "source_ip", "target")
+# Most recent interactions per decoy included in an escalation prompt
+MAX_PROMPT_INTERACTIONS = 20
+# Per-event identifiers and timestamps the telemetry adds to every interaction
+IGNORED_FIELDS = VOLATILE_FIELDS | {"event_id", "timestamp_start", "timestamp_end"}
+
+INTERACTIONS = REGISTRY.counter("toolkit_decoy_interactions_total", "Pushed interaction events by whether they hit a deployed decoy", ("result",))
 
 class HackMonitor:
     """Monitors decoys for unauthorized access attempts using Azure OpenAI."""
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(self, openai_client: OpenAIClient, verdict_cache: Optional[VerdictCache] = None,
+                 store: Optional[RecordStore] = None, max_pending: int = 10000,
+                 local_rules: Optional[LocalRules] = None, max_tracked: int = DEFAULT_MAX_RECORDS):
         self.openai_client = openai_client
-        self.alerts = []
+        self.local_rules = local_rules if local_rules is not None else LocalRules()
+        self.verdict_cache = verdict_cache
+        self.alerts = store if store is not None else RecordStore(AlertRecord)
+        # Index of deployed decoys by ID, by asset name or host, and by target, so interactions match in O(1).
+        # Like the deployment store, it keeps the newest max_tracked decoys.
+        self.max_tracked = max_tracked
+        self.decoys_by_id: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.decoys_by_asset: Dict[str, Set[str]] = {}
+        self.decoys_by_target: Dict[str, Set[str]] = {}
+        self.decoys_by_template: Dict[str, Set[str]] = {}
+        self._pending: deque = deque(maxlen=max_pending)
 
-    def monitor_decoys(self, deployed_decoys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Monitors decoys for interactions using Azure OpenAI."""
-        for decoy in deployed_decoys:
-            prompt = f"""
-            You are an AI monitoring system for deception technology. Analyze the following deployed decoy:
-            {json.dumps(decoy, indent=2)}
-            Determine if there is evidence of unauthorized access or interaction with this decoy.
-            Return a JSON object with a single key 'is_accessed' set to true if unauthorized access is detected, false otherwise.
-            """
-            response = self.openai_client.send_prompt(prompt, max_tokens=50, temperature=0.3)
-            if "error" in response:
-                print(f"Error in decoy monitoring: {response['error']}")
-                continue
-            response_data = response.get("response", {})
-            if not isinstance(response_data, dict):
-                print(f"Unexpected response type: {type(response_data)}")
+    def track_decoy(self, deployment: Dict[str, Any]) -> None:
+        """Adds a deployed decoy to the index that pushed interactions are matched against."""
+        decoy_id = deployment["decoy_id"]
+        self.untrack_decoy(decoy_id)
+        self.decoys_by_id[decoy_id] = deployment
+        for index, key in self._index_keys(deployment):
+            index.setdefault(key, set()).add(decoy_id)
+        while len(self.decoys_by_id) > self.max_tracked:
+            self.untrack_decoy(next(iter(self.decoys_by_id)))
+
+    def untrack_decoy(self, decoy_id: str) -> None:
+        """Removes a decoy from the index, for example once it is torn down."""
+        deployment = self.decoys_by_id.pop(decoy_id, None)
+        if deployment is None:
+            return
+        for index, key in self._index_keys(deployment):
+            decoy_ids = index.get(key, set())
+            decoy_ids.discard(decoy_id)
+            if not decoy_ids:
+                index.pop(key, None)
+
+    def untrack_template(self, template: Optional[str]) -> List[str]:
+        """Removes every decoy made from a template, for example once the LLM rejects it, and returns their IDs."""
+        decoy_ids = list(self.decoys_by_template.get(template, ())) if template else []
+        for decoy_id in decoy_ids:
+            self.untrack_decoy(decoy_id)
+        return decoy_ids
+
+    def _index_keys(self, deployment: Dict[str, Any]) -> List[Tuple[Dict[str, Set[str]], str]]:
+        """Returns the (index, key) pairs a deployment is found under."""
+        keys = [(self.decoys_by_asset, str(deployment[field])) for field in ("asset_id", "host")
+                if deployment.get(field)]
+        if deployment.get("target"):
+            keys.append((self.decoys_by_target, str(deployment["target"])))
+        if deployment.get("template"):
+            keys.append((self.decoys_by_template, str(deployment["template"])))
+        return keys
+
+    def submit(self, interaction: Dict[str, Any]) -> None:
+        """Queues an interaction event pushed by a telemetry listener; the oldest are dropped when full."""
+        self._pending.append(interaction)
+
+    def match(self, interaction: Dict[str, Any]) -> Set[str]:
+        """Returns the IDs of the tracked decoys an interaction event touched."""
+        for field in DECOY_ID_FIELDS:
+            if interaction.get(field) in self.decoys_by_id:
+                return {interaction[field]}
+        # Activity on a decoy host touches the decoys placed there; otherwise, decoys deployed against the attacker
+        for fields, index in ((ASSET_FIELDS, self.decoys_by_asset), (TARGET_FIELDS, self.decoys_by_target)):
+            for field in fields:
+                decoy_ids = index.get(str(interaction.get(field)))
+                if decoy_ids:
+                    return set(decoy_ids)
+        return set()
+
+    @timed()
+    async def process_interactions(self) -> List[Dict[str, Any]]:
+        """Matches the queued interactions to decoys and asks Azure OpenAI only about decoys that were hit."""
+        hits: Dict[str, List[Dict[str, Any]]] = {}
+        while self._pending:
+            interaction = self._pending.popleft()
+            decoy_ids = self.match(interaction)
+            INTERACTIONS.inc("hit" if decoy_ids else "miss")
+            for decoy_id in decoy_ids:
+                hits.setdefault(decoy_id, []).append(interaction)
+        new_alerts = []
+        for decoy_id, interactions in hits.items():
+            decoy = self.decoys_by_id.get(decoy_id)
+            if decoy is None:
                 continue
-            if response_data.get("is_accessed", random.random() > 0.7):
+            recent = interactions[-MAX_PROMPT_INTERACTIONS:]
+            if await self._request_access_check(decoy, recent):
+                alert = {
+                    "id": str(uuid.uuid4()),
+                    "decoy_id": decoy_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "details": f"Unauthorized access detected on {decoy['details']}",
+                    "interactions": len(interactions),
+                    "source_ip": interactions[-1].get("src_ip") or interactions[-1].get("source_ip")
+                }
+                self.alerts.append(alert)
+                new_alerts.append(alert)
+        return new_alerts
+
+    @timed()
+    async def monitor_decoys(self, deployed_decoys: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Monitors decoys for interactions using Azure OpenAI and returns the new alerts."""
+        new_alerts = []
+        for decoy in deployed_decoys:
+            # A verdict on the decoy alone is not cached: access since the last sweep must not be hidden by an earlier
+            # False, nor an earlier True re-raised every sweep
+            if await self._request_access_check(decoy):
                 alert = {
                     "id": str(uuid.uuid4()),
                     "decoy_id": decoy["decoy_id"],
-                    "timestamp": datetime.datetime.now().isoformat(),
+                    "timestamp": datetime.now().isoformat(),
                     "details": f"Unauthorized access detected on {decoy['details']}"
                 }
                 self.alerts.append(alert)
-        return self.alerts
\ No newline at end of file
+                new_alerts.append(alert)
+        return new_alerts
+
+    async def _request_access_check(self, decoy: Dict[str, Any],
+                                    interactions: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Asks Azure OpenAI whether the deployed decoy, and any interactions observed on it, show unauthorized access."""
+        subject = self._cache_subject(decoy, interactions) if interactions else decoy
+        if interactions and self.verdict_cache:
+            cached = self.verdict_cache.get("is_accessed", subject)
+            if cached is not None:
+                return cached
+        sections = {"decoy": [decoy], "interactions": interactions} if interactions else {"decoy": [decoy]}
+        prompt = ACCESS_CHECK.render_sections(sections, drop=IGNORED_FIELDS)
+        started = time.perf_counter()
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=50, temperature=0.3,
+                                           caller="hack_monitor")
+        latency = time.perf_counter() - started
+        # Alerts cannot wait for the LLM to recover, so failures are answered by the local rules alone
+        if "error" in response:
+            if not response.get("circuit_open"):
+                print(f"Error in decoy monitoring: {response['error']}")
+            LLM_FALLBACKS.inc("hack_monitor", "api_error")
+            return self.local_rules.is_accessed(decoy, interactions)
+        response_data = response.get("response", {})
+        if not isinstance(response_data, dict):
+            print(f"Unexpected response type: {type(response_data)}")
+            LLM_FALLBACKS.inc("hack_monitor", "unexpected_response")
+            return self.local_rules.is_accessed(decoy, interactions)
+        if "is_accessed" not in response_data:
+            LLM_FALLBACKS.inc("hack_monitor", "missing_verdict")
+            return self.local_rules.is_accessed(decoy, interactions)
+        is_accessed = bool(response_data["is_accessed"])
+        if interactions and self.verdict_cache:
+            self.verdict_cache.set("is_accessed", subject, is_accessed, latency)
+        return is_accessed
+
+    @staticmethod
+    def _cache_subject(decoy: Dict[str, Any], interactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Builds the verdict cache key from the decoy ID and its interactions less IGNORED_FIELDS, as prompted."""
+        # The cache strips volatile fields only at the top level, so nested per-event ids are dropped here
+        return {"decoy_id": decoy["decoy_id"],
+                "interactions": [{key: value for key, value in interaction.items() if key not in IGNORED_FIELDS}
+                                 for interaction in interactions]}
@@ -0,0 +1,110 @@
+import asyncio
+import uuid
+from typing import List, Dict, Any, Optional, Callable, Union
+from batch_status import BatchStatus, SharedBatchStatus
+from data_analyzer import DataAnalyzer
+
+class IngestionQueue:
+    """Bounded in-memory queue of event batches drained into DataAnalyzer by background workers."""
+    def __init__(self, data_analyzer: DataAnalyzer, sink: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 max_queued_events: int = 100000, num_workers: int = 4, max_tracked_batches: int = 10000,
+                 batch_status: Optional[Union[BatchStatus, SharedBatchStatus]] = None):
+        self.data_analyzer = data_analyzer
+        self.sink = sink
+        self.max_queued_events = max_queued_events
+        self.num_workers = num_workers
+        self.queued_events = 0
+        # Worker processes share one batch status, so any of them can report a batch
+        self.batch_status = batch_status if batch_status is not None else BatchStatus(max_tracked_batches)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Starts the background workers on the running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stops the workers, first letting them finish queued batches when drain is set."""
+        if not self._workers:
+            return
+        if drain:
+            await self._queue.join()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, events: List[Dict[str, Any]], batch_id: Optional[str] = None,
+                     reserved: bool = False) -> Optional[str]:
+        """Queues a batch of events and returns its batch ID, or None when the queue is full."""
+        # With a batch_id, the events are one part of a batch already opened in batch_status, such as a
+        # part forwarded by another worker. With reserved, room for them was already claimed with reserve().
+        if self._queue is None:
+            raise RuntimeError("Ingestion queue has not been started.")
+        if not reserved and not self.reserve(len(events)):
+            return None
+        if batch_id is None:
+            try:
+                batch_id = await self.open_batch(len(events))
+            except BaseException:
+                self.release(len(events))
+                raise
+        self._queue.put_nowait((batch_id, events))
+        return batch_id
+
+    def reserve(self, events: int) -> bool:
+        """Claims room for events about to be queued, so other requests cannot fill it while the batch is opened."""
+        if self.queued_events + events > self.max_queued_events:
+            return False
+        self.queued_events += events
+        return True
+
+    def release(self, events: int) -> None:
+        """Gives back room claimed with reserve() for events that will not be queued here."""
+        self.queued_events -= events
+
+    async def open_batch(self, events: int, parts: int = 1) -> str:
+        """Starts tracking a batch whose parts are submitted separately and returns its batch ID."""
+        batch_id = str(uuid.uuid4())
+        # A shared batch status may wait on other workers' SQLite writes; the event loop must not
+        await asyncio.to_thread(self.batch_status.open, batch_id, events, parts)
+        return batch_id
+
+    async def status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the progress and results of a batch, or None if it is unknown or expired."""
+        return await asyncio.to_thread(self.batch_status.get, batch_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Returns queue depth and batch counts by status."""
+        return {
+            "queued_batches": self._queue.qsize() if self._queue else 0,
+            "queued_events": self.queued_events,
+            "max_queued_events": self.max_queued_events,
+            "workers": len(self._workers),
+            "batches": await asyncio.to_thread(self.batch_status.counts)
+        }
+
+    async def _worker(self) -> None:
+        """Takes batches off the queue, writes them to the sink and analyzes them."""
+        while True:
+            batch_id, events = await self._queue.get()
+            threats, error = [], None
+            try:
+                await asyncio.to_thread(self.batch_status.start, batch_id)
+                if self.sink:
+                    await asyncio.to_thread(self.sink, events)
+                threats = await self.data_analyzer.analyze_data_batched(events)
+            except Exception as e:
+                print(f"Error processing batch {batch_id}: {str(e)}")
+                error = str(e)
+            finally:
+                try:
+                    await asyncio.to_thread(self.batch_status.finish_part, batch_id, threats, error)
+                except Exception as e:
+                    print(f"Error recording batch {batch_id}: {str(e)}")
+                finally:
+                    self.queued_events -= len(events)
+                    self._queue.task_done()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlsplit, parse_qs
+from event_generator import EventGenerator
+from prompt_builder import row_keys
+
+class LLMStubServer:
+    """Local stand-in for the Azure OpenAI endpoint (latency, errors, 429s) that also serves GET /events."""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0,
+                 events_per_poll: int = 10):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.outcomes = {"ok": 0, "rate_limited": 0, "error": 0}
+        self.events_per_poll = events_per_poll
+        self.event_generator = EventGenerator(seed)
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "LLMStubServer":
+        """Starts serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stops the server and waits for the serving thread."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "LLMStubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _next_outcome(self) -> Tuple[str, float]:
+        """Draws the outcome of one request: ok, rate_limited or error."""
+        with self._lock:
+            self.request_count += 1
+            roll = self.random.random()
+            completion_roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            outcome = "rate_limited"
+        elif roll < self.rate_limit_rate + self.error_rate:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        with self._lock:
+            self.outcomes[outcome] += 1
+        return outcome, completion_roll
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns request counts by outcome."""
+        with self._lock:
+            return {"requests": self.request_count, **self.outcomes}
+
+    def events_after(self, cursor: int, limit: int) -> Dict[str, Any]:
+        """Generates the events that arrived since the previous poll and returns up to limit after cursor."""
+        with self._lock:
+            self.events.extend(self.event_generator.batch(self.events_per_poll))
+            page = self.events[cursor:cursor + limit]
+        return {"events": page, "cursor": cursor + len(page)}
+
+    @staticmethod
+    def build_completion(prompt: str, roll: float) -> Dict[str, Any]:
+        """Builds a JSON completion carrying the keys the toolkit components look for."""
+        now = datetime.now().isoformat()
+        content = {
+            "is_anomaly": roll > 0.3,
+            "is_valid": roll > 0.2,
+            "is_accessed": roll > 0.7,
+            # Each row gets its own roll, derived from the request's, so batches get mixed verdicts
+            "verdicts": {key: random.Random(f"{roll}:{key}").random() > 0.3 for key in row_keys(prompt)},
+            "templates": {
+                group_id: {"type": ["fake_file", "honeypot_service", "decoy_user"][i % 3],
+                           "details": "Stub decoy template on {target}"}
+                for i, group_id in enumerate(row_keys(prompt))
+            },
+            "decoy": {
+                "id": str(uuid.uuid4()),
+                "type": ["fake_file", "honeypot_service", "decoy_user"][int(roll * 3) % 3],
+                "target": "unknown",
+                "details": "Stub decoy",
+                "created_at": now
+            },
+            "pattern": {
+                "id": str(uuid.uuid4()),
+                "timestamp": now,
+                "details": "Stub pattern",
+                "common_sources": []
+            }
+        }
+        return {"choices": [{"text": json.dumps(content)}]}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._reply(400, {"error": "invalid JSON"})
+                    return
+                outcome, roll = stub._next_outcome()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if outcome == "rate_limited":
+                    self._reply(429, {"error": "rate limited"}, {"Retry-After": "0"})
+                elif outcome == "error":
+                    self._reply(500, {"error": "stub server error"})
+                else:
+                    self._reply(200, stub.build_completion(payload.get("prompt", ""), roll))
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.rstrip("/") != "/events":
+                    self._reply(404, {"error": "not found"})
+                    return
+                query = parse_qs(url.query)
+                try:
+                    cursor = int(query.get("cursor", ["0"])[0])
+                    limit = int(query.get("limit", ["1000"])[0])
+                except ValueError:
+                    self._reply(400, {"error": "invalid cursor or limit"})
+                    return
+                self._reply(200, stub.events_after(cursor, limit))
+
+            def _reply(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub for the Azure OpenAI endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = LLMStubServer(args.host, args.port, args.latency, args.error_rate, args.rate_limit_rate, args.seed)
+    print(f"LLM stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,70 @@
+import zlib
+from typing import List, Dict, Any, Optional
+
+# Ports attackers probe for remote access and databases
+SENSITIVE_PORTS = {22, 23, 445, 1433, 3306, 3389, 5432, 5900}
+WEB_PORTS = {80, 443, 8000, 8080, 8443}
+PRIVILEGED_USERS = {"root", "admin", "administrator"}
+FAILED_STATUSES = {"failed", "failure", "denied"}
+HIGH_SEVERITIES = {"high", "critical"}
+# Decoy templates by event type; {target} is replaced with the attacked host
+EVENT_TEMPLATES = {
+    "login_attempt": {"type": "decoy_user",
+                      "details": "Decoy account svc_backup with a honeytoken password on {target}"},
+    "file_access": {"type": "fake_file",
+                    "details": "Fake credentials spreadsheet passwords_2025.xlsx shared from {target}"},
+    "process_start": {"type": "honeypot_service",
+                      "details": "Honeypot SSH service mimicking OpenSSH 8.9 on {target}"}
+}
+
+def _port(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class LocalRules:
+    """Deterministic rule-based verdicts and decoy templates, used instead of the LLM while it is failing."""
+    def __init__(self, anomaly_threshold: float = 0.5):
+        self.anomaly_threshold = anomaly_threshold
+
+    def anomaly_score(self, event: Dict[str, Any]) -> float:
+        """Scores an event from 0 to 1 on failed access, sensitive ports, privileged users and reported severity."""
+        score = 0.0
+        port = _port(event.get("port"))
+        if str(event.get("status", "")).lower() in FAILED_STATUSES:
+            score += 0.4
+        if port in SENSITIVE_PORTS:
+            score += 0.3
+        if str(event.get("user", "")).lower() in PRIVILEGED_USERS:
+            score += 0.3
+        if str(event.get("severity", "")).lower() in HIGH_SEVERITIES:
+            score += 0.6
+        if str(event.get("protocol", "")).upper() == "HTTP" and port is not None and port not in WEB_PORTS:
+            score += 0.2
+        return min(1.0, score)
+
+    def is_anomaly(self, event: Dict[str, Any]) -> bool:
+        return self.anomaly_score(event) >= self.anomaly_threshold
+
+    def severity(self, event: Dict[str, Any]) -> str:
+        """Grades a threat from its event's anomaly score."""
+        score = self.anomaly_score(event)
+        return "high" if score >= 0.8 else "medium" if score >= self.anomaly_threshold else "low"
+
+    def is_valid_decoy(self, decoy: Dict[str, Any]) -> bool:
+        """Accepts decoys with a type, a target and details with no unfilled placeholder."""
+        details = str(decoy.get("details") or "")
+        return bool(decoy.get("type")) and bool(decoy.get("target")) and bool(details) and "{target}" not in details
+
+    def is_accessed(self, decoy: Dict[str, Any], interactions: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Nothing legitimate touches a decoy, so any observed interaction counts as access."""
+        return bool(interactions)
+
+    def decoy_template(self, threat: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the template for the threat's event type, or a stable choice per event type for unknown ones."""
+        event = str(threat.get("event") or "unknown")
+        template = EVENT_TEMPLATES.get(event)
+        if template is None:
+            template = EVENT_TEMPLATES[list(EVENT_TEMPLATES)[zlib.crc32(event.encode()) % len(EVENT_TEMPLATES)]]
+        return {**template, "local": True}
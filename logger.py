@@ -1,29 +1,178 @@
+import glob
+import gzip
+import itertools
+import json
+import os
+import shutil
+import threading
 import uuid
 import random
 from datetime import datetime
-from typing import Dict, Any
+from typing import List, Dict, Any, Optional, Iterator
+from record_store import RecordStore
+from records import LogRecord
+from metrics import timed
 
 class Logger:
-    """Handles logging and response actions."""
-    def __init__(self):
-        self.logs = []
+    """Handles logging and response actions, writing JSON lines from a background thread with size-based rotation."""
+    def __init__(self, store: Optional[RecordStore] = None, path: Optional[str] = None,
+                 flush_events: int = 256, flush_interval: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+                 backups: int = 5, max_buffered: int = 100000):
+        # Recent entries stay in memory for quick reads; the file under path keeps the full history
+        self.logs = store if store is not None else RecordStore(LogRecord)
+        self.path = path
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_buffered = max_buffered
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        # Entry IDs are a per-logger random prefix plus a counter, much cheaper than a uuid4 per entry
+        self._id_prefix = uuid.uuid4().hex[:12]
+        self._ids = itertools.count()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
 
     def log_event(self, event: Dict[str, Any]) -> None:
-        """Logs events to a file or system."""
+        """Logs an event; the file write happens later on the writer thread."""
         log_entry = {
-            "id": str(uuid.uuid4()),
-            "timestamp": datetime.datetime.now().isoformat(),
+            "id": f"{self._id_prefix}-{next(self._ids)}",
+            "timestamp": datetime.now().isoformat(),
             "event": event
         }
         self.logs.append(log_entry)
+        if not self.path or self._closed.is_set():
+            return
+        self._ensure_writer()
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self._buffer.append(log_entry)
+            full = len(self._buffer) >= self.flush_events
+        if full:
+            self._wake.set()
 
+    @timed()
     def respond_to_threat(self, alert: Dict[str, Any]) -> Dict[str, Any]:
         """Responds to a detected threat."""
         response = {
             "alert_id": alert["id"],
-            "timestamp": datetime.datetime.now().isoformat(),
+            "timestamp": datetime.now().isoformat(),
             "action": random.choice(["block_ip", "alert_admin", "isolate_system"]),
             "details": f"Responded to {alert['details']}"
         }
         self.log_event(response)
-        return response
\ No newline at end of file
+        return response
+
+    def flush(self) -> None:
+        """Writes all buffered entries to the log file, rotating it when it outgrows max_bytes."""
+        if not self.path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+            data = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+            with open(self.path, "a") as f:
+                f.write(data)
+            self.written += len(entries)
+            if os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+
+    def close(self) -> None:
+        """Stops the writer thread and writes any remaining entries."""
+        self._closed.set()
+        self._wake.set()
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+
+    def query(self, start: Optional[str] = None, end: Optional[str] = None,
+              step: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Streams logged entries, oldest first, in an ISO timestamp range and/or for one workflow step."""
+        if not self.path:
+            entries: Iterator[Dict[str, Any]] = iter(self.logs)
+        else:
+            self.flush()
+            entries = self._read_files()
+        for entry in entries:
+            timestamp = entry.get("timestamp") or ""
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                continue
+            if step is not None and (entry.get("event") or {}).get("step") != step:
+                continue
+            yield entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns where the log goes and how many entries were written, dropped or kept in memory."""
+        return {
+            "path": self.path,
+            "written": self.written,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "in_memory": len(self.logs)
+        }
+
+    def _ensure_writer(self) -> None:
+        """Starts the writer thread on first log."""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_periodically, name="log-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_periodically(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing log file {self.path}: {str(e)}")
+
+    def _rotated_path(self, number: int) -> str:
+        return f"{self.path}.{number}.gz"
+
+    def _rotate(self) -> None:
+        """Shifts older archives up one number and compresses the current file into archive 1."""
+        for number in range(self.backups, 0, -1):
+            source = self._rotated_path(number)
+            if not os.path.exists(source):
+                continue
+            if number == self.backups:
+                os.remove(source)
+            else:
+                os.replace(source, self._rotated_path(number + 1))
+        if self.backups > 0:
+            with open(self.path, "rb") as f_in, gzip.open(self._rotated_path(1), "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        os.remove(self.path)
+        self.rotations += 1
+
+    def _read_files(self) -> Iterator[Dict[str, Any]]:
+        """Yields entries from the compressed archives, oldest first, then from the current file."""
+        archives = glob.glob(f"{glob.escape(self.path)}.*.gz")
+        archives.sort(key=lambda path: int(path[len(self.path) + 1:-3]), reverse=True)
+        for path in archives + [self.path]:
+            try:
+                opener = gzip.open if path.endswith(".gz") else open
+                with opener(path, "rt") as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+            except FileNotFoundError:
+                continue
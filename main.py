@@ -1,6 +1,11 @@
 import json
+import os
 import asyncio
+import signal
+from functools import cached_property
+from typing import Dict, List, Optional, Type
 from data_gatherer import DataGatherer
+from event_sources import source_from_spec
 from data_analyzer import DataAnalyzer
 from decoy_generator import DecoyGenerator
 from ai_validator import AIValidator
@@ -8,61 +13,354 @@ from decoy_implementer import DecoyImplementer
 from hack_monitor import HackMonitor
 from logger import Logger
 from pattern_analyzer import PatternAnalyzer
-from openai_client import OpenAIClient
-from api_server import APIServer
+from openai_client import OpenAIClient, shared_client
+from verdict_cache import VerdictCache
+from pipeline_scheduler import PipelineScheduler
+from telemetry_listener import TelemetryListener
+from metrics import REGISTRY
+from record_store import RecordStore, DEFAULT_MAX_RECORDS
+from shared_record_store import SharedRecordStore
+from records import (Record, ThreatRecord, DecoyRecord, ValidationRecord, DeploymentRecord,
+                     AlertRecord, LogRecord, PatternRecord)
+
+# Seconds between runs of each periodic pipeline source
+# Monitoring only drains pushed interactions, so it can run often at no cost when idle
+# Re-scoring only calls the LLM when work was deferred during an outage and the circuit lets calls through
+DEFAULT_INTERVALS = {"gather": 10.0, "monitor": 1.0, "patterns": 60.0, "rescore": 30.0}
 
 class DeceptionToolkit:
-    """Orchestrates the deception technology components."""
+    """Orchestrates the deception technology components, building each one on first use."""
     def __init__(self, api_endpoint: str = "https://example.com/api", 
                  azure_endpoint: str = "https://your-azure-openai-endpoint", 
                  encrypted_api_key: str = "your-encrypted-api-key", 
-                 encryption_key: str = "your-encryption-key"):
-        self.openai_client = OpenAIClient(azure_endpoint, encrypted_api_key, encryption_key)
-        self.data_gatherer = DataGatherer(api_endpoint)
-        self.data_analyzer = DataAnalyzer(self.openai_client)
-        self.decoy_generator = DecoyGenerator(self.openai_client)
-        self.ai_validator = AIValidator(self.openai_client)
-        self.decoy_implementer = DecoyImplementer()
-        self.hack_monitor = HackMonitor(self.openai_client)
-        self.logger = Logger()
-        self.pattern_analyzer = PatternAnalyzer(self.openai_client)
-        self.api_server = APIServer(self.openai_client)
+                 encryption_key: str = "your-encryption-key",
+                 use_async_client: bool = False,
+                 verdict_cache_path: Optional[str] = None,
+                 retention: int = DEFAULT_MAX_RECORDS, spill_dir: Optional[str] = None,
+                 intervals: Optional[Dict[str, float]] = None, stage_concurrency: int = 4,
+                 queue_size: int = 1000, shutdown_timeout: float = 30.0, bulk_decoys: bool = True,
+                 telemetry_csv: Optional[str] = "pattern_analysis.csv", telemetry_port: Optional[int] = None,
+                 api_workers: int = 1, shared_store_path: str = "toolkit_state.db",
+                 log_path: Optional[str] = "toolkit_log.jsonl", event_sources: Optional[List[str]] = None,
+                 gather_cursor_path: Optional[str] = "gather_cursors.json",
+                 decoy_assets: Optional[Dict[str, str]] = None):
+        self.decoy_assets = decoy_assets
+        self.event_sources = event_sources
+        self.gather_cursor_path = gather_cursor_path
+        self.log_path = log_path
+        self.api_workers = api_workers
+        self.shared_store_path = shared_store_path
+        self.telemetry_csv = telemetry_csv
+        self.telemetry_port = telemetry_port
+        self.retention = retention
+        self.bulk_decoys = bulk_decoys
+        self.spill_dir = spill_dir
+        self.intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        self.stage_concurrency = stage_concurrency
+        self.queue_size = queue_size
+        self.shutdown_timeout = shutdown_timeout
+        self.api_endpoint = api_endpoint
+        self.azure_endpoint = azure_endpoint
+        self.encrypted_api_key = encrypted_api_key
+        self.encryption_key = encryption_key
+        self.use_async_client = use_async_client
+        self.verdict_cache_path = verdict_cache_path
+        self.scheduler = self._build_scheduler()
+        self._stores: Dict[str, RecordStore] = {}
+        REGISTRY.gauge("toolkit_stage_queue_depth", "Items waiting in each pipeline stage queue", ("stage",),
+                       callback=lambda: {(stage.name,): stage.queue.qsize() for stage in self.scheduler.stages})
+        REGISTRY.gauge("toolkit_record_store_size", "Records held in memory by each component store", ("store",),
+                       callback=lambda: {(name,): len(store) for name, store in self._stores.items()})
+        self._threat_cursor = 0
+        self._alert_cursor = 0
+
+    @cached_property
+    def openai_client(self):
+        if self.use_async_client:
+            from async_openai_client import AsyncOpenAIClient
+            client_class = AsyncOpenAIClient
+        else:
+            client_class = OpenAIClient
+        return shared_client(client_class, self.azure_endpoint, self.encrypted_api_key, self.encryption_key)
+
+    @cached_property
+    def verdict_cache(self) -> VerdictCache:
+        return VerdictCache(persist_path=self.verdict_cache_path)
+
+    @cached_property
+    def data_gatherer(self) -> DataGatherer:
+        # Without configured sources the gatherer simulates the external API
+        sources = [source_from_spec(spec) for spec in self.event_sources] if self.event_sources else None
+        return DataGatherer(self.api_endpoint, store=self._store("events"), sources=sources,
+                            cursor_path=self.gather_cursor_path)
+
+    @cached_property
+    def data_analyzer(self) -> DataAnalyzer:
+        if self.api_workers > 1:
+            # API worker processes record their threats here too, so pattern analysis sees them all
+            threats = self._stores["threats"] = SharedRecordStore(self.shared_store_path, "threats", ThreatRecord,
+                                                                  max_records=self.retention)
+        else:
+            threats = self._store("threats", ThreatRecord)
+        return DataAnalyzer(self.openai_client, verdict_cache=self.verdict_cache, store=threats)
+
+    @cached_property
+    def decoy_generator(self) -> DecoyGenerator:
+        return DecoyGenerator(self.openai_client, store=self._store("decoys", DecoyRecord))
+
+    @cached_property
+    def ai_validator(self) -> AIValidator:
+        return AIValidator(self.openai_client, verdict_cache=self.verdict_cache,
+                           store=self._store("validations", ValidationRecord))
+
+    @cached_property
+    def decoy_implementer(self) -> DecoyImplementer:
+        return DecoyImplementer(store=self._store("deployments", DeploymentRecord), assets=self.decoy_assets)
+
+    @cached_property
+    def hack_monitor(self) -> HackMonitor:
+        # Tracked decoys are bounded like the deployment store they come from
+        return HackMonitor(self.openai_client, verdict_cache=self.verdict_cache,
+                           store=self._store("alerts", AlertRecord), max_tracked=self.retention)
+
+    @cached_property
+    def telemetry_listener(self) -> TelemetryListener:
+        return TelemetryListener(self.hack_monitor.submit, csv_path=self.telemetry_csv, port=self.telemetry_port)
+
+    @cached_property
+    def logger(self) -> Logger:
+        return Logger(store=self._store("logs", LogRecord), path=self.log_path)
+
+    @cached_property
+    def pattern_analyzer(self) -> PatternAnalyzer:
+        return PatternAnalyzer(self.openai_client, store=self._store("patterns", PatternRecord))
+
+    @cached_property
+    def api_server(self):
+        # FastAPI and uvicorn are only imported when the server is actually needed
+        from api_server import APIServer
+        api_server = APIServer(self.openai_client, verdict_cache=self.verdict_cache, data_analyzer=self.data_analyzer)
+        api_server.add_status_endpoint("/pipeline", self.scheduler.stats)
+        return api_server
+
+    @cached_property
+    def worker_pool(self):
+        from worker_pool import WorkerPool
+        return WorkerPool(self.azure_endpoint, self.encrypted_api_key, self.encryption_key, workers=self.api_workers,
+                          shared_store_path=self.shared_store_path, use_async_client=self.use_async_client)
+
+    def _store(self, name: str, record_type: Optional[Type[Record]] = None) -> RecordStore:
+        """Builds a bounded record store that spills evicted entries under spill_dir, if set."""
+        spill_path = None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            spill_path = os.path.join(self.spill_dir, f"{name}.jsonl")
+        store = self._stores[name] = RecordStore(record_type, max_records=self.retention, spill_path=spill_path)
+        return store
+
+    def _build_scheduler(self) -> PipelineScheduler:
+        """Wires the workflow steps into continuously running sources and queue-connected stages."""
+        scheduler = PipelineScheduler()
+        size, concurrency = self.queue_size, self.stage_concurrency
+        gather = scheduler.add_source("gather", self._gather_source, self.intervals["gather"])
+        monitor = scheduler.add_source("monitor", self._monitor_source, self.intervals["monitor"])
+        scheduler.add_source("patterns", self._pattern_source, self.intervals["patterns"])
+        rescore = scheduler.add_source("rescore", self._rescore_source, self.intervals["rescore"])
+        analyze = scheduler.add_stage("analyze", self._analyze_stage, queue_size=size)
+        scheduler.connect(gather, analyze)
+        if self.bulk_decoys:
+            # Each analyzed batch of threats becomes one item, decoyed and validated in bulk
+            decoys = scheduler.add_stage("decoys", self._bulk_decoy_stage, concurrency, size)
+            deploy = scheduler.add_stage("deploy", self._deploy_stage, queue_size=size)
+            scheduler.connect(analyze, decoys)
+            scheduler.connect(rescore, decoys)
+            scheduler.connect(decoys, deploy)
+        else:
+            generate = scheduler.add_stage("generate", self._generate_stage, concurrency, size)
+            validate = scheduler.add_stage("validate", self._validate_stage, concurrency, size)
+            deploy = scheduler.add_stage("deploy", self._deploy_stage, queue_size=size)
+            scheduler.connect(analyze, generate)
+            scheduler.connect(rescore, generate)
+            scheduler.connect(generate, validate)
+            scheduler.connect(validate, deploy)
+        respond = scheduler.add_stage("respond", self._respond_stage, queue_size=size)
+        scheduler.connect(monitor, respond)
+        return scheduler
+
+    async def _gather_source(self):
+        return self._gathered_chunks()
+
+    async def _gathered_chunks(self):
+        """Yields (chunk, cursors) items as events are fetched; cursors is set on the last chunk of a pass."""
+        # Only events new since the last pass come back, in fixed-size chunks each analyzed as one batch. The
+        # cursors are saved by the analyze stage once it has analyzed the last chunk; its single worker takes
+        # chunks in order, so every earlier chunk was analyzed by then and a crash replays rather than loses events.
+        count, previous = 0, None
+        async for chunk in self.data_gatherer.stream(save_cursors=False):
+            count += len(chunk)
+            if previous is not None:
+                yield previous, None
+            previous = chunk
+        self.logger.log_event({"step": "data_gathering", "data_count": count})
+        if previous is None:
+            self.data_gatherer.save_cursors()
+        else:
+            yield previous, self.data_gatherer.cursors()
+
+    async def _analyze_stage(self, item):
+        data, cursors = item
+        threats = await self.data_analyzer.analyze_data_batched(data)
+        if cursors is not None:
+            self.data_gatherer.save_cursors(cursors)
+        self.logger.log_event({"step": "analysis", "threats_found": len(threats)})
+        if self.bulk_decoys:
+            return [threats] if threats else None
+        return threats
+
+    async def _bulk_decoy_stage(self, threats):
+        return await self._generate_validated_decoys(threats)
+
+    async def _generate_validated_decoys(self, threats):
+        """Generates decoys for a batch of threats and returns those whose template passed validation."""
+        decoys = await self.decoy_generator.generate_decoys(threats)
+        # Decoys from already validated templates skip the validation call entirely
+        pending = [decoy for decoy in decoys if not self.decoy_generator.is_validated(decoy)]
+        verdicts = await self.ai_validator.validate_decoys(pending) if pending else []
+        self.decoy_generator.record_validation(pending, verdicts)
+        rejected = {decoy["id"] for decoy, is_valid in zip(pending, verdicts) if not is_valid}
+        return [decoy for decoy in decoys if decoy["id"] not in rejected]
+
+    async def _generate_stage(self, threat):
+        return [await self.decoy_generator.generate_decoy(threat)]
+
+    async def _validate_stage(self, decoy):
+        return [decoy] if await self.ai_validator.validate_decoy(decoy) else None
+
+    async def _deploy_stage(self, decoy):
+        self.hack_monitor.track_decoy(self.decoy_implementer.deploy_decoy(decoy))
+        self.logger.log_event({"step": "deployment", "decoy_id": decoy["id"]})
+
+    async def _monitor_source(self):
+        # Cost follows attack activity: only decoys hit by pushed interactions are checked
+        return await self.hack_monitor.process_interactions()
+
+    async def _respond_stage(self, alert):
+        response = self.logger.respond_to_threat(alert)
+        self.logger.log_event({"step": "response", "action": response["action"]})
+
+    async def _pattern_source(self):
+        # Only threats and alerts recorded since the previous pass are analyzed
+        threats, self._threat_cursor = self.data_analyzer.threats.since(self._threat_cursor)
+        alerts, self._alert_cursor = self.hack_monitor.alerts.since(self._alert_cursor)
+        if threats or alerts:
+            patterns = await self.pattern_analyzer.analyze_patterns(threats, alerts)
+            self.logger.log_event({"step": "pattern_analysis", "patterns_found": len(patterns)})
+        self.verdict_cache.save()
+
+    async def _rescore_source(self):
+        """Has the LLM re-judge work the local rules decided during an outage, once it is reachable again."""
+        rejected = await self.ai_validator.rescore_deferred()
+        for decoy in rejected:
+            # The verdict was the template's, so every decoy deployed from it is withdrawn
+            self.hack_monitor.untrack_template(decoy.get("template"))
+            self.hack_monitor.untrack_decoy(decoy["id"])
+            self.decoy_generator.discard_template(decoy.get("template"))
+        threats = await self.data_analyzer.rescore_deferred()
+        if threats or rejected:
+            self.logger.log_event({"step": "rescore", "threats_found": len(threats), "decoys_withdrawn": len(rejected)})
+        # Threats the local rules missed get decoys like freshly analyzed ones
+        if self.bulk_decoys:
+            return [threats] if threats else None
+        return threats
 
     async def run(self):
-        """Runs the full deception workflow and starts the API server."""
-        # Start API server in the background
-        loop = asyncio.get_event_loop()
-        server_task = loop.run_in_executor(None, self.api_server.start)
+        """Runs the API server and the workflow continuously until stop() or SIGINT/SIGTERM."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await self.telemetry_listener.start()
+        await self.scheduler.start()
+        server = self.worker_pool if self.api_workers > 1 else self.api_server
+        server_task = asyncio.create_task(server.serve())
+        stop_task = asyncio.create_task(self.scheduler.wait_stopped())
+        await asyncio.wait([server_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
 
-        # Existing workflow
+        # Graceful shutdown: stop intake, drain queued work, then stop the server
+        await self.telemetry_listener.stop()
+        await self.scheduler.stop(timeout=self.shutdown_timeout)
+        server.shutdown()
+        await asyncio.gather(server_task, return_exceptions=True)
+        stop_task.cancel()
+        if "data_gatherer" in self.__dict__:
+            await self.data_gatherer.aclose()
+        self.verdict_cache.save()
+        self.logger.log_event({"step": "shutdown", **self.verdict_cache.stats()})
+        self.logger.close()
+        return {"status": "stopped", "pipeline": self.scheduler.stats(), "logs": self.logger.stats()}
+
+    def stop(self) -> None:
+        """Requests a graceful shutdown of run()."""
+        self.scheduler.request_stop()
+
+    async def run_once(self):
+        """Runs the full deception workflow once, in sequence, without the API server."""
         # Step 1: Gather data
-        data = self.data_gatherer.fetch_data()
+        data = await self.data_gatherer.fetch(save_cursors=False)
         self.logger.log_event({"step": "data_gathering", "data_count": len(data)})
 
-        # Step 2: Analyze data
-        threats = self.data_analyzer.analyze_data(data)
+        # Step 2: Analyze data, then move the gather cursors past it
+        threats = await self.data_analyzer.analyze_data_batched(data)
+        self.data_gatherer.save_cursors()
         self.logger.log_event({"step": "analysis", "threats_found": len(threats)})
 
         # Step 3: Generate and validate decoys
-        for threat in threats:
-            decoy = self.decoy_generator.generate_decoy(threat)
-            if self.ai_validator.validate_decoy(decoy):
-                # Step 4: Deploy decoys
-                deployment = self.decoy_implementer.deploy_decoy(decoy)
-                self.logger.log_event({"step": "deployment", "decoy_id": decoy["id"]})
-
-        # Step 5: Monitor decoys
-        alerts = self.hack_monitor.monitor_decoys(self.decoy_implementer.deployed_decoys)
+        if self.bulk_decoys:
+            validated = await self._generate_validated_decoys(threats) if threats else []
+        else:
+            validated = []
+            for threat in threats:
+                decoy = await self.decoy_generator.generate_decoy(threat)
+                if await self.ai_validator.validate_decoy(decoy):
+                    validated.append(decoy)
+        # Step 4: Deploy decoys
+        for decoy in validated:
+            deployment = self.decoy_implementer.deploy_decoy(decoy)
+            self.hack_monitor.track_decoy(deployment)
+            self.logger.log_event({"step": "deployment", "decoy_id": decoy["id"]})
+
+        # Step 5: Monitor decoys hit by interactions recorded in the telemetry file
+        self.telemetry_listener.poll()
+        alerts = await self.hack_monitor.process_interactions()
         for alert in alerts:
             response = self.logger.respond_to_threat(alert)
             self.logger.log_event({"step": "response", "action": response["action"]})
 
         # Step 6: Analyze patterns
-        patterns = self.pattern_analyzer.analyze_patterns(threats, alerts)
+        patterns = await self.pattern_analyzer.analyze_patterns(threats, alerts)
         self.logger.log_event({"step": "pattern_analysis", "patterns_found": len(patterns)})
 
-        return {"status": "completed", "logs": self.logger.logs}
+        self.verdict_cache.save()
+        self.logger.log_event({"step": "verdict_cache", **self.verdict_cache.stats()})
+
+        self.logger.flush()
+        return {"status": "completed", "logs": self.logger.stats()}
 
 if __name__ == "__main__":
-    toolkit = DeceptionToolkit()
+    # Settings come from the environment set in the systemd unit
+    toolkit = DeceptionToolkit(
+        api_endpoint=os.environ.get("API_ENDPOINT", "https://example.com/api"),
+        azure_endpoint=os.environ.get("AZURE_ENDPOINT", "https://your-azure-openai-endpoint"),
+        encrypted_api_key=os.environ.get("ENCRYPTED_API_KEY", "your-encrypted-api-key"),
+        encryption_key=os.environ.get("ENCRYPTION_KEY", "your-encryption-key"),
+        telemetry_csv=os.environ.get("TELEMETRY_CSV", "pattern_analysis.csv"),
+        telemetry_port=int(os.environ["TELEMETRY_PORT"]) if os.environ.get("TELEMETRY_PORT") else None,
+        api_workers=int(os.environ.get("API_WORKERS", "1")),
+        event_sources=os.environ["EVENT_SOURCES"].split(",") if os.environ.get("EVENT_SOURCES") else None,
+        # Decoy host inventory as asset_id=host pairs, e.g. decoy_ssh_finance01=10.0.1.10,decoy_win_hr02=10.0.2.15
+        decoy_assets=dict(pair.split("=", 1) for pair in os.environ["DECOY_ASSETS"].split(","))
+        if os.environ.get("DECOY_ASSETS") else None
+    )
     asyncio.run(toolkit.run())
\ No newline at end of file
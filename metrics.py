@@ -0,0 +1,251 @@
+import asyncio
+import bisect
+import functools
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+
+class Gauge(Counter):
+    """Value that can go up and down, set directly or read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[Any, ...], float]]] = None):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def set(self, *labels: Any, value: float) -> None:
+        with self._lock:
+            self.values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception as e:
+                print(f"Error collecting gauge {self.name}: {str(e)}")
+                values = {}
+            with self._lock:
+                self.values = dict(values)
+        yield from super().samples()
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, typically durations in seconds."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # Per label set: [count per bucket (non-cumulative, with +Inf last), sum]
+        self.values: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: Any, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self.values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le_label = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+                yield f"{self.name}_bucket{_format_labels(self.label_names, labels, le_label)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}"
+
+class MetricsRegistry:
+    """Holds metrics by name and renders them in the Prometheus text exposition format."""
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class: type, name: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+              callback: Optional[Callable[[], Dict[Tuple[Any, ...], float]]] = None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help_text, label_names)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets)
+
+    def render(self, labels: Optional[Dict[str, Any]] = None) -> str:
+        """Renders every metric; labels, such as the worker process, are added to every sample."""
+        lines = []
+        with self._lock:
+            metrics = list(self.metrics.values())
+        extra = ",".join(f'{name}="{_escape(value)}"' for name, value in (labels or {}).items())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if not extra:
+                lines.extend(metric.samples())
+                continue
+            for sample in metric.samples():
+                name, _, rest = sample.partition(" ")
+                if name.endswith("}"):
+                    lines.append(f"{name[:-1]},{extra}}} {rest}")
+                else:
+                    lines.append(f"{name}{{{extra}}} {rest}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+SPAN_SECONDS = REGISTRY.histogram("toolkit_span_seconds", "Duration of instrumented component methods and code spans", ("span",))
+LLM_CALL_SECONDS = REGISTRY.histogram("toolkit_llm_call_seconds", "Latency of LLM calls by calling component", ("caller",))
+LLM_CALLS = REGISTRY.counter("toolkit_llm_calls_total", "LLM calls by calling component and outcome", ("caller", "outcome"))
+LLM_TOKENS_SENT = REGISTRY.counter("toolkit_llm_tokens_sent_total", "Estimated prompt tokens sent by calling component", ("caller",))
+LLM_FALLBACKS = REGISTRY.counter("toolkit_llm_fallbacks_total", "Verdicts or records produced by a fallback instead of the LLM", ("caller", "reason"))
+CACHE_LOOKUPS = REGISTRY.counter("toolkit_verdict_cache_lookups_total", "Verdict cache lookups by namespace and result", ("namespace", "result"))
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a block of code into toolkit_span_seconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(name, value=time.perf_counter() - started)
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorates a sync or async function to time each call into toolkit_span_seconds."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        observe = SPAN_SECONDS.observe
+        perf_counter = time.perf_counter
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(span_name, value=perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(span_name, value=perf_counter() - started)
+        return wrapper
+    return decorator
+
+class SamplingProfiler:
+    """Low-overhead profiler that periodically samples the stacks of all threads."""
+    def __init__(self, interval: float = 0.01, max_depth: int = 12):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: _StackCounter = _StackCounter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Guards samples, which the sampler thread updates while top() reads them from a request handler
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+                self.sample_count += 1
+
+    def top(self, limit: int = 25) -> Dict[str, Any]:
+        """Returns the most frequently sampled stacks, root first, in folded-stack form."""
+        with self._lock:
+            sample_count = self.sample_count
+            top_stacks = self.samples.most_common(limit)
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": sample_count,
+            "top_stacks": [{"stack": stack, "count": count} for stack, count in top_stacks]
+        }
+
+PROFILER = SamplingProfiler()
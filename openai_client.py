@@ -1,40 +1,112 @@
+import asyncio
+import hashlib
+import inspect
 import json
 import os
 import random
-import requests
+import threading
+import time
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
+from metrics import span, timed, LLM_CALL_SECONDS, LLM_CALLS, LLM_TOKENS_SENT
+from prompt_builder import estimate_tokens, row_keys
+from circuit_breaker import CircuitBreaker
+
+# cryptography and requests are imported on first use to keep process startup fast
+
+# Fernet keys derived by PBKDF2, keyed by a SHA-256 digest of the passphrase, so each
+# passphrase pays the 100,000 iterations once per process
+_derived_keys: Dict[bytes, bytes] = {}
+_shared_clients: Dict[Tuple[Any, ...], Any] = {}
+_cache_lock = threading.Lock()
+
+def _fernet_for(encryption_key: str):
+    """Returns a Fernet for the passphrase, deriving its key only on first use."""
+    from cryptography.fernet import Fernet
+    digest = hashlib.sha256(encryption_key.encode()).digest()
+    with _cache_lock:
+        key = _derived_keys.get(digest)
+        if key is None:
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=b'salt_',
+                iterations=100000,
+            )
+            with span("openai_client.pbkdf2"):
+                key = base64.urlsafe_b64encode(kdf.derive(encryption_key.encode()))
+            _derived_keys[digest] = key
+    return Fernet(key)
+
+def shared_client(client_class: Any, azure_endpoint: str, encrypted_api_key: str, encryption_key: str) -> Any:
+    """Returns one process-wide client per class, endpoint and key, decrypting the key only once."""
+    cache_key = (client_class, azure_endpoint, encrypted_api_key, hashlib.sha256(encryption_key.encode()).digest())
+    with _cache_lock:
+        client = _shared_clients.get(cache_key)
+    if client is None:
+        client = client_class(azure_endpoint, encrypted_api_key, encryption_key)
+        with _cache_lock:
+            client = _shared_clients.setdefault(cache_key, client)
+    return client
+
+async def send_prompt_async(client: Any, prompt: str, max_tokens: int = 50, temperature: float = 0.3,
+                            caller: str = "unknown") -> Dict[str, Any]:
+    """Awaits send_prompt on an async client, or runs a sync client's send_prompt in a worker thread."""
+    # While the client's circuit is open the call fails at once, so callers fall back without waiting on timeouts
+    breaker = getattr(client, "circuit_breaker", None)
+    if breaker is not None and not breaker.allow():
+        LLM_CALLS.inc(caller, "short_circuited")
+        return {"error": "LLM circuit open", "circuit_open": True}
+    LLM_TOKENS_SENT.inc(caller, amount=estimate_tokens(prompt))
+    started = time.perf_counter()
+    ok = False
+    try:
+        if inspect.iscoroutinefunction(client.send_prompt):
+            response = await client.send_prompt(prompt, max_tokens=max_tokens, temperature=temperature)
+        else:
+            response = await asyncio.to_thread(client.send_prompt, prompt, max_tokens=max_tokens,
+                                               temperature=temperature)
+        ok = "error" not in response
+    finally:
+        # A raising or cancelled call counts as a failure, so a half-open probe it claimed is always given back
+        latency = time.perf_counter() - started
+        if breaker is not None:
+            breaker.record(ok, latency)
+        LLM_CALL_SECONDS.observe(caller, value=latency)
+        LLM_CALLS.inc(caller, "ok" if ok else "error")
+    return response
+
+def llm_available(client: Any) -> bool:
+    """Tells whether the client's circuit would let a call through now."""
+    breaker = getattr(client, "circuit_breaker", None)
+    return breaker is None or breaker.available
 
 class OpenAIClient:
     """Handles Azure OpenAI API authentication and requests with encrypted API key."""
     def __init__(self, azure_endpoint: str = "https://your-azure-openai-endpoint", 
-                 encrypted_api_key: str = None, encryption_key: str = None):
+                 encrypted_api_key: str = None, encryption_key: str = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
         self.azure_endpoint = azure_endpoint
         self.api_key = self._decrypt_api_key(encrypted_api_key, encryption_key)
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
 
-    def _decrypt_api_key(self, encrypted_api_key: str, encryption_key: str) -> str:
+    @staticmethod
+    @timed("OpenAIClient.decrypt_api_key")
+    def _decrypt_api_key(encrypted_api_key: str, encryption_key: str) -> str:
         """Decrypts the API key using the provided encryption key."""
         if not encrypted_api_key or not encryption_key:
             raise ValueError("Encrypted API key and encryption key must be provided.")
         
         try:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'salt_',
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(encryption_key.encode()))
-            fernet = Fernet(key)
+            fernet = _fernet_for(encryption_key)
             decrypted_key = fernet.decrypt(encrypted_api_key.encode()).decode()
             return decrypted_key
         except Exception as e:
@@ -42,6 +114,7 @@ class OpenAIClient:
 
     def send_prompt(self, prompt: str, max_tokens: int = 50, temperature: float = 0.3) -> Dict[str, Any]:
         """Sends a prompt to Azure OpenAI and returns the response."""
+        import requests
         try:
             payload = {
                 "prompt": prompt,
@@ -55,16 +128,23 @@ class OpenAIClient:
                     "is_anomaly": random.random() > 0.3,  # For DataAnalyzer
                     "is_valid": random.random() > 0.2,    # For AIValidator
                     "is_accessed": random.random() > 0.7, # For HackMonitor
+                    # Per-row answers to batched prompts, as the LLM stub gives them
+                    "verdicts": {key: random.random() > 0.3 for key in row_keys(prompt)},  # For DataAnalyzer
+                    "templates": {                        # For DecoyGenerator
+                        key: {"type": random.choice(["fake_file", "honeypot_service", "decoy_user"]),
+                              "details": "Simulated decoy template on {target}"}
+                        for key in row_keys(prompt)
+                    },
                     "decoy": {                            # For DecoyGenerator
                         "id": str(uuid.uuid4()),
                         "type": random.choice(["fake_file", "honeypot_service", "decoy_user"]),
                         "target": "unknown",
                         "details": "Simulated decoy",
-                        "created_at": datetime.datetime.now().isoformat()
+                        "created_at": datetime.now().isoformat()
                     },
                     "pattern": {                          # For PatternAnalyzer
                         "id": str(uuid.uuid4()),
-                        "timestamp": datetime.datetime.now().isoformat(),
+                        "timestamp": datetime.now().isoformat(),
                         "details": "Simulated pattern",
                         "common_sources": []
                     }
@@ -79,14 +159,7 @@ class OpenAIClient:
     def encrypt_api_key(api_key: str, encryption_key: str) -> str:
         """Encrypts an API key using the provided encryption key."""
         try:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'salt_',
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(encryption_key.encode()))
-            fernet = Fernet(key)
+            fernet = _fernet_for(encryption_key)
             encrypted_key = fernet.encrypt(api_key.encode()).decode()
             return encrypted_key
         except Exception as e:
@@ -0,0 +1,135 @@
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Hashable
+
+# Dimensions tracked for every threat and alert record
+DIMENSIONS = ("source_ip", "event_type", "decoy", "hour")
+
+class CountMinSketch:
+    """Fixed-size frequency estimator; estimates never undercount."""
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        for seed, row in enumerate(self.rows):
+            row[hash((seed, key)) % self.width] += count
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[hash((seed, key)) % self.width] for seed, row in enumerate(self.rows))
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter summary keeping at most capacity counters, updated in O(1)."""
+    def __init__(self, capacity: int = 20):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        # Keys grouped by count, so the smallest counter is found without a scan
+        self._by_count: Dict[int, set] = {}
+        self._min_count = 0
+
+    def add(self, key: Hashable) -> None:
+        counts, by_count = self.counts, self._by_count
+        count = counts.get(key)
+        if count is not None:
+            by_count[count].discard(key)
+        elif len(counts) < self.capacity:
+            count = 0
+        else:
+            # Replace a smallest counter; the newcomer inherits its count as an overestimate
+            count = self._min_count
+            victim = by_count[count].pop()
+            del counts[victim]
+        new_count = count + 1
+        counts[key] = new_count
+        by_count.setdefault(new_count, set()).add(key)
+        if count and not by_count[count]:
+            del by_count[count]
+            if count == self._min_count:
+                self._min_count = new_count
+        elif not count:
+            self._min_count = 1
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+class PatternAggregator:
+    """Incremental sliding-window and all-time aggregates over threats and alerts in bounded memory."""
+    def __init__(self, window_seconds: float = 3600.0, bucket_seconds: float = 60.0, top_k: int = 10,
+                 sketch_width: int = 2048, sketch_depth: int = 4):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.top_k = top_k
+        # Each bucket holds (start, {"threat": n, "alert": n}, {dimension: SpaceSaving})
+        self._buckets: deque = deque()
+        self.sketches = {dimension: CountMinSketch(sketch_width, sketch_depth) for dimension in DIMENSIONS}
+        self.heavy_hitters = {dimension: SpaceSaving(top_k * 2) for dimension in DIMENSIONS}
+        self.totals = {"threat": 0, "alert": 0}
+
+    @staticmethod
+    def dimensions_of(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Extracts the tracked dimensions from a threat or alert record."""
+        timestamp = record.get("timestamp") or ""
+        return {
+            "source_ip": record.get("source_ip"),
+            "event_type": record.get("event"),
+            "decoy": record.get("decoy_id"),
+            "hour": timestamp[11:13] or None
+        }
+
+    def _current_bucket(self, now: float) -> Tuple[float, Dict[str, int], Dict[str, SpaceSaving]]:
+        bucket_start = now - now % self.bucket_seconds
+        if not self._buckets or self._buckets[-1][0] != bucket_start:
+            while self._buckets and self._buckets[0][0] + self.bucket_seconds <= now - self.window_seconds:
+                self._buckets.popleft()
+            self._buckets.append((bucket_start, {"threat": 0, "alert": 0},
+                                  {dimension: SpaceSaving(self.top_k * 2) for dimension in DIMENSIONS}))
+        return self._buckets[-1]
+
+    def update(self, record: Dict[str, Any], kind: str, now: Optional[float] = None) -> None:
+        """Adds one threat or alert record to the aggregates."""
+        _, counts, bucket_hitters = self._current_bucket(time.time() if now is None else now)
+        counts[kind] += 1
+        self.totals[kind] += 1
+        for dimension, value in self.dimensions_of(record).items():
+            if value is None:
+                continue
+            bucket_hitters[dimension].add(value)
+            self.heavy_hitters[dimension].add(value)
+            self.sketches[dimension].add(value)
+
+    def update_many(self, threats: List[Dict[str, Any]], alerts: List[Dict[str, Any]], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for threat in threats:
+            self.update(threat, "threat", now)
+        for alert in alerts:
+            self.update(alert, "alert", now)
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Returns a compact statistical summary sized by top_k and the window, not by history."""
+        now = time.time() if now is None else now
+        cutoff = now - self.window_seconds
+        window = [bucket for bucket in self._buckets if bucket[0] + self.bucket_seconds > cutoff]
+        window_counts: Dict[str, Dict[Hashable, int]] = {dimension: {} for dimension in DIMENSIONS}
+        for _, _, bucket_hitters in window:
+            for dimension, hitters in bucket_hitters.items():
+                counts = window_counts[dimension]
+                for key, count in hitters.counts.items():
+                    counts[key] = counts.get(key, 0) + count
+        return {
+            "window_seconds": self.window_seconds,
+            "window": {
+                "threats": sum(counts["threat"] for _, counts, _ in window),
+                "alerts": sum(counts["alert"] for _, counts, _ in window),
+                "top": {dimension: sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.top_k]
+                        for dimension, counts in window_counts.items()},
+                # Records per bucket, oldest first, to expose bursts and correlated timings
+                "timeline": [counts["threat"] + counts["alert"] for _, counts, _ in window]
+            },
+            "all_time": {
+                "threats": self.totals["threat"],
+                "alerts": self.totals["alert"],
+                "top": {dimension: [(key, self.sketches[dimension].estimate(key)) for key, _ in hitters.top(self.top_k)]
+                        for dimension, hitters in self.heavy_hitters.items()}
+            }
+        }
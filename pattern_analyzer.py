@@ -1,49 +1,58 @@
 import uuid
-import json
 from datetime import datetime
-from typing import List, Dict, Any
-from openai_client import OpenAIClient
+from typing import List, Dict, Any, Optional
+from openai_client import OpenAIClient, send_prompt_async
+from record_store import RecordStore
+from records import PatternRecord
+from pattern_aggregator import PatternAggregator
+from metrics import timed, LLM_FALLBACKS
+from prompt_builder import PATTERNS
 
 class PatternAnalyzer:
     """Analyzes patterns in threats and decoy interactions using Azure OpenAI."""
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(self, openai_client: OpenAIClient, store: Optional[RecordStore] = None,
+                 aggregator: Optional[PatternAggregator] = None):
         self.openai_client = openai_client
-        self.patterns = []
+        self.patterns = store if store is not None else RecordStore(PatternRecord)
+        self.aggregator = aggregator if aggregator is not None else PatternAggregator()
 
-    def analyze_patterns(self, threats: List[Dict[str, Any]], alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Identifies patterns in threat and alert data using Azure OpenAI."""
-        prompt = f"""
-        You are an AI specializing in pattern analysis for cybersecurity. Analyze the following threats and alerts:
-        Threats: {json.dumps(threats[:3], indent=2)}
-        Alerts: {json.dumps(alerts[:3], indent=2)}
-        Identify common patterns (e.g., frequent source IPs, repeated event types, or correlated timings).
-        Return a JSON object with keys: id, timestamp, details, common_sources.
-        """
-        response = self.openai_client.send_prompt(prompt, max_tokens=100, temperature=0.5)
+    @timed()
+    async def analyze_patterns(self, threats: List[Dict[str, Any]], alerts: List[Dict[str, Any]],
+                               now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Folds new threats and alerts into the aggregates and asks Azure OpenAI for patterns in the summary."""
+        self.aggregator.update_many(threats, alerts, now)
+        summary = self.aggregator.summary(now)
+        prompt = PATTERNS.render_json(summary)
+        response = await send_prompt_async(self.openai_client, prompt, max_tokens=100, temperature=0.5,
+                                           caller="pattern_analyzer")
+        # Without an LLM answer, the pattern is read straight off the aggregates the prompt was built from
         if "error" in response:
-            print(f"Error in pattern analysis: {response['error']}")
-            pattern = {
-                "id": str(uuid.uuid4()),
-                "timestamp": datetime.datetime.now().isoformat(),
-                "details": "Fallback pattern due to API failure",
-                "common_sources": []
-            }
+            if not response.get("circuit_open"):
+                print(f"Error in pattern analysis: {response['error']}")
+            LLM_FALLBACKS.inc("pattern_analyzer", "api_error")
+            pattern = self._summary_pattern(summary)
         else:
             response_data = response.get("response", {})
             if not isinstance(response_data, dict):
                 print(f"Unexpected response type: {type(response_data)}")
-                pattern = {
-                    "id": str(uuid.uuid4()),
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "details": "Fallback pattern due to unexpected response",
-                    "common_sources": []
-                }
+                LLM_FALLBACKS.inc("pattern_analyzer", "unexpected_response")
+                pattern = self._summary_pattern(summary)
             else:
-                pattern = response_data.get("pattern", {
-                    "id": str(uuid.uuid4()),
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "details": f"Found {len(threats)} threats and {len(alerts)} alerts",
-                    "common_sources": [t.get("source_ip", "unknown") for t in threats[:3]]
-                })
+                if "pattern" not in response_data:
+                    LLM_FALLBACKS.inc("pattern_analyzer", "missing_pattern")
+                    pattern = self._summary_pattern(summary)
+                else:
+                    pattern = response_data["pattern"]
         self.patterns.append(pattern)
-        return self.patterns
\ No newline at end of file
+        return [pattern]
+
+    def _summary_pattern(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds a pattern from the aggregate summary alone: window counts and the most common sources."""
+        window = summary["window"]
+        return {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now().isoformat(),
+            "details": f"Found {window['threats']} threats and {window['alerts']} alerts in the last "
+                       f"{int(self.aggregator.window_seconds)}s",
+            "common_sources": [source for source, _ in window["top"]["source_ip"][:3]]
+        }
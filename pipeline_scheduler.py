@@ -0,0 +1,165 @@
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Iterable, AsyncIterable, Union
+
+class Stage:
+    """A pipeline stage: workers draining a bounded input queue into an async handler."""
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Optional[Iterable[Any]]]],
+                 concurrency: int = 1, queue_size: int = 1000):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.downstream: Optional["Stage"] = None
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    async def emit(self, outputs: Optional[Iterable[Any]]) -> None:
+        """Forwards handler outputs to the downstream stage, waiting while its queue is full."""
+        if outputs is None or self.downstream is None:
+            return
+        for output in outputs:
+            await self.downstream.queue.put(output)
+            self.emitted += 1
+
+    async def work(self) -> None:
+        while True:
+            item = await self.queue.get()
+            started = time.perf_counter()
+            try:
+                await self.emit(await self.handler(item))
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in pipeline stage {self.name}: {str(e)}")
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self.queue.task_done()
+
+class PeriodicSource:
+    """A pipeline source that calls a producer every interval and feeds its outputs downstream."""
+    def __init__(self, name: str,
+                 producer: Callable[[], Awaitable[Optional[Union[Iterable[Any], AsyncIterable[Any]]]]],
+                 interval: float):
+        # A producer may return an async iterable, whose outputs go downstream as they are produced
+        self.name = name
+        self.producer = producer
+        self.interval = interval
+        self.downstream: Optional[Stage] = None
+        self.runs = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    async def work(self, stopping: asyncio.Event) -> None:
+        while not stopping.is_set():
+            started = time.perf_counter()
+            try:
+                outputs = await self.producer()
+                if hasattr(outputs, "__aiter__"):
+                    async for output in outputs:
+                        await self._put(output)
+                elif outputs is not None:
+                    for output in outputs:
+                        await self._put(output)
+                self.runs += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in pipeline source {self.name}: {str(e)}")
+            self.busy_seconds += time.perf_counter() - started
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _put(self, output: Any) -> None:
+        """Queues one output downstream, waiting while the queue is full."""
+        if self.downstream is not None:
+            await self.downstream.queue.put(output)
+            self.emitted += 1
+
+class PipelineScheduler:
+    """Runs periodic sources and queue-connected stages continuously until stopped."""
+    def __init__(self):
+        self.sources: List[PeriodicSource] = []
+        self.stages: List[Stage] = []
+        self.started_at: Optional[float] = None
+        self._stopping = asyncio.Event()
+        self._source_tasks: List[asyncio.Task] = []
+        self._stage_tasks: List[asyncio.Task] = []
+
+    def add_source(self, name: str,
+                   producer: Callable[[], Awaitable[Optional[Union[Iterable[Any], AsyncIterable[Any]]]]],
+                   interval: float) -> PeriodicSource:
+        source = PeriodicSource(name, producer, interval)
+        self.sources.append(source)
+        return source
+
+    def add_stage(self, name: str, handler: Callable[[Any], Awaitable[Optional[Iterable[Any]]]],
+                  concurrency: int = 1, queue_size: int = 1000) -> Stage:
+        """Adds a stage; add stages upstream first, since shutdown drains them in that order."""
+        stage = Stage(name, handler, concurrency, queue_size)
+        self.stages.append(stage)
+        return stage
+
+    @staticmethod
+    def connect(upstream: Any, downstream: Stage) -> None:
+        """Feeds a source's or stage's outputs into a downstream stage's queue."""
+        upstream.downstream = downstream
+
+    async def start(self) -> None:
+        """Starts every source and stage worker on the running loop."""
+        self.started_at = time.monotonic()
+        self._stopping.clear()
+        for stage in self.stages:
+            self._stage_tasks.extend(asyncio.create_task(stage.work()) for _ in range(stage.concurrency))
+        self._source_tasks = [asyncio.create_task(source.work(self._stopping)) for source in self.sources]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stops the sources, lets queued work drain through the stages, then cancels the workers."""
+        self._stopping.set()
+        await asyncio.gather(*self._source_tasks, return_exceptions=True)
+        try:
+            for stage in self.stages:
+                await asyncio.wait_for(stage.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print("Pipeline did not drain before the shutdown timeout; dropping queued work")
+        for task in self._stage_tasks:
+            task.cancel()
+        await asyncio.gather(*self._stage_tasks, return_exceptions=True)
+        self._source_tasks, self._stage_tasks = [], []
+
+    async def wait_stopped(self) -> None:
+        await self._stopping.wait()
+
+    def request_stop(self) -> None:
+        """Signals the sources to stop; safe to call from a signal handler."""
+        self._stopping.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth, throughput and utilization per source and stage."""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        stats = {"uptime_seconds": elapsed, "sources": {}, "stages": {}}
+        for source in self.sources:
+            stats["sources"][source.name] = {
+                "runs": source.runs,
+                "emitted": source.emitted,
+                "errors": source.errors,
+                "interval": source.interval,
+                "busy_seconds": source.busy_seconds
+            }
+        for stage in self.stages:
+            stats["stages"][stage.name] = {
+                "queue_depth": stage.queue.qsize(),
+                "queue_size": stage.queue.maxsize,
+                "concurrency": stage.concurrency,
+                "processed": stage.processed,
+                "emitted": stage.emitted,
+                "errors": stage.errors,
+                "throughput_per_second": stage.processed / elapsed if elapsed else 0.0,
+                # Share of the stage's worker capacity spent busy; near 1.0 marks the bottleneck
+                "utilization": stage.busy_seconds / (elapsed * stage.concurrency) if elapsed else 0.0
+            }
+        return stats
@@ -0,0 +1,122 @@
+import json
+import re
+from typing import List, Dict, Any, Union, Iterable
+from metrics import REGISTRY, span
+from verdict_cache import VOLATILE_FIELDS
+
+# Histogram buckets for prompt sizes, in estimated tokens
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+# Column order for known record kinds; other keys follow in first-seen order
+PREFERRED_COLUMNS = ("source_ip", "destination_ip", "port", "protocol", "event", "user", "status", "severity",
+                     "type", "target", "details")
+# A table row: the row key, a pipe, then the cells
+ROW_KEY = re.compile(r"^([^|\n]+)\|", re.MULTILINE)
+
+PROMPT_TOKENS = REGISTRY.histogram("toolkit_prompt_tokens", "Estimated tokens per rendered prompt by template",
+                                   ("template",), TOKEN_BUCKETS)
+PROMPT_ROWS = REGISTRY.counter("toolkit_prompt_rows_total", "Records encoded into prompts by template", ("template",))
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of a prompt at roughly four characters per token."""
+    return (len(text) + 3) // 4
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    text = str(value)
+    # Quote only cells that would break the row format
+    return json.dumps(text) if "|" in text or "\n" in text else text
+
+def encode_table(records: Union[Dict[str, Dict[str, Any]], List[Dict[str, Any]]], key_label: str = "id",
+                 drop: Iterable[str] = VOLATILE_FIELDS) -> str:
+    """Encodes records as a header line plus one pipe-separated row each, without volatile or empty columns."""
+    items = list(records.items()) if isinstance(records, dict) else list(enumerate(records))
+    drop = set(drop)
+    seen: Dict[str, None] = {}
+    for _, record in items:
+        for field, value in record.items():
+            if field not in drop and value not in (None, ""):
+                seen[field] = None
+    columns = [field for field in PREFERRED_COLUMNS if field in seen]
+    columns += [field for field in seen if field not in PREFERRED_COLUMNS]
+    lines = ["|".join([key_label] + columns)]
+    for key, record in items:
+        lines.append("|".join([str(key)] + [_cell(record.get(field)) for field in columns]))
+    return "\n".join(lines)
+
+def row_keys(text: str) -> List[str]:
+    """Returns the row keys of the tables in a rendered prompt, skipping header lines."""
+    return [key for key in ROW_KEY.findall(text) if key != "id"]
+
+class PromptTemplate:
+    """Instructions compiled once per prompt kind, followed by the compactly encoded records to judge."""
+    def __init__(self, name: str, instructions: str, reply: str):
+        self.name = name
+        self._head = f"{instructions}\nReply with JSON only: {reply}\n"
+
+    def render(self, body: str, rows: int = 1) -> str:
+        """Renders a prompt around an already encoded body and records its size."""
+        prompt = self._head + body
+        PROMPT_TOKENS.observe(self.name, value=estimate_tokens(prompt))
+        PROMPT_ROWS.inc(self.name, amount=rows)
+        return prompt
+
+    def render_table(self, records: Union[Dict[str, Dict[str, Any]], List[Dict[str, Any]]],
+                     drop: Iterable[str] = VOLATILE_FIELDS) -> str:
+        """Renders a prompt around one table of records."""
+        with span(f"prompt.{self.name}"):
+            return self.render(encode_table(records, drop=drop), rows=len(records))
+
+    def render_sections(self, sections: Dict[str, Union[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]],
+                        drop: Iterable[str] = VOLATILE_FIELDS) -> str:
+        """Renders a prompt around several labelled tables, such as a decoy and the interactions seen on it."""
+        with span(f"prompt.{self.name}"):
+            body = "\n".join(f"{label}:\n{encode_table(records, drop=drop)}" for label, records in sections.items())
+            return self.render(body, rows=sum(len(records) for records in sections.values()))
+
+    def render_json(self, data: Any) -> str:
+        """Renders a prompt around a compact JSON document, such as an aggregate summary."""
+        with span(f"prompt.{self.name}"):
+            return self.render(json.dumps(data, separators=(",", ":"), default=str))
+
+ANOMALY = PromptTemplate(
+    "anomaly",
+    "Cybersecurity anomaly detection. Is this event an anomaly (e.g. unusual login attempt, unexpected port access, "
+    "suspicious protocol use)?",
+    '{"is_anomaly":true or false}')
+ANOMALY_BATCH = PromptTemplate(
+    "anomaly_batch",
+    "Cybersecurity anomaly detection. For each event row below, decide whether it is an anomaly (e.g. unusual login "
+    "attempt, unexpected port access, suspicious protocol use).",
+    '{"verdicts":{"<id>":true or false}} with every id')
+DECOY = PromptTemplate(
+    "decoy",
+    "Deception technology. Generate a realistic decoy (fake file, honeypot service or decoy user) relevant to this "
+    "threat, to mislead the attacker.",
+    '{"decoy":{"id","type","target","details","created_at"}}')
+DECOY_TEMPLATES = PromptTemplate(
+    "decoy_templates",
+    "Deception technology. For each group of similar threats below, generate one realistic decoy template (fake file, "
+    "honeypot service or decoy user). Write {target} in details wherever the attacked host should appear.",
+    '{"templates":{"<id>":{"type","details"}}} with every id')
+VALIDATION = PromptTemplate(
+    "validation",
+    "Deception technology review. Is this decoy convincing enough to deceive an attacker?",
+    '{"is_valid":true or false}')
+VALIDATION_BATCH = PromptTemplate(
+    "validation_batch",
+    "Deception technology review. For each decoy row below, decide whether it is convincing enough to deceive an "
+    "attacker.",
+    '{"verdicts":{"<id>":true or false}} with every id')
+ACCESS_CHECK = PromptTemplate(
+    "access_check",
+    "Deception monitoring. Is there evidence of unauthorized access or interaction with this deployed decoy?",
+    '{"is_accessed":true or false}')
+PATTERNS = PromptTemplate(
+    "patterns",
+    "Cybersecurity pattern analysis. The JSON below summarizes all threats and alerts, with counts per source IP, "
+    "event type, decoy and hour of day over a sliding window and over all time. Identify common patterns (frequent "
+    "source IPs, repeated event types, correlated timings).",
+    '{"pattern":{"id","timestamp","details","common_sources"}}')
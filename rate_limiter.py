@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """Token bucket that refills continuously up to a fixed capacity."""
+    def __init__(self, capacity: float, refill_per_second: float):
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("Token bucket capacity and refill rate must be positive.")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Adds the tokens accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Waits until the requested amount of tokens is available and takes it."""
+        # Requests larger than the bucket would never fit, so cap them at a full bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+class RateLimiter:
+    """Limits requests per minute and tokens per minute for calls to Azure OpenAI."""
+    def __init__(self, requests_per_minute: Optional[int] = 600, tokens_per_minute: Optional[int] = 90000):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int) -> None:
+        """Waits for one request slot and the given number of tokens."""
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket:
+            await self.token_bucket.acquire(tokens)
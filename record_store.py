@@ -0,0 +1,85 @@
+import json
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Type
+from records import Record
+
+DEFAULT_MAX_RECORDS = 10000
+
+class RecordStore:
+    """Bounded ring buffer of pipeline records with optional spill-to-disk and cursor reads."""
+    def __init__(self, record_type: Optional[Type[Record]] = None, max_records: int = DEFAULT_MAX_RECORDS,
+                 spill_path: Optional[str] = None):
+        # Records go in and come out as dicts but are held as slotted records when a type is given.
+        # A cursor is the sequence number of the next record a reader has not seen yet.
+        self.record_type = record_type
+        self.max_records = max_records
+        self.spill_path = spill_path
+        self.spilled = 0
+        self._records: deque = deque()
+        self._first_seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self) -> int:
+        """Cursor positioned after the newest record."""
+        return self._first_seq + len(self._records)
+
+    def append(self, item: Dict[str, Any]) -> int:
+        """Stores a record and returns its sequence number."""
+        record = self.record_type.from_dict(item) if self.record_type else item
+        with self._lock:
+            self._records.append(record)
+            overflow = len(self._records) - self.max_records
+            evicted = [self._records.popleft() for _ in range(overflow)] if overflow > 0 else []
+            self._first_seq += len(evicted)
+            seq = self._first_seq + len(self._records) - 1
+        if evicted:
+            self._spill(evicted)
+        return seq
+
+    def extend(self, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            self.append(item)
+
+    def since(self, cursor: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Returns the in-memory records at or after cursor, plus the cursor to pass next time."""
+        with self._lock:
+            start = max(cursor, self._first_seq) - self._first_seq
+            records = [self._records[i] for i in range(start, len(self._records))]
+            next_cursor = self._first_seq + len(self._records)
+        return [self._as_dict(record) for record in records], next_cursor
+
+    def iter_spilled(self) -> Iterator[Dict[str, Any]]:
+        """Yields records that were evicted to the spill file, oldest first."""
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path) as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def _spill(self, records: List[Any]) -> None:
+        """Appends evicted records to the spill file, if one is configured."""
+        if not self.spill_path:
+            return
+        with open(self.spill_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(self._as_dict(record), default=str) + "\n")
+        self.spilled += len(records)
+
+    def _as_dict(self, record: Any) -> Dict[str, Any]:
+        return record.to_dict() if self.record_type else record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        records, _ = self.since(self._first_seq)
+        return iter(records)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        with self._lock:
+            return self._as_dict(self._records[index])
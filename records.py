@@ -0,0 +1,90 @@
+from dataclasses import dataclass, fields
+from functools import cache
+from typing import List, Dict, Any, Optional, Tuple
+
+class Record:
+    """Base for slotted pipeline records that round-trip to the dicts the components exchange."""
+    __slots__ = ()
+
+    @classmethod
+    @cache
+    def field_names(cls) -> Tuple[str, ...]:
+        return tuple(f.name for f in fields(cls) if f.name != "extra")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Record":
+        """Builds a record from a dict, keeping keys outside the schema in extra."""
+        names = cls.field_names()
+        extra = {key: value for key, value in data.items() if key not in names}
+        return cls(*(data.get(name) for name in names), extra=extra or None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.field_names()}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+@dataclass(slots=True)
+class ThreatRecord(Record):
+    id: str
+    timestamp: str
+    details: str
+    severity: Optional[str] = None
+    source_ip: Optional[str] = None
+    event: Optional[str] = None
+    destination_ip: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class DecoyRecord(Record):
+    id: str
+    type: str
+    target: str
+    details: str
+    created_at: Optional[str] = None
+    template: Optional[str] = None
+    destination_ip: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class ValidationRecord(Record):
+    decoy_id: str
+    is_valid: bool
+    timestamp: str
+    details: str
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class DeploymentRecord(Record):
+    decoy_id: str
+    status: str
+    timestamp: str
+    details: str
+    target: Optional[str] = None
+    asset_id: Optional[str] = None
+    host: Optional[str] = None
+    template: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class AlertRecord(Record):
+    id: str
+    decoy_id: str
+    timestamp: str
+    details: str
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class PatternRecord(Record):
+    id: str
+    timestamp: str
+    details: str
+    common_sources: Optional[List[str]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class LogRecord(Record):
+    id: str
+    timestamp: str
+    event: Dict[str, Any]
+    extra: Optional[Dict[str, Any]] = None
@@ -0,0 +1,68 @@
+import asyncio
+import queue
+import zlib
+from typing import List, Dict, Any, Callable, Tuple
+
+def shard_for(source_ip: Any, num_shards: int) -> int:
+    """Maps a source IP to a shard; stable across processes, unlike the salted built-in hash()."""
+    return zlib.crc32(str(source_ip).encode()) % num_shards
+
+class ShardRouter:
+    """Routes events to the worker process owning their source_ip, forwarding other workers' events over queues."""
+    def __init__(self, index: int, inboxes: List[Any], poll_interval: float = 0.5):
+        # inboxes[i] is worker i's multiprocessing queue of forwarded event batches
+        self.index = index
+        self.inboxes = inboxes
+        self.poll_interval = poll_interval
+        self.forwarded = 0
+        self.received = 0
+        self._stopped = False
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.inboxes)
+
+    def split(self, events: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]:
+        """Splits events into those this worker owns and the rest grouped by owning worker."""
+        local, remote = [], {}
+        for event in events:
+            shard = shard_for(event.get("source_ip"), self.num_shards)
+            if shard == self.index:
+                local.append(event)
+            else:
+                remote.setdefault(shard, []).append(event)
+        return local, remote
+
+    def forward(self, remote: Dict[int, List[Dict[str, Any]]],
+                batch_id: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Hands events to their owning workers as parts of batch_id; returns the overflow and the parts handed over."""
+        # Under overload the caller analyzes leftovers itself: locality is lost but nothing is dropped
+        leftover, parts = [], 0
+        for shard, events in remote.items():
+            try:
+                self.inboxes[shard].put_nowait((batch_id, events))
+                self.forwarded += len(events)
+                parts += 1
+            except queue.Full:
+                leftover.extend(events)
+        return leftover, parts
+
+    async def receive(self, handler: Callable[[List[Dict[str, Any]], str], Any]) -> None:
+        """Passes batches forwarded by other workers, with their batch IDs, to handler until stop() is called."""
+        inbox = self.inboxes[self.index]
+        while not self._stopped:
+            try:
+                batch_id, events = await asyncio.to_thread(inbox.get, True, self.poll_interval)
+            except queue.Empty:
+                continue
+            self.received += len(events)
+            result = handler(events, batch_id)
+            if asyncio.iscoroutine(result):
+                await result
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns this worker's shard and forwarded/received event counts."""
+        return {"shard": self.index, "shards": self.num_shards, "forwarded": self.forwarded, "received": self.received}
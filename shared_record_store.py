@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Type
+from record_store import DEFAULT_MAX_RECORDS
+from records import Record
+
+class SharedRecordStore:
+    """SQLite-backed record store with the RecordStore interface, safe to share between processes."""
+    def __init__(self, path: str, table: str, record_type: Optional[Type[Record]] = None,
+                 max_records: int = DEFAULT_MAX_RECORDS, trim_every: int = 1000):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        # Sequence numbers come from the shared table, so cursors work across processes
+        self.path = path
+        self.table = table
+        self.record_type = record_type
+        self.max_records = max_records
+        self.trim_every = trim_every
+        self.spilled = 0
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (seq INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)")
+
+    @property
+    def cursor(self) -> int:
+        """Cursor positioned after the newest record."""
+        with self._lock:
+            (last,) = self._conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self.table}").fetchone()
+        return last + 1
+
+    def append(self, item: Dict[str, Any]) -> int:
+        """Stores a record and returns its sequence number."""
+        with self._lock:
+            seq = self._conn.execute(f"INSERT INTO {self.table} (data) VALUES (?)", (self._encode(item),)).lastrowid
+        self._count_appended(1)
+        return seq
+
+    def extend(self, items: List[Dict[str, Any]]) -> None:
+        """Stores records in a single transaction."""
+        if not items:
+            return
+        rows = [(self._encode(item),) for item in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(f"INSERT INTO {self.table} (data) VALUES (?)", rows)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._count_appended(len(rows))
+
+    def since(self, cursor: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Returns the records at or after cursor, plus the cursor to pass next time."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT seq, data FROM {self.table} WHERE seq >= ? ORDER BY seq",
+                                      (cursor,)).fetchall()
+        next_cursor = rows[-1][0] + 1 if rows else max(cursor, self.cursor)
+        return [json.loads(data) for _, data in rows], next_cursor
+
+    def iter_spilled(self) -> Iterator[Dict[str, Any]]:
+        """Trimmed records are deleted rather than spilled, so there is nothing to yield."""
+        return iter(())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _encode(self, item: Dict[str, Any]) -> str:
+        # Round-trip through the record type so the stored shape matches the in-memory stores
+        if self.record_type:
+            item = self.record_type.from_dict(item).to_dict()
+        return json.dumps(item, default=str)
+
+    def _count_appended(self, count: int) -> None:
+        """Deletes the oldest records beyond max_records every trim_every appends."""
+        self._appended += count
+        if self._appended < self.trim_every:
+            return
+        self._appended = 0
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE seq <= (SELECT MAX(seq) FROM {self.table}) - ?",
+                               (self.max_records,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return min(count, self.max_records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        records, _ = self.since(0)
+        return iter(records[-self.max_records:])
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        order, offset = ("ASC", index) if index >= 0 else ("DESC", -index - 1)
+        with self._lock:
+            row = self._conn.execute(f"SELECT data FROM {self.table} ORDER BY seq {order} LIMIT 1 OFFSET ?",
+                                     (offset,)).fetchone()
+        if row is None:
+            raise IndexError("record index out of range")
+        return json.loads(row[0])
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any
+
+# Directory main is imported from, whatever the caller's working directory
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET = 0.25
+# Modules that must not be loaded just by importing main and constructing the toolkit
+HEAVY_MODULES = ("fastapi", "uvicorn", "httpx", "cryptography", "requests")
+
+# Runs in a fresh interpreter so import caching in this process does not skew the numbers
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+toolkit = main.DeceptionToolkit()
+constructed = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "construct_seconds": constructed - imported,
+    "total_seconds": constructed - started,
+    "heavy_modules_loaded": [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+def measure_startup(runs: int = 5) -> Dict[str, Any]:
+    """Measures import and construction time of the toolkit in fresh interpreters, keeping the best run."""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True,
+                                cwd=REPO_DIR)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    best = min(results, key=lambda result: result["total_seconds"])
+    best["runs"] = runs
+    return best
+
+def check_startup(budget: float = DEFAULT_BUDGET, runs: int = 5) -> Dict[str, Any]:
+    """Measures startup and tells whether it stayed within budget without loading heavy modules."""
+    result = measure_startup(runs)
+    result["budget_seconds"] = budget
+    result["passed"] = result["total_seconds"] <= budget and not result["heavy_modules_loaded"]
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks DeceptionToolkit startup time against a budget.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="Maximum seconds for import plus construction")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    result = check_startup(args.budget, args.runs)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
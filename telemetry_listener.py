@@ -0,0 +1,125 @@
+import asyncio
+import csv
+import json
+import os
+from typing import List, Dict, Any, Optional, Callable
+
+# Column the attack script used to write unquoted, spilling its comma-separated techniques into extra fields
+LIST_FIELD = "MITRE ATT&CK technique mappings"
+
+def fit_row(row: List[str], fields: List[str]) -> Optional[List[str]]:
+    """Returns a row with one value per field, folding overflow back into LIST_FIELD, or None if it does not fit."""
+    overflow = len(row) - len(fields)
+    if overflow == 0:
+        return row
+    if overflow < 0 or LIST_FIELD not in fields:
+        return None
+    i = fields.index(LIST_FIELD)
+    return row[:i] + [",".join(row[i:i + overflow + 1])] + row[i + overflow + 1:]
+
+class TelemetryListener:
+    """Pushes decoy interaction events from a tailed CSV file and/or a JSON-lines socket to a handler."""
+    def __init__(self, handler: Callable[[Dict[str, Any]], None], csv_path: Optional[str] = None,
+                 host: str = "127.0.0.1", port: Optional[int] = None, poll_interval: float = 1.0,
+                 from_start: bool = False):
+        self.handler = handler
+        self.csv_path = csv_path
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+        self.events = 0
+        self.parse_errors = 0
+        self._fields: Optional[List[str]] = None
+        self._offset: Optional[int] = None
+        self._skip_existing = False
+        self._tail_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> None:
+        """Starts tailing the CSV file and listening on the socket, whichever are configured."""
+        if self.csv_path and self._tail_task is None:
+            # Pin the starting position now, so rows appended from here on are never skipped
+            self._skip_existing = not self.from_start
+            self.poll()
+            self._skip_existing = False
+            self._tail_task = asyncio.create_task(self._tail_periodically())
+        if self.port is not None and self._server is None:
+            self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+
+    async def stop(self) -> None:
+        """Stops tailing and closes the socket, after reading what was already written to the file."""
+        if self._tail_task is not None:
+            self._tail_task.cancel()
+            await asyncio.gather(self._tail_task, return_exceptions=True)
+            self._tail_task = None
+            self.poll()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def poll(self) -> int:
+        """Reads rows appended to the CSV file since the last poll and pushes them; returns how many."""
+        if not self.csv_path or not os.path.exists(self.csv_path):
+            return 0
+        with open(self.csv_path, "rb") as f:
+            if self._fields is None:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return 0
+                self._fields = next(csv.reader([header.decode("utf-8", "replace")]))
+                self._offset = os.fstat(f.fileno()).st_size if self._skip_existing else f.tell()
+            size = os.fstat(f.fileno()).st_size
+            if size < self._offset:
+                # The file was truncated or replaced: start over from its header
+                self._fields, self._offset = None, None
+                return self.poll()
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        # Only complete lines are consumed; a partly written row is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        self._offset += end
+        count = 0
+        for row in csv.reader(chunk[:end].decode("utf-8", "replace").splitlines()):
+            row = fit_row(row, self._fields)
+            if row is None:
+                self.parse_errors += 1
+                continue
+            self._push(dict(zip(self._fields, row)))
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counts of pushed events and unparseable rows or lines."""
+        return {"events": self.events, "parse_errors": self.parse_errors}
+
+    def _push(self, event: Dict[str, Any]) -> None:
+        self.events += 1
+        self.handler(event)
+
+    async def _tail_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.poll)
+            except OSError as e:
+                print(f"Error tailing telemetry file {self.csv_path}: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reads one JSON interaction event per line until the client disconnects."""
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    self.parse_errors += 1
+                    continue
+                if isinstance(event, dict):
+                    self._push(event)
+                else:
+                    self.parse_errors += 1
+        finally:
+            writer.close()
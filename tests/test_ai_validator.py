@@ -0,0 +1,46 @@
+import asyncio
+from ai_validator import AIValidator
+from decoy_implementer import DecoyImplementer
+from hack_monitor import HackMonitor
+
+class OutageThenRejectingClient:
+    """Fails the first calls, then rejects every decoy in a batch."""
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.prompts = []
+
+    async def send_prompt(self, prompt, max_tokens=50, temperature=0.3):
+        self.prompts.append(prompt)
+        if len(self.prompts) <= self.failures:
+            return {"error": "HTTP 503"}
+        return {"response": {"verdicts": {f"d{i}": False for i in range(10)}}}
+
+def decoy(decoy_id, template, target):
+    return {"id": decoy_id, "type": "fake_file", "target": target, "details": f"Payroll export for {target}",
+            "template": template}
+
+def test_rejected_template_withdraws_every_decoy_made_from_it():
+    client = OutageThenRejectingClient()
+    validator, implementer, monitor = AIValidator(client), DecoyImplementer(), HackMonitor(client)
+    decoys = [decoy("a", "t1", "10.0.0.1"), decoy("b", "t1", "10.0.0.2"), decoy("c", "t2", "10.0.0.3")]
+    # During the outage the local rules accept all three, and only one decoy per template is asked about
+    assert asyncio.run(validator.validate_decoys(decoys)) == [True, True, True]
+    assert [key for key, _, _ in validator.deferred] == ["t1", "t2"]
+    for validated in decoys:
+        monitor.track_decoy(implementer.deploy_decoy(validated))
+
+    rejected = asyncio.run(validator.rescore_deferred())
+    assert [rejected_decoy["template"] for rejected_decoy in rejected] == ["t1", "t2"]
+    assert len(client.prompts) == 2 and not validator.deferred
+    for rejected_decoy in rejected:
+        monitor.untrack_template(rejected_decoy["template"])
+    assert not monitor.decoys_by_id and not monitor.decoys_by_template
+
+def test_deferred_decoys_sharing_a_template_are_revalidated_once():
+    client = OutageThenRejectingClient(failures=2)
+    validator = AIValidator(client)
+    for decoy_id in ("a", "b"):
+        assert asyncio.run(validator.validate_decoy(decoy(decoy_id, "t1", "10.0.0.1")))
+    rejected = asyncio.run(validator.rescore_deferred())
+    assert [rejected_decoy["id"] for rejected_decoy in rejected] == ["a"]
+    assert len(client.prompts) == 3 and "10.0.0.1" in client.prompts[-1]
@@ -0,0 +1,39 @@
+import asyncio
+import httpx
+from async_openai_client import AsyncOpenAIClient
+from openai_client import OpenAIClient
+
+def make_client(handler):
+    calls = []
+
+    def record(request):
+        calls.append(request)
+        return handler(request)
+
+    client = AsyncOpenAIClient("http://llm.test/", OpenAIClient.encrypt_api_key("key", "pass"), "pass",
+                               requests_per_minute=None, tokens_per_minute=None, backoff_base=0.0)
+    client._session = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    return client, calls
+
+def send(client):
+    async def run():
+        async with client:
+            return await client.send_prompt("prompt")
+    return asyncio.run(run())
+
+def test_invalid_json_body_is_an_error_without_retries():
+    client, calls = make_client(lambda request: httpx.Response(200, content=b"<html>oops</html>"))
+    response = send(client)
+    assert "Invalid JSON body" in response["error"]
+    assert len(calls) == 1
+
+def test_non_object_body_is_an_error_without_retries():
+    client, calls = make_client(lambda request: httpx.Response(200, json=["not", "a", "completion"]))
+    assert "error" in send(client)
+    assert len(calls) == 1
+
+def test_server_errors_are_retried_then_completion_is_decoded():
+    replies = [httpx.Response(503), httpx.Response(200, json={"choices": [{"text": '{"is_anomaly": true}'}]})]
+    client, calls = make_client(lambda request: replies.pop(0))
+    assert send(client) == {"response": {"is_anomaly": True}}
+    assert len(calls) == 2
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import pytest
+from batch_status import SharedBatchStatus
+from ingestion_queue import IngestionQueue
+
+class RecordingAnalyzer:
+    async def analyze_data_batched(self, events):
+        return [{"event": event} for event in events if event.get("bad")]
+
+class ThreadCheckingStatus(SharedBatchStatus):
+    """Fails any batch status call made on the event loop's thread."""
+    def __init__(self, path, loop_thread):
+        super().__init__(path)
+        self.loop_thread = loop_thread
+
+    def _update(self, batch_id, change):
+        assert threading.get_ident() != self.loop_thread
+        super()._update(batch_id, change)
+
+    def open(self, batch_id, events, parts=1):
+        assert threading.get_ident() != self.loop_thread
+        super().open(batch_id, events, parts)
+
+def test_failed_change_is_rolled_back_and_releases_the_write_lock(tmp_path):
+    status = SharedBatchStatus(str(tmp_path / "state.db"))
+    status.open("b1", events=3)
+
+    def broken(batch):
+        batch["status"] = "processing"
+        raise KeyError("parts")
+
+    with pytest.raises(KeyError):
+        status._update("b1", broken)
+    assert status.get("b1")["status"] == "queued"
+    # No transaction was left open, so another connection can still write
+    other = SharedBatchStatus(str(tmp_path / "state.db"))
+    other.finish_part("b1", [])
+    assert status.get("b1")["status"] == "completed"
+    other.close()
+    status.close()
+
+def test_queue_records_shared_batches_off_the_event_loop(tmp_path):
+    async def run():
+        status = ThreadCheckingStatus(str(tmp_path / "state.db"), threading.get_ident())
+        queue = IngestionQueue(RecordingAnalyzer(), batch_status=status, num_workers=2)
+        await queue.start()
+        batch_id = await queue.submit([{"bad": True}, {"bad": False}])
+        await queue.stop()
+        batch, stats = await queue.status(batch_id), await queue.stats()
+        status.close()
+        return batch, stats
+
+    batch, stats = asyncio.run(run())
+    assert batch["status"] == "completed" and batch["threats_found"] == 1
+    assert stats["batches"] == {"completed": 1} and stats["queued_events"] == 0
+
+def test_full_queue_refuses_and_reserved_room_is_kept(tmp_path):
+    async def run():
+        queue = IngestionQueue(RecordingAnalyzer(), max_queued_events=3, num_workers=0)
+        await queue.start()
+        assert queue.reserve(2)
+        refused = await queue.submit([{}, {}])
+        batch_id = await queue.open_batch(2)
+        accepted = await queue.submit([{}, {}], batch_id, reserved=True)
+        return refused, accepted, batch_id, queue.queued_events
+
+    refused, accepted, batch_id, queued = asyncio.run(run())
+    assert refused is None
+    assert accepted == batch_id and queued == 2
@@ -0,0 +1,47 @@
+import time
+from circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+def tripped(**kwargs):
+    breaker = CircuitBreaker(failure_threshold=2, **kwargs)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+    return breaker
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    assert tripped().state == OPEN
+
+def test_open_circuit_rejects_calls_until_reset_timeout():
+    breaker = tripped(reset_timeout=60.0)
+    assert not breaker.allow()
+    assert not breaker.available
+    assert breaker.stats()["rejected"] == 1
+
+def test_half_open_allows_one_probe_that_closes_on_success():
+    breaker = tripped(reset_timeout=0.0)
+    assert breaker.available
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = tripped(reset_timeout=0.05)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=1, latency_threshold=1.0)
+    breaker.record(True, 2.0)
+    assert breaker.state == OPEN
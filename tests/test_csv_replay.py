@@ -0,0 +1,51 @@
+import asyncio
+import os
+from csv_replay import CSVReplay, chunk_ranges, parse_range
+
+# Output of CVE-2024-6387.sh: eight rows from before it quoted the MITRE column, then eight from after
+ATTACK_CSV = os.path.join(os.path.dirname(__file__), "data", "pattern_analysis.csv")
+TECHNIQUES = "T1190,T1059,T1003,T1046,T1567"
+
+class RecordingAnalyzer:
+    def __init__(self):
+        self.batches = []
+
+    async def analyze_data_batched(self, data, now=None):
+        self.batches.append(data)
+        await asyncio.sleep(0)
+        return [{"source_ip": event["source_ip"]} for event in data if event["severity"] == "Critical"]
+
+def parse_attack_csv():
+    fields, ranges = chunk_ranges(ATTACK_CSV, chunk_bytes=1024)
+    events, errors = [], 0
+    for start, end in ranges:
+        parsed, bad = parse_range(ATTACK_CSV, start, end, fields)
+        events.extend(parsed)
+        errors += bad
+    return events, errors
+
+def test_attack_script_output_parses_legacy_and_quoted_rows():
+    events, errors = parse_attack_csv()
+    assert errors == 0
+    assert len(events) == 16
+    for event in events:
+        assert event["MITRE ATT&CK technique mappings"] == TECHNIQUES
+        assert event["decoy OS and version"] == "Ubuntu 22.04"
+        assert event["breadcrumb source"] == "Honeytoken"
+
+def test_attack_columns_are_renamed_to_the_event_schema():
+    events, _ = parse_attack_csv()
+    first = events[0]
+    assert first["event"] == "Remote Code Execution"
+    assert first["source_ip"].startswith("185.220.")
+    assert first["destination_ip"] == "10.0.1.10"
+    assert first["port"] == "22"
+
+def test_replay_analyzes_every_event_in_file_order():
+    analyzer = RecordingAnalyzer()
+    replay = CSVReplay(analyzer, workers=1, batch_size=3, concurrency=2)
+    stats = asyncio.run(replay.replay([ATTACK_CSV]))
+    assert stats["events"] == 16 and stats["parse_errors"] == 0
+    assert stats["threats"] == 2
+    expected, _ = parse_attack_csv()
+    assert [event for batch in analyzer.batches for event in batch] == expected
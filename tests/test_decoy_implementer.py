@@ -0,0 +1,30 @@
+from decoy_implementer import DecoyImplementer
+from hack_monitor import HackMonitor
+
+ASSETS = {"decoy_ssh_finance01": "10.0.1.10", "decoy_win_hr02": "10.0.2.15"}
+
+def decoy(decoy_id, destination_ip=None, target="185.220.1.1"):
+    return {"id": decoy_id, "type": "fake_file", "target": target, "details": "Fake payroll export",
+            "destination_ip": destination_ip}
+
+def test_without_an_inventory_decoys_have_no_host():
+    deployment = DecoyImplementer().deploy_decoy(decoy("d1", "10.0.1.10"))
+    assert deployment["asset_id"] is None and deployment["host"] is None
+
+def test_decoy_is_placed_on_the_attacked_asset_host():
+    deployment = DecoyImplementer(assets=ASSETS).deploy_decoy(decoy("d1", "10.0.2.15"))
+    assert (deployment["asset_id"], deployment["host"]) == ("decoy_win_hr02", "10.0.2.15")
+
+def test_decoy_falls_back_to_an_asset_in_the_same_subnet():
+    implementer = DecoyImplementer(assets=ASSETS)
+    assert implementer.place("10.0.1.99") == ("decoy_ssh_finance01", "10.0.1.10")
+    assert implementer.place("192.168.1.7") == (None, None)
+    assert implementer.place(None) == (None, None)
+
+def test_host_telemetry_only_matches_decoys_placed_there():
+    implementer = DecoyImplementer(assets=ASSETS)
+    monitor = HackMonitor(None)
+    monitor.track_decoy(implementer.deploy_decoy(decoy("finance", "10.0.1.10", target="185.220.1.1")))
+    monitor.track_decoy(implementer.deploy_decoy(decoy("hr", "10.0.2.15", target="185.220.2.2")))
+    row = {"decoy_asset_id": "decoy_ssh_finance01", "dst_ip": "10.0.1.10", "src_ip": "185.220.9.9"}
+    assert monitor.match(row) == {"finance"}
@@ -0,0 +1,66 @@
+from datetime import datetime
+import pytest
+from event_generator import EventGenerator
+from event_prefilter import EventPrefilter, BENIGN, MALICIOUS, UNCERTAIN
+
+NOW = 1_700_000_000.0
+
+def routine(**fields):
+    event = {"event": "login_attempt", "status": "success", "user": "alice", "source_ip": "10.0.0.1",
+             "port": 22, "protocol": "SSH"}
+    event.update(fields)
+    return event
+
+def warmed_up(**kwargs):
+    prefilter = EventPrefilter(warmup_events=100, **kwargs)
+    prefilter.classify_batch([routine() for _ in range(100)], NOW)
+    return prefilter
+
+def test_nothing_is_benign_during_warmup():
+    prefilter = EventPrefilter(warmup_events=100)
+    assert prefilter.classify_batch([routine() for _ in range(10)], NOW) == [UNCERTAIN] * 10
+
+def test_routine_event_is_benign_after_warmup():
+    assert warmed_up().classify_batch([routine()], NOW) == [BENIGN]
+
+def test_new_user_ip_pair_alone_is_uncertain():
+    assert warmed_up().classify_batch([routine(user="bob")], NOW) == [UNCERTAIN]
+
+def test_rare_port_protocol_alone_is_uncertain():
+    assert warmed_up().classify_batch([routine(port=4444)], NOW) == [UNCERTAIN]
+
+def test_new_pair_on_rare_port_protocol_is_left_to_the_llm():
+    assert warmed_up().classify_batch([routine(user="bob", port=4444)], NOW) == [UNCERTAIN]
+
+def test_rarity_cap_must_stay_below_malicious_threshold():
+    with pytest.raises(ValueError):
+        EventPrefilter(malicious_above=0.5)
+
+def test_failed_logins_become_malicious_at_threshold():
+    prefilter = warmed_up(failed_login_threshold=5)
+    labels = prefilter.classify_batch([routine(status="failed") for _ in range(5)], NOW)
+    # A single failure from a known user/IP pair is a mistyped password
+    assert labels == [BENIGN] + [UNCERTAIN] * 3 + [MALICIOUS]
+
+def test_pairs_expire_with_the_window():
+    prefilter = warmed_up(window_seconds=300.0)
+    prefilter.classify_batch([routine(user="bob")], NOW)
+    assert prefilter.classify_batch([routine(user="bob")], NOW + 1) == [BENIGN]
+    later = NOW + 400
+    prefilter.classify_batch([routine() for _ in range(100)], later)
+    assert prefilter.classify_batch([routine(user="bob")], later) == [UNCERTAIN]
+
+def test_scores_stay_within_unit_range():
+    prefilter = warmed_up(failed_login_threshold=1)
+    scores = prefilter.score_batch([routine(status="failed", user="mallory", port=4444)], NOW)
+    assert scores == [1.0]
+
+def test_generated_stream_is_mostly_settled_as_benign():
+    generator, prefilter = EventGenerator(seed=7), EventPrefilter()
+    for _ in range(20):
+        batch = generator.batch(100)
+        prefilter.classify_batch(batch, datetime.fromisoformat(batch[-1]["timestamp"]).timestamp())
+    stats = prefilter.stats()
+    assert stats[BENIGN] > 1000
+    assert stats[MALICIOUS] < 200
+    assert stats[UNCERTAIN] > 0
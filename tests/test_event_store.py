@@ -0,0 +1,75 @@
+import pytest
+from event_store import EventStore
+
+def event(n, source_ip="10.0.0.1", **fields):
+    record = {"id": f"e{n}", "timestamp": f"2026-01-01T00:00:{n:02d}", "source_ip": source_ip,
+              "destination_ip": "10.0.0.2", "port": 22, "protocol": "TCP", "event": "login_attempt",
+              "user": "alice", "status": "success"}
+    record.update(fields)
+    return record
+
+def open_store(path, segment_format="csv", **kwargs):
+    return EventStore(str(path), segment_format=segment_format, flush_interval=0, **kwargs)
+
+@pytest.mark.parametrize("segment_format", ["csv", "columnar"])
+def test_events_round_trip_with_types_and_extra_fields(tmp_path, segment_format):
+    events = [event(1, note="has, comma"), event(2, details="line one\nline two")]
+    store = open_store(tmp_path, segment_format)
+    store.write(events)
+    store.close()
+    assert list(open_store(tmp_path, segment_format).read()) == events
+
+@pytest.mark.parametrize("segment_format", ["csv", "columnar"])
+def test_read_filters_by_source_ip_and_time_range(tmp_path, segment_format):
+    store = open_store(tmp_path, segment_format, max_segment_events=4)
+    store.write([event(n, source_ip=f"10.0.0.{n % 2}") for n in range(10)])
+    ids = lambda records: [record["id"] for record in records]
+    assert ids(store.read(source_ip="10.0.0.1")) == ["e1", "e3", "e5", "e7", "e9"]
+    assert ids(store.read(start="2026-01-01T00:00:03", end="2026-01-01T00:00:05")) == ["e3", "e4", "e5"]
+    store.close()
+
+@pytest.mark.parametrize("segment_format", ["csv", "columnar"])
+def test_since_pages_through_rotated_segments(tmp_path, segment_format):
+    store = open_store(tmp_path, segment_format, max_segment_events=3)
+    store.write([event(n) for n in range(7)])
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.since(cursor, limit=2)
+        if not page:
+            break
+        seen.extend(record["id"] for record in page)
+    assert seen == [f"e{n}" for n in range(7)]
+    store.write([event(7)])
+    page, _ = store.since(cursor)
+    assert [record["id"] for record in page] == ["e7"]
+    store.close()
+
+def test_since_cursor_survives_reopening(tmp_path):
+    store = open_store(tmp_path)
+    store.write([event(n) for n in range(3)])
+    _, cursor = store.since()
+    store.close()
+    store = open_store(tmp_path)
+    store.write([event(3)])
+    page, _ = store.since(cursor)
+    assert [record["id"] for record in page] == ["e3"]
+    assert [record["id"] for record in store.read(source_ip="10.0.0.1")] == ["e0", "e1", "e2", "e3"]
+    store.close()
+
+def test_read_only_store_follows_a_live_writer_without_touching_its_index(tmp_path):
+    writer = open_store(tmp_path, flush_events=1)
+    writer.write([event(0)])
+    index_path = tmp_path / "events-000001.csv.idx"
+    before = index_path.read_text()
+    reader = open_store(tmp_path, read_only=True)
+    assert index_path.read_text() == before
+    page, cursor = reader.since()
+    assert page == [event(0)]
+    writer.write([event(1)])
+    reader.close()
+    assert index_path.read_text().startswith(before)
+    assert reader.since(cursor)[0] == [event(1)]
+    with pytest.raises(RuntimeError):
+        reader.write([event(2)])
+    writer.close()
+    assert [record["id"] for record in open_store(tmp_path).read()] == ["e0", "e1"]
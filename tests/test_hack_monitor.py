@@ -0,0 +1,47 @@
+import asyncio
+from hack_monitor import HackMonitor
+from verdict_cache import VerdictCache
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def send_prompt(self, prompt, max_tokens=50, temperature=0.3):
+        self.calls += 1
+        return {"response": {"is_accessed": True}}
+
+DECOY = {"decoy_id": "d1", "details": "fake_file on 10.0.0.5", "target": "10.0.0.5"}
+
+def interaction(event_id, timestamp):
+    return {"event_id": event_id, "timestamp_start": timestamp, "timestamp_end": timestamp,
+            "src_ip": "10.0.0.5", "executed_commands": "id;whoami"}
+
+def run_pass(monitor, *interactions):
+    for event in interactions:
+        monitor.submit(event)
+    return asyncio.run(monitor.process_interactions())
+
+def test_repeated_interactions_reuse_the_cached_verdict():
+    client = CountingClient()
+    monitor = HackMonitor(client, verdict_cache=VerdictCache())
+    monitor.track_decoy(DECOY)
+    assert len(run_pass(monitor, interaction("e1", "2026-01-01T00:00:00"))) == 1
+    # Same activity with fresh event ids and timestamps renders the same prompt
+    assert len(run_pass(monitor, interaction("e2", "2026-01-01T00:05:00"))) == 1
+    assert client.calls == 1
+
+def test_different_activity_is_checked_again():
+    client = CountingClient()
+    monitor = HackMonitor(client, verdict_cache=VerdictCache())
+    monitor.track_decoy(DECOY)
+    run_pass(monitor, interaction("e1", "2026-01-01T00:00:00"))
+    changed = dict(interaction("e2", "2026-01-01T00:05:00"), executed_commands="cat /etc/shadow")
+    run_pass(monitor, changed)
+    assert client.calls == 2
+
+def test_sweep_without_interactions_is_never_cached():
+    client = CountingClient()
+    monitor = HackMonitor(client, verdict_cache=VerdictCache())
+    asyncio.run(monitor.monitor_decoys([DECOY]))
+    asyncio.run(monitor.monitor_decoys([DECOY]))
+    assert client.calls == 2
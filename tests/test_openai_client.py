@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN
+from openai_client import send_prompt_async
+
+class ScriptedClient:
+    """Async client whose send_prompt plays back a list of replies; exceptions in the list are raised."""
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+
+    async def send_prompt(self, prompt, max_tokens=50, temperature=0.3):
+        reply = self.replies.pop(0)
+        if isinstance(reply, BaseException):
+            raise reply
+        if reply == "hang":
+            await asyncio.sleep(10)
+        return reply
+
+def test_raising_probe_reopens_the_circuit_and_releases_the_probe():
+    client = ScriptedClient([{"error": "down"}, ValueError("bad body"), {"choices": []}])
+
+    async def run():
+        await send_prompt_async(client, "p")
+        assert client.circuit_breaker.state == OPEN
+        with pytest.raises(ValueError):
+            await send_prompt_async(client, "p")
+        assert client.circuit_breaker.state == OPEN
+        return await send_prompt_async(client, "p")
+
+    assert asyncio.run(run()) == {"choices": []}
+    assert client.circuit_breaker.state == CLOSED
+
+def test_cancelled_probe_reopens_the_circuit_and_releases_the_probe():
+    client = ScriptedClient([{"error": "down"}, "hang", {"choices": []}])
+
+    async def run():
+        await send_prompt_async(client, "p")
+        probe = asyncio.create_task(send_prompt_async(client, "p"))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert client.circuit_breaker.state == OPEN
+        return await send_prompt_async(client, "p")
+
+    assert asyncio.run(run()) == {"choices": []}
+    assert client.circuit_breaker.state == CLOSED
@@ -0,0 +1,30 @@
+import random
+from pattern_aggregator import CountMinSketch, SpaceSaving
+
+def test_space_saving_is_exact_within_capacity():
+    summary = SpaceSaving(capacity=5)
+    for key in "aabbbc":
+        summary.add(key)
+    assert summary.top() == [("b", 3), ("a", 2), ("c", 1)]
+    assert summary.top(1) == [("b", 3)]
+
+def test_space_saving_keeps_heavy_hitters_in_bounded_memory():
+    rng = random.Random(1)
+    summary = SpaceSaving(capacity=10)
+    stream = ["heavy"] * 300 + ["warm"] * 150 + [f"noise{rng.randint(0, 999)}" for _ in range(1000)]
+    rng.shuffle(stream)
+    for key in stream:
+        summary.add(key)
+    assert len(summary.counts) == 10
+    top = dict(summary.top(2))
+    assert set(top) == {"heavy", "warm"}
+    # Counts never undercount and overcount by at most the stream length over capacity
+    assert 300 <= top["heavy"] <= 300 + len(stream) // 10
+    assert 150 <= top["warm"] <= 150 + len(stream) // 10
+
+def test_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=16, depth=3)
+    counts = {f"k{n}": n + 1 for n in range(50)}
+    for key, count in counts.items():
+        sketch.add(key, count)
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
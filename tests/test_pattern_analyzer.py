@@ -0,0 +1,31 @@
+import asyncio
+from circuit_breaker import CircuitBreaker
+from pattern_analyzer import PatternAnalyzer
+
+NOW = 1_700_000_000.0
+
+class FailingClient:
+    def __init__(self):
+        self.circuit_breaker = CircuitBreaker(failure_threshold=1)
+        self.calls = 0
+
+    async def send_prompt(self, prompt, max_tokens=50, temperature=0.3):
+        self.calls += 1
+        return {"error": "HTTP 503"}
+
+def threat(source_ip):
+    return {"source_ip": source_ip, "event": "login_attempt", "severity": "high"}
+
+def test_fallback_pattern_comes_from_the_summary_and_open_circuit_is_quiet(capsys):
+    client = FailingClient()
+    analyzer = PatternAnalyzer(client)
+    threats = [threat("10.0.0.9")] * 3 + [threat("10.0.0.7")] * 2 + [threat("10.0.0.5")]
+    pattern = asyncio.run(analyzer.analyze_patterns(threats, [], NOW))[0]
+    assert pattern["common_sources"] == ["10.0.0.9", "10.0.0.7", "10.0.0.5"]
+    assert pattern["details"].startswith("Found 6 threats and 0 alerts")
+    assert "Error in pattern analysis" in capsys.readouterr().out
+    # The breaker opened on that failure, so the next pass falls back without calling or printing
+    pattern = asyncio.run(analyzer.analyze_patterns([threat("10.0.0.9")], [], NOW))[0]
+    assert client.calls == 1
+    assert pattern["common_sources"][0] == "10.0.0.9"
+    assert capsys.readouterr().out == ""
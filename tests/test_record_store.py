@@ -0,0 +1,25 @@
+from record_store import RecordStore
+
+def test_since_returns_records_after_the_cursor():
+    store = RecordStore()
+    store.extend([{"n": 0}, {"n": 1}])
+    records, cursor = store.since()
+    assert records == [{"n": 0}, {"n": 1}] and cursor == 2
+    store.append({"n": 2})
+    assert store.since(cursor) == ([{"n": 2}], 3)
+    assert store.since(3) == ([], 3)
+
+def test_cursor_skips_evicted_records_and_keeps_counting():
+    store = RecordStore(max_records=3)
+    store.extend([{"n": n} for n in range(5)])
+    assert store.cursor == 5
+    assert len(store) == 3
+    records, cursor = store.since(0)
+    assert [record["n"] for record in records] == [2, 3, 4] and cursor == 5
+
+def test_evicted_records_spill_to_disk(tmp_path):
+    store = RecordStore(max_records=2, spill_path=str(tmp_path / "spill.jsonl"))
+    store.extend([{"n": n} for n in range(5)])
+    assert store.spilled == 3
+    assert list(store.iter_spilled()) == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert list(store) == [{"n": 3}, {"n": 4}]
@@ -0,0 +1,8 @@
+from startup_check import check_startup
+
+def test_toolkit_starts_within_budget_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = check_startup(runs=3)
+    assert result["heavy_modules_loaded"] == []
+    assert result["passed"], result
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,37 @@
+import time
+from verdict_cache import VerdictCache
+
+EVENT = {"source_ip": "10.0.0.1", "event": "login_attempt", "status": "failed"}
+
+def test_volatile_fields_do_not_split_the_cache():
+    cache = VerdictCache()
+    cache.set("is_anomaly", dict(EVENT, id="a", timestamp="t1"), True)
+    assert cache.get("is_anomaly", dict(EVENT, id="b", timestamp="t2")) is True
+    assert cache.get("is_anomaly", dict(EVENT, status="success")) is None
+    assert cache.get("is_valid", EVENT) is None
+
+def test_entries_expire_after_ttl():
+    cache = VerdictCache(ttl=0.05)
+    cache.set("is_anomaly", EVENT, True)
+    assert cache.get("is_anomaly", EVENT) is True
+    time.sleep(0.06)
+    assert cache.get("is_anomaly", EVENT) is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerdictCache(max_entries=2)
+    first, second, third = (dict(EVENT, user=user) for user in ("a", "b", "c"))
+    cache.set("is_anomaly", first, True)
+    cache.set("is_anomaly", second, False)
+    cache.get("is_anomaly", first)
+    cache.set("is_anomaly", third, True)
+    assert cache.get("is_anomaly", second) is None
+    assert cache.get("is_anomaly", first) is True
+    assert cache.stats()["evictions"] == 1
+
+def test_persisted_entries_are_reloaded(tmp_path):
+    path = str(tmp_path / "verdicts.json")
+    cache = VerdictCache(persist_path=path)
+    cache.set("is_anomaly", EVENT, True)
+    cache.save()
+    assert VerdictCache(persist_path=path).get("is_anomaly", EVENT) is True
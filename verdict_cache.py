@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable
+from metrics import CACHE_LOOKUPS
+
+# Fields that differ between otherwise identical records and must not split the cache
+VOLATILE_FIELDS = frozenset({"id", "timestamp", "created_at"})
+
+def fingerprint(record: Dict[str, Any], ignore: Iterable[str] = VOLATILE_FIELDS) -> str:
+    """Returns a stable hash of a record, ignoring volatile fields and key order."""
+    ignored = set(ignore)
+    normalized = {key: value for key, value in record.items() if key not in ignored}
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+class VerdictCache:
+    """In-process LRU/TTL cache of LLM verdicts keyed by record fingerprint, optionally persisted to disk."""
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        if persist_path and os.path.isfile(persist_path):
+            self.load()
+
+    @staticmethod
+    def key(namespace: str, record: Dict[str, Any]) -> str:
+        """Builds the cache key for a record within a verdict namespace."""
+        return f"{namespace}:{fingerprint(record)}"
+
+    def get(self, namespace: str, record: Dict[str, Any]) -> Optional[Any]:
+        """Returns the cached verdict for a record, or None when absent or expired."""
+        key = self.key(namespace, record)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(namespace, "miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_LOOKUPS.inc(namespace, "hit")
+        return entry[1]
+
+    def set(self, namespace: str, record: Dict[str, Any], verdict: Any, latency: Optional[float] = None) -> None:
+        """Stores a verdict, evicting the least recently used entries beyond max_entries."""
+        key = self.key(namespace, record)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if latency is not None:
+                self.llm_calls += 1
+                self.llm_seconds += latency
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the estimated LLM calls and latency saved."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            average_latency = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "llm_calls_saved": self.hits,
+                "average_llm_latency": average_latency,
+                "latency_saved_seconds": self.hits * average_latency
+            }
+
+    def save(self) -> None:
+        """Writes unexpired entries to persist_path, replacing the previous file atomically."""
+        if not self.persist_path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[key, expires_at, verdict] for key, (expires_at, verdict) in self._entries.items() if expires_at >= now]
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self) -> None:
+        """Loads unexpired entries from persist_path in their saved LRU order."""
+        try:
+            with open(self.persist_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load verdict cache: {str(e)}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, expires_at, verdict in entries:
+                if expires_at >= now:
+                    self._entries[key] = (expires_at, verdict)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
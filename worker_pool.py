@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import threading
+from typing import List, Dict, Any, Optional
+
+# Forwarded batches each worker's inbox holds before senders analyze overflow themselves
+INBOX_BATCHES = 1000
+
+class WorkerPool:
+    """Runs the API server in several processes on one port, sharding events between them by source_ip."""
+    def __init__(self, azure_endpoint: str, encrypted_api_key: str, encryption_key: str,
+                 workers: Optional[int] = None, host: str = "0.0.0.0", port: int = 8000,
+                 event_store_dir: str = "event_store", shared_store_path: str = "toolkit_state.db",
+                 use_async_client: bool = False, server_options: Optional[Dict[str, Any]] = None):
+        self.workers = workers or os.cpu_count() or 1
+        # Everything a worker needs to build its own client and server; must be picklable
+        self.config = {
+            "azure_endpoint": azure_endpoint,
+            "encrypted_api_key": encrypted_api_key,
+            "encryption_key": encryption_key,
+            "host": host,
+            "port": port,
+            "event_store_dir": event_store_dir,
+            "shared_store_path": shared_store_path,
+            "use_async_client": use_async_client,
+            "server_options": server_options or {}
+        }
+        self.processes: List[multiprocessing.Process] = []
+        self.inboxes: List[Any] = []
+
+    def start(self) -> None:
+        """Spawns the worker processes."""
+        context = multiprocessing.get_context("spawn")
+        # The parent keeps the queues alive; workers attach to them while unpickling their arguments
+        self.inboxes = [context.Queue(maxsize=INBOX_BATCHES) for _ in range(self.workers)]
+        for index in range(self.workers):
+            process = context.Process(target=run_worker, args=(index, self.config, self.inboxes),
+                                      name=f"api-worker-{index}", daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Asks each worker to shut down gracefully, killing those that outlive timeout."""
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                print(f"Worker {process.name} did not stop in time; killing it")
+                process.kill()
+                process.join()
+        self.processes = []
+        self.inboxes = []
+
+    def join(self) -> None:
+        for process in self.processes:
+            process.join()
+
+    def run(self) -> None:
+        """Runs the workers until they exit or the process is interrupted."""
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    async def serve(self) -> None:
+        """Runs the workers from an event loop until shutdown() is called or they all exit."""
+        self.start()
+        await asyncio.to_thread(self.join)
+
+    def shutdown(self) -> None:
+        """Stops the workers without blocking the caller's event loop; serve() returns once they have exited."""
+        threading.Thread(target=self.stop, name="worker-pool-stop").start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the liveness of each worker process."""
+        return {process.name: {"pid": process.pid, "alive": process.is_alive()} for process in self.processes}
+
+def run_worker(index: int, config: Dict[str, Any], inboxes: List[Any]) -> None:
+    """Entry point of a worker process: an API server owning one shard of the source IPs."""
+    from api_server import APIServer
+    from batch_status import SharedBatchStatus
+    from data_analyzer import DataAnalyzer
+    from event_store import EventStore
+    from openai_client import OpenAIClient
+    from records import ThreatRecord
+    from shard_router import ShardRouter
+    from shared_record_store import SharedRecordStore
+    if config["use_async_client"]:
+        from async_openai_client import AsyncOpenAIClient as client_class
+    else:
+        client_class = OpenAIClient
+    client = client_class(config["azure_endpoint"], config["encrypted_api_key"], config["encryption_key"])
+    # Threats go to the shared store; each worker writes its own event segments so none clobber another's
+    threats = SharedRecordStore(config["shared_store_path"], "threats", ThreatRecord)
+    # Batch status is shared too, since any worker may be asked about a batch another one accepted
+    batch_status = SharedBatchStatus(config["shared_store_path"])
+    server = APIServer(client, host=config["host"], port=config["port"],
+                       event_store=EventStore(os.path.join(config["event_store_dir"], f"worker-{index}")),
+                       data_analyzer=DataAnalyzer(client, store=threats), batch_status=batch_status,
+                       shard_router=ShardRouter(index, inboxes), reuse_port=True, **config["server_options"])
+    try:
+        asyncio.run(server.serve())
+    finally:
+        threats.close()
+        batch_status.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API server in several worker processes on one port.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--event-store-dir", default="event_store")
+    parser.add_argument("--shared-store", default="toolkit_state.db")
+    parser.add_argument("--async-client", action="store_true")
+    args = parser.parse_args()
+    pool = WorkerPool(
+        azure_endpoint=os.environ.get("AZURE_ENDPOINT", "https://your-azure-openai-endpoint"),
+        encrypted_api_key=os.environ.get("ENCRYPTED_API_KEY", "your-encrypted-api-key"),
+        encryption_key=os.environ.get("ENCRYPTION_KEY", "your-encryption-key"),
+        workers=args.workers, host=args.host, port=args.port, event_store_dir=args.event_store_dir,
+        shared_store_path=args.shared_store, use_async_client=args.async_client
+    )
+    pool.run()